@@ -7,7 +7,7 @@ import sys
 from pathlib import Path
 
 import yaml
-sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表（放在CKG/之前）
 
 import colorsys
 import os
@@ -598,14 +598,12 @@ def get_random_color():
     return res
 
 
-if __name__ == "__main__":
-
-    # dir_name = sys.argv[1]
-    with open('./source/config.yaml', 'r') as f:
-        config = yaml.load(f, Loader=yaml.FullLoader)
-    dir_name = config['CKG']['project_dir']
-
-    repo_name = dir_name.split(os.path.sep)[-1]
+def build_code_graph(dir_name, graph_pkl_path):
+    """Construct the code graph of a repo directory and pickle it to graph_pkl_path.
+    :param dir_name: Path to the repository directory.
+    :param graph_pkl_path: Where to save the pickled graph.
+    :return: The tags and the graph.
+    """
     code_graph = CodeGraph(root=dir_name)
     chat_fnames_new = code_graph.find_files([dir_name])
 
@@ -617,8 +615,22 @@ if __name__ == "__main__":
     print(f"   Number of edges: {len(G.edges)}")
     print("---------------------------------")
 
-    with open(f'{os.getcwd()}/CKG/{repo_name}_graph.pkl', 'wb') as f:
+    os.makedirs(os.path.dirname(os.path.abspath(graph_pkl_path)), exist_ok=True)
+    with open(graph_pkl_path, 'wb') as f:
         pickle.dump(G, f)
+
+    return tags, G
+
+
+if __name__ == "__main__":
+
+    # dir_name = sys.argv[1]
+    with open('./source/config.yaml', 'r') as f:
+        config = yaml.load(f, Loader=yaml.FullLoader)
+    dir_name = config['CKG']['project_dir']
+
+    repo_name = dir_name.split(os.path.sep)[-1]
+    tags, G = build_code_graph(dir_name, f'{os.getcwd()}/CKG/{repo_name}_graph.pkl')
     
     for tag in tags:
         with open(f'{os.getcwd()}/CKG/{repo_name}_tags.json', 'a+') as f:
@@ -1,38 +1,19 @@
 import os
 import ast
 
-def create_structure(directory_path):
+def create_structure(directory_path, records_path=None, workers=None):
     """Create the structure of the repository directory by parsing Python files.
+    The files are parsed by the shared code extractor, which only re-parses files whose hash changed.
     :param directory_path: Path to the repository directory.
+    :param records_path: Records file of the extractor (default: utils.code_extractor.default_records_path).
+    :param workers: Parallel parser processes (default: CPU count).
     :return: A dictionary representing the structure.
     """
-    structure = {}
+    # 延迟导入：CKG/construct_graph.py作为脚本运行时，模块级的utils可能解析为CKG/utils.py
+    from utils.code_extractor import extract_project, iter_records, build_ckg_structure
 
-    for root, _, files in os.walk(directory_path):
-        # repo_name = os.path.basename(directory_path)
-        relative_root = os.path.relpath(root, directory_path)
-        # if relative_root == ".":
-        #     relative_root = repo_name
-        curr_struct = structure
-        for part in relative_root.split(os.sep):
-            if relative_root == ".":
-                break
-            if part not in curr_struct:
-                curr_struct[part] = {}
-            curr_struct = curr_struct[part]
-        for file_name in files:
-            if file_name.endswith(".py"):
-                file_path = os.path.join(root, file_name)
-                class_info, function_names, file_lines = parse_python_file(file_path)
-                curr_struct[file_name] = {
-                    "classes": class_info,
-                    "functions": function_names,
-                    "text": file_lines,
-                }
-            else:
-                curr_struct[file_name] = {}
-
-    return structure
+    records_path = extract_project(directory_path, records_path, workers or os.cpu_count() or 4)
+    return build_ckg_structure(iter_records(records_path))
 
 def parse_python_file(file_path, file_content=None):
     """Parse a Python file to extract class and function definitions with their line numbers.
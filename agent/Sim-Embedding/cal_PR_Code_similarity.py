@@ -7,6 +7,10 @@ import os
 from pathlib import Path
 import argparse
 import time
+import sys
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # 将仓库根目录加入执行目录列表
+
+from utils.batched_encoder import encode_texts
 
 class CodeSimilaritySearch:
     def __init__(self, model_name="Salesforce/codet5p-base"):
@@ -25,23 +29,8 @@ class CodeSimilaritySearch:
     
     def encode_text(self, text, max_length=512):
         """将文本转换为嵌入向量"""
-        with torch.no_grad():
-            inputs = self.tokenizer(
-                text, 
-                return_tensors="pt", 
-                max_length=max_length, 
-                padding="max_length", 
-                truncation=True
-            ).to(self.device)
-            
-            outputs = self.model(
-                input_ids=inputs.input_ids,
-                attention_mask=inputs.attention_mask
-            )
-            
-            # 取最后一层隐藏状态的平均值作为文本嵌入
-            embedding = torch.mean(outputs.last_hidden_state, dim=1)
-            return embedding
+        # 动态填充，只对实际token求平均
+        return encode_texts([text], self.tokenizer, self.model, self.device, max_length).to(self.device)
     
     def load_code_from_json(self, json_file):
         """从JSON文件加载代码"""
@@ -88,37 +77,13 @@ class CodeSimilaritySearch:
         print("Computing embeddings for all code blocks...")
         start_time = time.time()
         
-        all_embeddings = []
-        
-        # 使用批处理来提高效率
-        for i in tqdm(range(0, len(self.code_info), batch_size)):
-            batch = [item["code"] for item in self.code_info[i:i+batch_size]]
-            
-            with torch.no_grad():
-                inputs = self.tokenizer(
-                    batch, 
-                    return_tensors="pt", 
-                    max_length=512, 
-                    padding="max_length", 
-                    truncation=True
-                ).to(self.device)
-                
-                outputs = self.model(
-                    input_ids=inputs.input_ids,
-                    attention_mask=inputs.attention_mask
-                )
-                
-                # 取最后一层隐藏状态的平均值作为代码嵌入
-                batch_embeddings = torch.mean(outputs.last_hidden_state, dim=1)
-                all_embeddings.append(batch_embeddings.cpu())
-        
-        # 将所有批次的嵌入合并为一个张量
-        if all_embeddings:
-            self.code_embeddings = torch.cat(all_embeddings, dim=0)
-            # 标准化嵌入向量
-            self.code_embeddings = torch.nn.functional.normalize(self.code_embeddings, p=2, dim=1)
-            print(f"Computed embeddings with shape: {self.code_embeddings.shape}")
-            print(f"Embedding computation took {time.time() - start_time:.2f} seconds")
+        # 按token长度分桶、动态填充，批次大小由token预算决定
+        self.code_embeddings = encode_texts(
+            [item["code"] for item in self.code_info], self.tokenizer, self.model, self.device,
+            max_tokens=batch_size * 512, progress=tqdm
+        )
+        print(f"Computed embeddings with shape: {self.code_embeddings.shape}")
+        print(f"Embedding computation took {time.time() - start_time:.2f} seconds")
     
     def save_embeddings(self, embeddings_file, info_file=None):
         """保存嵌入向量和代码信息到文件"""
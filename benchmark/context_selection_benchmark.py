@@ -0,0 +1,98 @@
+import os
+import re
+import sys
+import json
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
+
+from utils.batched_encoder import encode_texts
+from utils.model_registry import get_model
+from utils.context_selection import count_tokens, mmr_select, DEFAULT_MMR_LAMBDA, DEFAULT_DEDUP_THRESHOLD, DEFAULT_CONTEXT_TOKENS
+
+BLOCK_PATTERN = re.compile(
+    r"### Code Block \d+\n- \*\*Path\*\*: (?P<path>[^\n]*)\n- \*\*File\*\*: [^\n]*\n- \*\*Name\*\*: (?P<name>[^\n]*)\n"
+    r"- \*\*Type\*\*: [^\n]*\n- \*\*Similarity Score\*\*: (?P<score>[-\d.]+)\n- \*\*Code\*\*:\n```\n(?P<code>.*?)\n```\n",
+    re.S
+)
+
+
+def load_recorded_prompts(recorded_dir):
+    """
+    读取之前Embedding策略运行保存的输出（{llm_model}_{pr}.txt，开头是用户提示），解析其中的相似代码块。
+
+    Returns:
+        list: (文件名, [{path, name, score, code, text}])
+    """
+    prompts = []
+    for path in sorted(Path(recorded_dir).rglob('*.txt')):
+        content = path.read_text(encoding='utf-8', errors='replace')
+        blocks = [
+            {**match.groupdict(), 'score': float(match.group('score')), 'text': match.group(0)}
+            for match in BLOCK_PATTERN.finditer(content)
+        ]
+        if blocks:
+            prompts.append((path.name, blocks))
+    return prompts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Token savings of MMR dedup and token-budgeted selection over recorded Embedding prompts')
+    parser.add_argument('--recorded-dir', required=True, help='Output directory of previous Embedding runs')
+    parser.add_argument('--model', default='Salesforce/codet5p-base', help='CodeT5+ encoder')
+    parser.add_argument('--mmr-lambda', type=float, default=DEFAULT_MMR_LAMBDA, help='MMR relevance weight')
+    parser.add_argument('--dedup-threshold', type=float, nargs='+', default=[0.9, DEFAULT_DEDUP_THRESHOLD, 0.98],
+                        help='Near-duplicate cosine thresholds to compare')
+    parser.add_argument('--context-tokens', type=int, default=DEFAULT_CONTEXT_TOKENS, help='Token budget (0: unlimited)')
+    parser.add_argument('--report', default='./result/benchmark/context_selection_benchmark.json', help='Where to write the JSON report')
+    args = parser.parse_args()
+
+    prompts = load_recorded_prompts(args.recorded_dir)
+    if not prompts:
+        print(f"No recorded Embedding prompts found in {args.recorded_dir}")
+        return
+    loaded = get_model(args.model)
+    encoded = [
+        (blocks,
+         encode_texts([block['code'] for block in blocks], loaded.tokenizer, loaded.model, loaded.device, lock=loaded.lock).numpy(),
+         [count_tokens(block['text']) for block in blocks])
+        for _, blocks in prompts
+    ]
+
+    rows = []
+    for threshold in args.dedup_threshold:
+        tokens_before = tokens_after = blocks_before = blocks_after = 0
+        files_before = files_after = 0
+        for blocks, vectors, costs in encoded:
+            selected, _ = mmr_select(
+                [block['score'] for block in blocks], vectors, costs,
+                token_budget=args.context_tokens, mmr_lambda=args.mmr_lambda, dedup_threshold=threshold
+            )
+            tokens_before += sum(costs)
+            tokens_after += sum(costs[i] for i in selected)
+            blocks_before += len(blocks)
+            blocks_after += len(selected)
+            # 覆盖率：选中的代码块仍然覆盖的文件
+            files_before += len({block['path'] for block in blocks})
+            files_after += len({blocks[i]['path'] for i in selected})
+        row = {
+            'dedup_threshold': threshold,
+            'tokens_before': tokens_before,
+            'tokens_after': tokens_after,
+            'token_savings': 1 - tokens_after / max(tokens_before, 1),
+            'blocks_before': blocks_before,
+            'blocks_after': blocks_after,
+            'file_coverage': files_after / max(files_before, 1)
+        }
+        rows.append(row)
+        print(f"threshold {threshold:.2f}: {tokens_before} -> {tokens_after} tokens ({row['token_savings']:.1%} saved), "
+              f"{blocks_before} -> {blocks_after} blocks, file coverage {row['file_coverage']:.1%}")
+
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump({'prompts': len(prompts), 'mmr_lambda': args.mmr_lambda, 'context_tokens': args.context_tokens, 'rows': rows}, f, indent=2)
+    print(f"Report saved to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import time
+import itertools
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
+
+import torch
+from transformers import T5EncoderModel, RobertaTokenizer
+
+from utils.batched_encoder import encode_texts, mean_pool
+from utils.code_extractor import extract_project, iter_records, iter_code_blocks
+
+
+def load_code_blocks(project_dir, limit=None):
+    """
+    用共享的代码提取器读取项目中的代码块文本（与Embedding.load_code_from_project相同）。
+    """
+    records_path = extract_project(project_dir, workers=os.cpu_count() or 4)
+    codes = (block['code'] for block in iter_code_blocks(iter_records(records_path)))
+    return list(itertools.islice(codes, limit) if limit else codes)
+
+
+def encode_fixed_padding(codes, tokenizer, model, device, batch_size=16, max_length=512):
+    """
+    原来的做法：按原始顺序每16条一个批次，全部填充到512。使用掩码平均，与新实现的结果可以直接比较。
+    """
+    embeddings = []
+    with torch.no_grad():
+        for i in range(0, len(codes), batch_size):
+            inputs = tokenizer(codes[i:i + batch_size], return_tensors="pt", max_length=max_length,
+                               padding="max_length", truncation=True).to(device)
+            hidden = model(input_ids=inputs.input_ids, attention_mask=inputs.attention_mask).last_hidden_state
+            embeddings.append(torch.nn.functional.normalize(mean_pool(hidden, inputs.attention_mask), p=2, dim=1).cpu())
+    return torch.cat(embeddings, dim=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare fixed 512 padding with length-bucketed dynamic padding on CPU')
+    parser.add_argument('--project-dir', required=True, help='Project directory (parsed with utils.code_extractor)')
+    parser.add_argument('--model', default='Salesforce/codet5p-base', help='CodeT5+ encoder')
+    parser.add_argument('--limit', type=int, default=512, help='Number of code blocks to encode')
+    parser.add_argument('--batch-tokens', type=int, nargs='+', default=[4096, 8192, 16384], help='Token budgets to try')
+    parser.add_argument('--threads', type=int, default=0, help='torch threads (0 keeps the default)')
+    parser.add_argument('--report', default='./result/benchmark/embedding_batching_benchmark.json', help='Where to write the JSON report')
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    device = torch.device("cpu")
+    tokenizer = RobertaTokenizer.from_pretrained(args.model)
+    model = T5EncoderModel.from_pretrained(args.model).to(device)
+    model.eval()
+
+    codes = load_code_blocks(args.project_dir, args.limit)
+    lengths = [len(ids) for ids in tokenizer(codes, max_length=512, truncation=True)['input_ids']]
+    print(f"{len(codes)} code blocks, mean {sum(lengths) / max(len(lengths), 1):.0f} tokens, "
+          f"{sum(length >= 512 for length in lengths)} truncated at 512")
+
+    start = time.time()
+    baseline = encode_fixed_padding(codes, tokenizer, model, device)
+    baseline_seconds = time.time() - start
+    report = {
+        'blocks': len(codes),
+        'mean_tokens': sum(lengths) / max(len(lengths), 1),
+        'fixed_padding': {'seconds': baseline_seconds, 'blocks_per_second': len(codes) / baseline_seconds},
+        'bucketed': []
+    }
+    print(f"fixed padding: {baseline_seconds:.1f}s, {len(codes) / baseline_seconds:.1f} blocks/s")
+
+    for batch_tokens in args.batch_tokens:
+        start = time.time()
+        embeddings = encode_texts(codes, tokenizer, model, device, max_tokens=batch_tokens)
+        seconds = time.time() - start
+        # 动态填充与固定填充的结果只差浮点误差，余弦相似度应接近1
+        min_cosine = float((embeddings * baseline).sum(dim=1).min())
+        report['bucketed'].append({
+            'batch_tokens': batch_tokens,
+            'seconds': seconds,
+            'blocks_per_second': len(codes) / seconds,
+            'speedup': baseline_seconds / seconds,
+            'min_cosine_vs_fixed': min_cosine
+        })
+        print(f"bucketed ({batch_tokens} tokens/batch): {seconds:.1f}s, {len(codes) / seconds:.1f} blocks/s, "
+              f"x{baseline_seconds / seconds:.2f}, min cosine {min_cosine:.5f}")
+
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
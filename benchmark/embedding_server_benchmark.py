@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import time
+import argparse
+import concurrent.futures
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
+
+from utils.batched_encoder import encode_texts
+from utils.model_registry import get_model
+from utils.embedding_server import EmbeddingServer
+
+
+def load_queries(recorded_dir, limit):
+    """
+    读取之前运行保存的PR描述（{pull_number}_PR_body.json的PR_Content）作为查询，没有时使用合成文本。
+    """
+    queries = []
+    if recorded_dir:
+        for path in sorted(Path(recorded_dir).rglob('*_PR_body.json')):
+            with open(path, 'r') as f:
+                content = json.load(f).get('PR_Content')
+            if content:
+                queries.append(content if isinstance(content, str) else json.dumps(content))
+    if not queries:
+        queries = [f"Fix handling of option {i} in the request parser and add a regression test" * (1 + i % 8) for i in range(64)]
+    return (queries * (limit // len(queries) + 1))[:limit]
+
+
+def run_concurrently(encode_one, queries, workers):
+    start = time.time()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(encode_one, queries))
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-request forward passes versus the micro-batching embedding server')
+    parser.add_argument('--model', default='Salesforce/codet5p-base', help='CodeT5+ encoder')
+    parser.add_argument('--recorded-dir', default='', help='Directory with recorded {pull_number}_PR_body.json files')
+    parser.add_argument('--queries', type=int, default=256, help='Number of queries')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 32], help='Concurrent tasks issuing queries')
+    parser.add_argument('--max-batch-size', type=int, default=32, help='Micro-batch size of the server')
+    parser.add_argument('--max-wait-ms', type=float, default=5, help='Micro-batch deadline of the server')
+    parser.add_argument('--report', default='./result/benchmark/embedding_server_benchmark.json', help='Where to write the JSON report')
+    args = parser.parse_args()
+
+    loaded = get_model(args.model)
+    queries = load_queries(args.recorded_dir, args.queries)
+    server = EmbeddingServer(loaded, args.max_batch_size, args.max_wait_ms)
+    server.encode(queries[:4])  # 预热
+
+    rows = []
+    for workers in args.workers:
+        direct_seconds = run_concurrently(
+            lambda text: encode_texts([text], loaded.tokenizer, loaded.model, loaded.device, lock=loaded.lock), queries, workers
+        )
+        batches_before = server.stats['batches']
+        server_seconds = run_concurrently(lambda text: server.submit(text).result(), queries, workers)
+        batches = server.stats['batches'] - batches_before
+        row = {
+            'workers': workers,
+            'direct_queries_per_second': len(queries) / direct_seconds,
+            'server_queries_per_second': len(queries) / server_seconds,
+            'speedup': direct_seconds / server_seconds,
+            'mean_batch_size': len(queries) / max(batches, 1)
+        }
+        rows.append(row)
+        print(f"{workers:>3} workers: direct {row['direct_queries_per_second']:.1f} q/s, "
+              f"server {row['server_queries_per_second']:.1f} q/s (x{row['speedup']:.2f}, mean batch {row['mean_batch_size']:.1f})")
+    server.close()
+
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump({'queries': len(queries), 'rows': rows}, f, indent=2)
+    print(f"Report saved to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
+
+import torch
+
+from benchmark.embedding_batching_benchmark import load_code_blocks
+from utils.batched_encoder import encode_texts
+from utils.inference_backends import INFERENCE_BACKENDS, load_encoder, compare_encoders, MIN_EMBEDDING_COSINE, MAX_SIMILARITY_DEVIATION
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Blocks/sec and fp32 agreement of the CodeT5+ inference backends on CPU')
+    parser.add_argument('--project-dir', required=True, help='Project directory (parsed with utils.code_extractor)')
+    parser.add_argument('--model', default='Salesforce/codet5p-base', help='CodeT5+ encoder')
+    parser.add_argument('--backends', nargs='+', choices=INFERENCE_BACKENDS, default=list(INFERENCE_BACKENDS), help='Backends to compare')
+    parser.add_argument('--limit', type=int, default=256, help='Number of code blocks to encode')
+    parser.add_argument('--guard-samples', type=int, default=64, help='Code blocks used for the accuracy comparison')
+    parser.add_argument('--threads', type=int, default=0, help='torch threads (0 keeps the default)')
+    parser.add_argument('--report', default='./result/benchmark/inference_backend_benchmark.json', help='Where to write the JSON report')
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    codes = load_code_blocks(args.project_dir, args.limit)
+    sample = codes[:args.guard_samples]
+    print(f"{len(codes)} code blocks, {len(sample)} in the accuracy sample")
+
+    encoders = {}
+    rows = []
+    for backend in ['torch'] + [b for b in args.backends if b != 'torch']:
+        try:
+            tokenizer, model, device = load_encoder(args.model, backend, num_threads=args.threads)
+        except ImportError as e:
+            print(f"{backend}: skipped ({e})")
+            continue
+        if backend == 'torch':
+            # 基准使用CPU上的fp32
+            device = torch.device("cpu")
+            model = model.to(device)
+        encoders[backend] = lambda texts, t=tokenizer, m=model, d=device: encode_texts(texts, t, m, d).numpy()
+
+        encoders[backend](codes[:8])  # 预热
+        start = time.time()
+        encoders[backend](codes)
+        seconds = time.time() - start
+        row = {'backend': backend, 'seconds': seconds, 'blocks_per_second': len(codes) / seconds}
+        if backend != 'torch':
+            row.update(compare_encoders(encoders['torch'], encoders[backend], sample))
+            row['passed'] = row['min_cosine'] >= MIN_EMBEDDING_COSINE and row['max_similarity_deviation'] <= MAX_SIMILARITY_DEVIATION
+        rows.append(row)
+        print(f"{backend:<10}{row['blocks_per_second']:>10.1f} blocks/s"
+              + (f"  x{row['blocks_per_second'] / rows[0]['blocks_per_second']:.2f}  min cosine {row['min_cosine']:.4f}  "
+                 f"max deviation {row['max_similarity_deviation']:.4f}  {'ok' if row['passed'] else 'FAILED'}" if backend != 'torch' else ''))
+
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump({'blocks': len(codes), 'rows': rows}, f, indent=2)
+    print(f"Report saved to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
+
+from run import generate_config, read_pr_urls_from_file
+from tasks.task_factory import TaskFactory
+from utils.pr_context_store import PRContextStore
+
+
+def load_recorded_pr_info(config, recorded_dir):
+    """
+    读取之前运行保存的PR信息（{pull_number}_PR_body.json或PR信息缓存），避免重复请求GitHub和LLM。
+
+    Args:
+        config (dict): 配置字典
+        recorded_dir (str): 保存PR信息的目录，为空时使用配置中的Judge.tmp_dir
+
+    Returns:
+        dict: PR信息，找不到时返回None
+    """
+    tmp_dir = recorded_dir or config['Judge']['tmp_dir']
+    tmp_path = os.path.join(tmp_dir, f"{config['Judge']['pull_number']}_PR_body.json")
+    if not os.path.exists(tmp_path):
+        store = PRContextStore.from_config(config)
+        return store.get(*store.key_from_config(config))
+    with open(tmp_path, 'r') as f:
+        return json.load(f)
+
+
+class ReplayExhausted(Exception):
+    """
+    回放时任务请求的LLM调用次数超过了录制的响应数。
+    """
+
+
+def responses_path(config, recorded_dir):
+    """
+    录制的LLM响应文件：{recorded_dir}/llm_responses/{strategy}/{repo}_{pull_number}.json
+    """
+    tmp_dir = recorded_dir or config['Judge']['tmp_dir']
+    return os.path.join(tmp_dir, 'llm_responses', config['Agent']['strategy'],
+                        f"{config['Judge']['repo']}_{config['Judge']['pull_number']}.json")
+
+
+def instrument(task, responses=None):
+    """
+    包装任务的llm方法，统计LLM调用次数和耗时。
+    给出responses时按顺序回放录制的响应（不请求LLM），LLM耗时使用录制时的耗时；
+    否则请求LLM，并把每次的响应和耗时记录到stats['responses']中。
+
+    Args:
+        task: 测试计划生成任务
+        responses (list, optional): 录制的[{content, seconds}]
+
+    Returns:
+        dict: 运行过程中持续更新的统计信息
+    """
+    stats = {'llm_calls': 0, 'llm_seconds': 0.0, 'responses': []}
+    original_llm = task.llm
+
+    def replayed_llm(*args, **kwargs):
+        if stats['llm_calls'] >= len(responses):
+            raise ReplayExhausted(f"only {len(responses)} recorded responses")
+        response = responses[stats['llm_calls']]
+        stats['llm_calls'] += 1
+        stats['llm_seconds'] += response['seconds']
+        return response['content']
+
+    def recorded_llm(*args, **kwargs):
+        start = time.time()
+        content = original_llm(*args, **kwargs)
+        seconds = time.time() - start
+        stats['llm_calls'] += 1
+        stats['llm_seconds'] += seconds
+        stats['responses'].append({'content': content, 'seconds': seconds})
+        return content
+
+    task.llm = recorded_llm if responses is None else replayed_llm
+    return stats
+
+
+def benchmark_strategy(pr_url, strategy, args):
+    """
+    在一个PR上运行一种策略。默认离线回放录制的LLM响应，工具在本地项目上真实执行；
+    --record时请求LLM并保存响应，供之后回放。
+
+    Returns:
+        dict: 统计信息，缺少录制数据时返回None
+    """
+    config = generate_config(pr_url, args.model, args.output_dir, strategy, args.model,
+                             pr_context_offline=not args.record)
+    reformat_pr_info = load_recorded_pr_info(config, args.recorded_dir)
+    if reformat_pr_info is None:
+        print(f"No recorded PR info for {pr_url}, skipping")
+        return None
+
+    path = responses_path(config, args.recorded_dir)
+    responses = None
+    if not args.record:
+        if not os.path.exists(path):
+            print(f"No recorded {strategy} responses for {pr_url} (run with --record first), skipping")
+            return None
+        with open(path, 'r') as f:
+            responses = json.load(f)
+
+    task = TaskFactory.create_task(config, "generator", reformat_pr_info=reformat_pr_info)
+    stats = instrument(task, responses)
+
+    start = time.time()
+    try:
+        test_plan = task.run()
+        stats['completed'] = bool(test_plan)
+    except ReplayExhausted as e:
+        # 工具输出与录制时不同（例如项目代码已更新），LLM的后续响应不再适用
+        print(f"Replay of {strategy} on {pr_url} diverged: {e}")
+        stats['completed'] = False
+    except Exception as e:
+        print(f"Error running {strategy} on {pr_url}: {e}")
+        stats['completed'] = False
+    finally:
+        task.close()
+    # 回放时墙钟时间 = 本地执行时间 + 录制的LLM耗时
+    stats['local_seconds'] = time.time() - start
+    stats['wall_seconds'] = stats['local_seconds'] + (stats['llm_seconds'] if responses is not None else 0.0)
+    stats['tool_calls'] = task.tool_executor.stats['calls']
+    stats['tool_cache_hits'] = task.tool_executor.stats['cache_hits']
+
+    recorded = stats.pop('responses')
+    if args.record:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(recorded, f, indent=2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare LLM calls and wall time of ReAct and ParallelReAct by replaying recorded LLM responses')
+    parser.add_argument('--pr_url', required=True, help='GitHub PR URL or file containing PR URLs')
+    parser.add_argument('--model', default='gpt-4o', help='LLM model to use')
+    parser.add_argument('--recorded-dir', default='', help='Directory with recorded {pull_number}_PR_body.json files and LLM responses (defaults to Judge.tmp_dir)')
+    parser.add_argument('--record', action='store_true', help='Call the LLM and record its responses instead of replaying them')
+    parser.add_argument('--output-dir', default='./result/benchmark', help='Output directory for generated test plans')
+    parser.add_argument('--report', default='./result/benchmark/parallel_react_benchmark.json', help='Where to write the JSON report')
+    args = parser.parse_args()
+
+    if os.path.isfile(args.pr_url):
+        pr_urls = read_pr_urls_from_file(args.pr_url)
+    else:
+        pr_urls = [args.pr_url]
+
+    strategies = ['ReAct', 'ParallelReAct']
+    report = {}
+    for pr_url in pr_urls:
+        report[pr_url] = {}
+        for strategy in strategies:
+            stats = benchmark_strategy(pr_url, strategy, args)
+            if stats is not None:
+                report[pr_url][strategy] = stats
+
+    # 汇总
+    summary = {}
+    for strategy in strategies:
+        runs = [r[strategy] for r in report.values() if strategy in r]
+        if not runs:
+            continue
+        summary[strategy] = {
+            'prs': len(runs),
+            'completed': sum(1 for r in runs if r['completed']),
+            'mean_llm_calls': sum(r['llm_calls'] for r in runs) / len(runs),
+            'mean_wall_seconds': sum(r['wall_seconds'] for r in runs) / len(runs),
+            'mean_tool_calls': sum(r['tool_calls'] for r in runs) / len(runs),
+        }
+
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump({'summary': summary, 'runs': report}, f, indent=2)
+
+    print(f"\n{'Strategy':<16}{'PRs':>6}{'Done':>6}{'LLM calls':>12}{'Wall (s)':>12}{'Tool calls':>12}")
+    for strategy, s in summary.items():
+        print(f"{strategy:<16}{s['prs']:>6}{s['completed']:>6}{s['mean_llm_calls']:>12.2f}{s['mean_wall_seconds']:>12.1f}{s['mean_tool_calls']:>12.2f}")
+    print(f"Report saved to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
+
+import numpy as np
+
+from utils.vector_index import BruteForceIndex, IVFIndex, HNSWIndex, DiskIndex
+
+
+def load_store_embeddings(store_dir, limit=None):
+    """
+    读取嵌入存储目录（{root}/{model}/{repo}）下所有分片的嵌入。
+    """
+    shards = [np.load(path, mmap_mode='r') for path in sorted(glob.glob(os.path.join(store_dir, 'shard_*.npy')))]
+    embeddings = np.concatenate([np.asarray(shard, dtype=np.float32) for shard in shards], axis=0)
+    return embeddings[:limit] if limit else embeddings
+
+
+def synthetic_embeddings(n, dim, clusters=256, seed=0):
+    """
+    模拟代码嵌入的聚类结构：簇中心加噪声后标准化。
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    embeddings = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def recall_at_k(approximate, exact):
+    hits = sum(len(set(a[a >= 0]) & set(e)) for a, e in zip(approximate, exact))
+    return hits / exact.size
+
+
+def measure(name, params, build, queries, exact_indices, k):
+    start = time.time()
+    index = build()
+    build_seconds = time.time() - start
+    start = time.time()
+    _, indices = index.search(queries, k)
+    query_ms = (time.time() - start) * 1000 / len(queries)
+    row = {
+        'backend': name,
+        'params': params,
+        'build_seconds': build_seconds,
+        'query_ms': query_ms,
+        'recall': recall_at_k(indices, exact_indices) if exact_indices is not None else 1.0
+    }
+    print(f"{name:<8}{json.dumps(params):<28}{build_seconds:>10.2f}{query_ms:>12.3f}{row['recall']:>10.3f}")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recall@k versus latency of the vector index backends')
+    parser.add_argument('--store-dir', help='Embedding store directory (<store>/<model>/<repo>); synthetic data when omitted')
+    parser.add_argument('--size', type=int, default=200000, help='Number of synthetic embeddings')
+    parser.add_argument('--dim', type=int, default=256, help='Dimension of synthetic embeddings')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries (held-out embeddings with noise)')
+    parser.add_argument('--k', type=int, default=25, help='top_k used by the Embedding strategy')
+    parser.add_argument('--target-recall', type=float, default=0.95, help='Recall required when picking the default')
+    parser.add_argument('--report', default='./result/benchmark/vector_index_benchmark.json', help='Where to write the JSON report')
+    args = parser.parse_args()
+
+    embeddings = load_store_embeddings(args.store_dir) if args.store_dir else synthetic_embeddings(args.size, args.dim)
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.choice(len(embeddings), args.queries, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    print(f"{len(embeddings)} embeddings of dimension {embeddings.shape[1]}, {len(queries)} queries, k={args.k}")
+    print(f"{'Backend':<8}{'Params':<28}{'Build s':>10}{'Query ms':>12}{'Recall':>10}")
+
+    rows = [measure('brute', {}, lambda: BruteForceIndex(embeddings), queries, None, args.k)]
+    _, exact_indices = BruteForceIndex(embeddings).search(queries, args.k)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rows.append(measure('disk', {}, lambda: DiskIndex.build(embeddings, os.path.join(tmp_dir, 'index.npy')),
+                            queries, exact_indices, args.k))
+
+    ivf = IVFIndex(embeddings)
+    for nprobe in (1, 4, 8, 16, 32):
+        def build_ivf(nprobe=nprobe):
+            ivf.nprobe = nprobe
+            return ivf
+        rows.append(measure('ivf', {'nlist': ivf.nlist, 'nprobe': nprobe}, build_ivf, queries, exact_indices, args.k))
+
+    try:
+        hnsw = HNSWIndex(embeddings)
+        for ef_search in (32, 64, 128, 256):
+            def build_hnsw(ef_search=ef_search):
+                hnsw.ef_search = ef_search
+                return hnsw
+            rows.append(measure('hnsw', {'library': hnsw.library, 'ef_search': ef_search}, build_hnsw, queries, exact_indices, args.k))
+    except ImportError:
+        print("hnswlib/faiss not installed, skipping HNSW")
+
+    # 满足召回率要求的最快配置
+    eligible = [row for row in rows if row['recall'] >= args.target_recall]
+    best = min(eligible, key=lambda row: row['query_ms'])
+    print(f"\nFastest backend with recall >= {args.target_recall}: {best['backend']} {json.dumps(best['params'])}")
+
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump({'size': len(embeddings), 'dim': int(embeddings.shape[1]), 'k': args.k, 'rows': rows, 'recommended': best}, f, indent=2)
+    print(f"Report saved to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,39 @@
 import os
+import json
 import argparse
 import yaml
 import sys
+import copy
+import threading
+import itertools
+import functools
+import statistics
 import concurrent.futures
 from pathlib import Path
 from urllib.parse import urlparse
 from tasks.task_factory import TaskFactory
+from tasks.BaseTask import OPENAI_COMPATIBLE_API_BASE, supports_openai_batch
+from utils.tools import Agent_utils
+from utils.pipeline import Stage, StagedPipeline
+from utils.manifest import RunManifest, track_stage
+from utils.pr_context_store import DEFAULT_PR_CONTEXT_DIR
+from utils.embedding_store import DEFAULT_EMBEDDING_STORE_DIR
+from utils.vector_index import INDEX_BACKENDS
+from utils.inference_backends import INFERENCE_BACKENDS
+from utils.model_registry import registry
+from utils.hybrid_retrieval import RETRIEVAL_MODES
+from utils.context_selection import DEFAULT_MMR_LAMBDA, DEFAULT_DEDUP_THRESHOLD, DEFAULT_CONTEXT_TOKENS
+from utils.executors import BACKENDS, map_unordered, init_worker, default_threads_per_worker
+from utils.batch_judge import BATCH_BACKENDS, BatchJudge
+from utils import telemetry
 sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
 
-def generate_config(pr_url, llm_model, output_dir, strategy, judge_llm_model, api_key=None, llm_url=None):
+EMBEDDING_MODELS = ('Salesforce/codet5p-base',)
+# 支持--function-calling的策略（TOT的树搜索没有单一的对话历史，不支持原生函数调用）
+FUNCTION_CALLING_STRATEGIES = ('ReAct', 'ParallelReAct')
+
+def generate_config(pr_url, llm_model, output_dir, strategy, judge_llm_model, api_key=None, llm_url=None, function_calling=False,
+                    pr_context_dir=DEFAULT_PR_CONTEXT_DIR, pr_context_offline=False):
     """
     Generate configuration for a test plan task.
     
@@ -19,6 +44,9 @@ def generate_config(pr_url, llm_model, output_dir, strategy, judge_llm_model, ap
         strategy (str): Test plan generation strategy
         api_key (str, optional): API key for LLM
         llm_url (str, optional): API URL for LLM
+        function_calling (bool, optional): Use native tool calling (ReAct and ParallelReAct)
+        pr_context_dir (str, optional): Directory of the PR context store
+        pr_context_offline (bool, optional): Use cached PR context without contacting GitHub
         
     Returns:
         dict: Configuration dictionary
@@ -53,7 +81,10 @@ def generate_config(pr_url, llm_model, output_dir, strategy, judge_llm_model, ap
             # 'llm_url': llm_url,
             'output_dir': f'{os.path.join(output_dir, strategy, repo, "Test-Plan")}',
             'output_file_name': output_file_name,
-            'strategy': strategy
+            'strategy': strategy,
+            'function_calling': function_calling,
+            'pr_context_dir': pr_context_dir,
+            'pr_context_offline': pr_context_offline
         },
         'Judge': {
             'llm_model': judge_llm_model, 
@@ -86,7 +117,81 @@ def save_config(config, output_file='./source/config.yaml'):
     print(f"Configuration saved to {output_file}")
     return output_file
 
-def process_single_pr(config, skip_generation=False, test_plan_path=None, score=True):
+def generate_test_plan(config, reformat_pr_info=None, manifest=None):
+    """
+    为单个PR生成测试计划。
+    
+    Args:
+        config (dict): 配置字典
+        reformat_pr_info (dict, optional): 已经整理好的PR信息
+        manifest (RunManifest, optional): 运行清单，记录阶段状态和token用量
+        
+    Returns:
+        tuple: (test_plan, test_plan_path)
+    """
+    with track_stage(manifest, config, 'generate') as record:
+        # 创建和运行任务
+        task = TaskFactory.create_task(config, "generator", reformat_pr_info=reformat_pr_info)
+        try:
+            test_plan = task.run()
+        finally:
+            task.close()
+        print(f"Test plan generation completed successfully for PR: {config['Agent']['PR_url']}!")
+        
+        # 保存测试计划路径
+        test_plan_path = os.path.join(
+            config['Agent']['output_dir'],
+            config['Agent']['output_file_name']
+        )
+        record['artifact'] = test_plan_path
+        record['tokens'] = dict(task.token_usage)
+    return test_plan, test_plan_path
+
+def score_test_plan(config, test_plan_path, manifest=None):
+    """
+    对单个PR的测试计划评分并打印分数摘要。
+    
+    Args:
+        config (dict): 配置字典
+        test_plan_path (str): 测试计划的路径
+        manifest (RunManifest, optional): 运行清单，记录阶段状态和token用量
+        
+    Returns:
+        dict: 分数
+    """
+    with track_stage(manifest, config, 'judge') as record:
+        # 创建和运行法官任务
+        judge_task = TaskFactory.create_task(config, "judge", test_plan_path)
+        scores = judge_task.run()
+        print(f"Test plan scoring completed successfully for PR: {config['Agent']['PR_url']}!")
+        record['artifact'] = judge_task.scores_path
+        record['tokens'] = dict(judge_task.token_usage)
+    
+    # 打印分数摘要
+    print(f"\nTest Plan Scores for PR {config['Agent']['PR_url']}:")
+    for criterion, details in scores.get('evaluation', {}).items():
+        if isinstance(details, dict):
+            print(f"- {criterion.capitalize()}: {details['score']}/10")
+        else:
+            print(f"- {criterion.capitalize()}: {details}")
+    return scores
+
+def completed_stage(manifest, resume, config, stage):
+    """
+    续跑模式下查询已经完成的阶段。
+    
+    Returns:
+        str: 已完成阶段的产物路径，未完成或未开启续跑时返回None
+    """
+    if not resume or manifest is None:
+        return None
+    return manifest.completed_artifact(config, stage)
+
+def load_scores(scores_path):
+    with open(scores_path, 'r') as f:
+        return json.load(f)
+
+def process_single_pr(config, skip_generation=False, test_plan_path=None, score=True, manifest=None, resume=False):
     """
     处理单个PR的测试计划生成和评分。
     
@@ -95,26 +200,25 @@ def process_single_pr(config, skip_generation=False, test_plan_path=None, score=
         skip_generation (bool): 是否跳过测试计划生成
         test_plan_path (str): 现有测试计划的路径
         score (bool): 是否对测试计划进行评分
+        manifest (RunManifest, optional): 运行清单
+        resume (bool): 是否跳过清单中已经完成的阶段
         
     Returns:
         tuple: (test_plan, scores)
     """
     test_plan = None
     scores = None
+    regenerated = False
     
+    generated_path = None if skip_generation else completed_stage(manifest, resume, config, 'generate')
+    if generated_path:
+        print(f"Resuming: test plan already generated at {generated_path}")
+        test_plan_path = generated_path
     # 生成测试计划，如果不跳过
-    if not skip_generation:
+    elif not skip_generation:
         try:
-            # 创建和运行任务
-            task = TaskFactory.create_task(config, "generator")
-            test_plan = task.run()
-            print(f"Test plan generation completed successfully for PR: {config['Agent']['PR_url']}!")
-            
-            # 保存测试计划路径
-            test_plan_path = os.path.join(
-                config['Agent']['output_dir'],
-                config['Agent']['output_file_name']
-            )
+            test_plan, test_plan_path = generate_test_plan(config, manifest=manifest)
+            regenerated = True
         except Exception as e:
             print(f"Error generating test plan for PR {config['Agent']['PR_url']}: {e}")
             if not test_plan_path:
@@ -124,27 +228,131 @@ def process_single_pr(config, skip_generation=False, test_plan_path=None, score=
         # 使用提供的测试计划路径
         print(f"Skipping test plan generation, using: {test_plan_path}")
     
-    # 如果要求得分测试计划
-    if score and test_plan_path:
+    # 如果要求得分测试计划（本次重新生成的测试计划必须重新评分）
+    scores_path = completed_stage(manifest, resume, config, 'judge') if score and not regenerated else None
+    if scores_path:
+        print(f"Resuming: test plan already scored at {scores_path}")
+        scores = load_scores(scores_path)
+    elif score and test_plan_path:
         try:
-            # 创建和运行法官任务
-            judge_task = TaskFactory.create_task(config, "judge", test_plan_path)
-            scores = judge_task.run()
-            print(f"Test plan scoring completed successfully for PR: {config['Agent']['PR_url']}!")
-            
-            # 打印分数摘要
-            print(f"\nTest Plan Scores for PR {config['Agent']['PR_url']}:")
-            for criterion, details in scores['evaluation'].items():
-                if isinstance(details, dict):
-                    print(f"- {criterion.capitalize()}: {details['score']}/10")
-                else:
-                    print(f"- {criterion.capitalize()}: {details}")
-            
+            scores = score_test_plan(config, test_plan_path, manifest)
         except Exception as e:
             print(f"Error scoring test plan for PR {config['Agent']['PR_url']}: {e}")
     
     return test_plan, scores
 
+def create_batch_judge(args, manifest=None):
+    """
+    Returns:
+        BatchJudge: 指定了--batch-judge且需要评分时的批量评分器，否则为None
+    """
+    if not args.batch_judge or not args.score:
+        return None
+    return BatchJudge(
+        backend=args.batch_judge,
+        concurrency=args.judge_concurrency,
+        poll_interval=args.batch_poll_interval,
+        api_base=args.batch_api_base,
+        work_dir=os.path.join(args.output_dir, 'judge_batches'),
+        manifest=manifest
+    )
+
+def queue_batch_judge(batch_judge, config, test_plan_path, manifest=None, resume=False, regenerated=False):
+    """
+    将测试计划加入批量评分。续跑时已经评分（且本次没有重新生成）的直接读取分数。
+    
+    Returns:
+        dict: 已有的分数，加入批量评分时返回None
+    """
+    scores_path = None if regenerated else completed_stage(manifest, resume, config, 'judge')
+    if scores_path:
+        return load_scores(scores_path)
+    if test_plan_path and os.path.exists(test_plan_path):
+        batch_judge.add(config, test_plan_path)
+    return None
+
+def default_test_plan_path(config, args):
+    if args.skip_generation:
+        return args.test_plan_path
+    return os.path.join(config['Agent']['output_dir'], config['Agent']['output_file_name'])
+
+def build_config(args, pr_url, model=None, strategy=None, judge_model=None):
+    """
+    根据命令行参数为单个PR生成配置，需要时保存到文件。
+    
+    Args:
+        args: 命令行参数
+        pr_url (str): GitHub PR URL
+        model (str, optional): 覆盖--model（扫描模式）
+        strategy (str, optional): 覆盖--strategy（扫描模式）
+        judge_model (str, optional): 覆盖--judge-model（扫描模式）
+        
+    Returns:
+        dict: 配置字典
+    """
+    config = generate_config(
+        pr_url, 
+        model or args.model, 
+        args.output_dir, 
+        strategy or args.strategy,
+        judge_model or args.judge_model,
+        args.api_key,
+        args.llm_api,
+        args.function_calling,
+        args.pr_context_dir,
+        args.pr_context_offline
+    )
+    
+    # 并行ReAct：每轮最多执行的动作数（同时写入系统提示）
+    if config['Agent']['strategy'] == 'ParallelReAct':
+        config['Agent']['max_actions_per_turn'] = args.max_actions_per_turn
+    
+    # 本地预评分
+    if args.prejudge:
+        config['Judge']['prejudge'] = True
+        config['Judge']['prejudge_embedding'] = args.prejudge_embedding
+    
+    # 多样本评分
+    if args.judge_samples > 1:
+        config['Judge'].update({
+            'samples': args.judge_samples,
+            'min_samples': min(args.judge_min_samples, args.judge_samples),
+            'ci_half_width': args.judge_ci_half_width,
+            'aggregate': args.judge_aggregate
+        })
+    
+    # 嵌入策略：代码块嵌入存储
+    if config['Agent']['strategy'] == 'Embedding':
+        config['Embedding'] = {
+            'store_dir': args.embedding_store_dir,
+            'use_store': not args.no_embedding_store,
+            'index_backend': args.embedding_index,
+            'chunking': not args.no_embedding_chunking,
+            'inference_backend': args.embedding_backend,
+            'micro_batching': not args.no_query_micro_batching,
+            'retrieval': args.embedding_retrieval,
+            'top_k': args.embedding_top_k,
+            'ckg_boost': not args.no_ckg_boost,
+            'diversify': not args.no_embedding_diversify,
+            'mmr_lambda': args.embedding_mmr_lambda,
+            'dedup_threshold': args.embedding_dedup_threshold,
+            'context_tokens': args.embedding_context_tokens
+        }
+    
+    # 如果要求保存配置
+    if args.save_config:
+        # 为每个PR创建单独的配置文件，扫描模式下每个组合一个文件
+        parsed_url = urlparse(pr_url)
+        path_parts = parsed_url.path.strip('/').split('/')
+        pr_number = path_parts[4]
+        file_name = f"config_{pr_number}.yaml"
+        if model or strategy:
+            file_name = f"config_{config['Agent']['strategy']}_{config['Agent']['llm_model']}_{pr_number}.yaml"
+        config_file = os.path.join(os.path.dirname(args.config_output_dir), file_name)
+        save_config(config, config_file)
+    
+    return config
+
 def read_pr_urls_from_file(file_path):
     """
     从文件中读取PR URL列表。
@@ -160,6 +368,333 @@ def read_pr_urls_from_file(file_path):
         urls = [line.strip() for line in f.readlines() if line.strip()]
     return urls
 
+_ckg_locks = {}
+_ckg_locks_guard = threading.Lock()
+
+def fetch_pr_stage(item):
+    """
+    流水线阶段1：获取并整理PR信息（GitHub请求和LLM整理）。
+    配置在这里构建，格式错误的PR URL只使该条目失败，不会中断整个批次。
+    """
+    config = item['config'] = build_config(item['args'], item['pr_url'])
+    pr_body_path = completed_stage(item['manifest'], item['resume'], config, 'fetch')
+    if pr_body_path:
+        with open(pr_body_path, 'r') as f:
+            item['reformat_pr_info'] = json.load(f)
+        # 获取记录按PR共用，可能来自其他策略的目录；法官任务从本配置的目录读取PR信息
+        save_pr_context(config, item['reformat_pr_info'])
+        return item
+    
+    with track_stage(item['manifest'], config, 'fetch') as record:
+        item['reformat_pr_info'] = Agent_utils(config).reformat_pr_info_for_user_prompt()
+        record['artifact'] = os.path.join(config['Judge']['tmp_dir'], f"{config['Judge']['pull_number']}_PR_body.json")
+    return item
+
+def prepare_ckg_stage(item):
+    """
+    流水线阶段2：确保代码知识图谱已经构建，同一仓库只构建一次。
+    """
+    config = item['config']
+    if item['skip_generation'] or config['Agent']['strategy'] == 'Embedding':
+        return item
+    
+    graph_pkl_dir = config['CKG']['graph_pkl_dir']
+    with _ckg_locks_guard:
+        lock = _ckg_locks.setdefault(graph_pkl_dir, threading.Lock())
+    with lock:
+        if not os.path.exists(graph_pkl_dir):
+            from CKG.construct_graph import build_code_graph
+            build_code_graph(config['CKG']['project_dir'], graph_pkl_dir)
+    return item
+
+def generate_stage(item):
+    """
+    流水线阶段3：生成测试计划。
+    """
+    if item['skip_generation']:
+        print(f"Skipping test plan generation, using: {item['test_plan_path']}")
+        return item
+    generated_path = completed_stage(item['manifest'], item['resume'], item['config'], 'generate')
+    if generated_path:
+        print(f"Resuming: test plan already generated at {generated_path}")
+        item['test_plan_path'] = generated_path
+        return item
+    item['test_plan'], item['test_plan_path'] = generate_test_plan(item['config'], item['reformat_pr_info'], item['manifest'])
+    item['regenerated'] = True
+    return item
+
+def judge_stage(item):
+    """
+    流水线阶段4：对测试计划评分。
+    """
+    if not item['score']:
+        return item
+    if item.get('batch_judge') is not None:
+        item['scores'] = queue_batch_judge(
+            item['batch_judge'], item['config'], item['test_plan_path'],
+            item['manifest'], item['resume'], item.get('regenerated', False)
+        )
+        return item
+    scores_path = None if item.get('regenerated') else completed_stage(item['manifest'], item['resume'], item['config'], 'judge')
+    if scores_path:
+        print(f"Resuming: test plan already scored at {scores_path}")
+        item['scores'] = load_scores(scores_path)
+    elif item['test_plan_path']:
+        item['scores'] = score_test_plan(item['config'], item['test_plan_path'], item['manifest'])
+    return item
+
+def run_pipeline(args, pr_urls, manifest=None):
+    """
+    使用分阶段流水线处理多个PR：获取PR信息、准备代码知识图谱、生成、评分。
+    每个阶段有独立的线程池，阶段之间用有界队列连接。
+    
+    Args:
+        args: 命令行参数
+        pr_urls (list): PR URL列表
+        manifest (RunManifest, optional): 运行清单
+        
+    Returns:
+        dict: 每个PR的结果
+    """
+    stages = [
+        Stage('fetch', fetch_pr_stage, args.fetch_workers, args.queue_size),
+        Stage('ckg', prepare_ckg_stage, args.ckg_workers, args.queue_size),
+        Stage('generate', generate_stage, args.generate_workers, args.queue_size),
+        Stage('judge', judge_stage, args.judge_workers, args.queue_size),
+    ]
+    pipeline = StagedPipeline(stages)
+    batch_judge = create_batch_judge(args, manifest)
+    
+    items = (
+        {
+            'pr_url': pr_url,
+            'args': args,
+            'config': None,
+            'skip_generation': args.skip_generation,
+            'score': args.score,
+            'test_plan': None,
+            'test_plan_path': args.test_plan_path,
+            'scores': None,
+            'manifest': manifest,
+            'resume': args.resume,
+            'batch_judge': batch_judge
+        }
+        for pr_url in pr_urls
+    )
+    
+    print(f"Processing {len(pr_urls)} PRs with a staged pipeline")
+    processed = pipeline.run(items)
+    pipeline.report()
+    
+    results = {}
+    for item in processed:
+        if item.get('error'):
+            results[item['pr_url']] = {'error': item['error']}
+        else:
+            results[item['pr_url']] = {'test_plan': item['test_plan'], 'scores': item['scores']}
+    
+    # 所有PR生成完毕后一次性提交批量评分
+    if batch_judge is not None:
+        for result in batch_judge.run():
+            results[result['pr_url']]['scores'] = result.get('scores')
+    return results
+
+def save_pr_context(config, reformat_pr_info):
+    """
+    将整理好的PR信息写入该配置的临时目录，供法官任务读取。
+    
+    Returns:
+        str: 保存文件的路径
+    """
+    tmp_dir = config['Judge']['tmp_dir']
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, f"{config['Judge']['pull_number']}_PR_body.json")
+    with open(tmp_path, 'w') as f:
+        json.dump(reformat_pr_info, f)
+    return tmp_path
+
+def sweep_single_pr(args, pr_url, manifest=None, batch_judge=None):
+    """
+    扫描模式下处理单个PR：PR信息只获取和整理一次，
+    所有(策略, 模型)组合在其上并发生成，生成结束后该PR的所有评分请求一起并发提交。
+    
+    Args:
+        args: 命令行参数
+        pr_url (str): GitHub PR URL
+        manifest (RunManifest, optional): 运行清单
+        batch_judge (BatchJudge, optional): 批量评分器，提供时评分请求推迟到所有PR生成完毕后统一提交
+        
+    Returns:
+        dict: {"策略/模型": {'config', 'test_plan_path', 'scores': {法官模型: 分数}}}
+    """
+    models = args.models or [args.model]
+    strategies = args.strategies or [args.strategy]
+    judge_models = args.judge_models or [args.judge_model]
+    
+    # 1. 获取并整理PR信息（每个PR一次）
+    base_config = build_config(args, pr_url, models[0], strategies[0], judge_models[0])
+    pr_body_path = completed_stage(manifest, args.resume, base_config, 'fetch')
+    if pr_body_path:
+        with open(pr_body_path, 'r') as f:
+            reformat_pr_info = json.load(f)
+    else:
+        with track_stage(manifest, base_config, 'fetch') as record:
+            reformat_pr_info = Agent_utils(base_config).reformat_pr_info_for_user_prompt()
+            record['artifact'] = save_pr_context(base_config, reformat_pr_info)
+    
+    variants = {}
+    for strategy, model in itertools.product(strategies, models):
+        config = build_config(args, pr_url, model, strategy, judge_models[0])
+        save_pr_context(config, reformat_pr_info)
+        variants[f"{strategy}/{model}"] = {'config': config, 'test_plan_path': None, 'regenerated': False, 'scores': {}}
+    
+    def generate_variant(variant):
+        generated_path = completed_stage(manifest, args.resume, variant['config'], 'generate')
+        if generated_path:
+            variant['test_plan_path'] = generated_path
+            return
+        _, variant['test_plan_path'] = generate_test_plan(variant['config'], reformat_pr_info, manifest)
+        variant['regenerated'] = True
+    
+    def judge_variant(variant, judge_model):
+        config = copy.deepcopy(variant['config'])
+        config['Judge']['llm_model'] = judge_model
+        if batch_judge is not None:
+            return queue_batch_judge(batch_judge, config, variant['test_plan_path'], manifest, args.resume, variant['regenerated'])
+        scores_path = None if variant['regenerated'] else completed_stage(manifest, args.resume, config, 'judge')
+        if scores_path:
+            return load_scores(scores_path)
+        return score_test_plan(config, variant['test_plan_path'], manifest)
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.sweep_workers) as executor:
+        # 2. 并发生成所有组合的测试计划
+        futures = {executor.submit(generate_variant, variant): name for name, variant in variants.items()}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error generating test plan ({futures[future]}) for PR {pr_url}: {e}")
+                variants[futures[future]]['error'] = str(e)
+        
+        # 3. 该PR的所有评分请求一起提交
+        if args.score:
+            futures = {
+                executor.submit(judge_variant, variant, judge_model): (name, judge_model)
+                for name, variant in variants.items() if variant['test_plan_path']
+                for judge_model in judge_models
+            }
+            for future in concurrent.futures.as_completed(futures):
+                name, judge_model = futures[future]
+                try:
+                    scores = future.result()
+                    if scores is not None:
+                        variants[name]['scores'][judge_model] = scores
+                except Exception as e:
+                    print(f"Error scoring test plan ({name}, judge {judge_model}) for PR {pr_url}: {e}")
+    
+    return {
+        name: {key: value for key, value in variant.items() if key != 'regenerated'}
+        for name, variant in variants.items()
+    }
+
+def summarize_sweep(results):
+    """
+    打印每个(策略/模型, 法官模型)组合的平均总分。
+    """
+    totals = {}
+    for pr_result in results.values():
+        for name, variant in pr_result.items():
+            for judge_model, scores in variant.get('scores', {}).items():
+                try:
+                    total = float(scores['evaluation']['total_score'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                totals.setdefault((name, judge_model), []).append(total)
+    
+    print(f"\n{'Strategy/Model':<45}{'Judge':<30}{'PRs':>5}{'Mean total':>12}")
+    for (name, judge_model), values in sorted(totals.items()):
+        print(f"{name:<45}{judge_model:<30}{len(values):>5}{statistics.mean(values):>12.2f}")
+
+def run_sweep(args, pr_urls, manifest=None):
+    """
+    扫描模式：对模型、策略和法官模型的所有组合生成和评分。
+    
+    Args:
+        args: 命令行参数
+        pr_urls (list): PR URL列表
+        manifest (RunManifest, optional): 运行清单
+        
+    Returns:
+        dict: 每个PR每个组合的结果
+    """
+    results = {}
+    batch_judge = create_batch_judge(args, manifest)
+    pr_workers = args.max_workers if args.multi_threading else 1
+    print(f"Sweeping {len(pr_urls)} PRs: strategies={args.strategies or [args.strategy]}, "
+          f"models={args.models or [args.model]}, judges={args.judge_models or [args.judge_model]}")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=pr_workers) as executor:
+        future_to_url = {executor.submit(sweep_single_pr, args, pr_url, manifest, batch_judge): pr_url for pr_url in pr_urls}
+        for future in concurrent.futures.as_completed(future_to_url):
+            pr_url = future_to_url[future]
+            try:
+                results[pr_url] = future.result()
+            except Exception as e:
+                print(f"Sweeping PR {pr_url} generated an exception: {e}")
+                results[pr_url] = {'error': str(e)}
+    
+    # 所有PR的所有组合生成完毕后一次性提交批量评分
+    if batch_judge is not None:
+        for result in batch_judge.run():
+            if 'scores' in result:
+                variant = results[result['pr_url']][f"{result['strategy']}/{result['llm_model']}"]
+                variant['scores'][result['judge_model']] = result['scores']
+    for pr_result in results.values():
+        for variant in pr_result.values():
+            if isinstance(variant, dict):
+                variant.pop('config', None)
+    
+    summarize_sweep({url: result for url, result in results.items() if 'error' not in result})
+    return results
+
+def prefetch_single_pr(args, pr_url):
+    """
+    获取并整理单个PR的信息（写入PR信息缓存）。配置在工作线程中构建，格式错误的URL只影响该PR。
+    
+    Args:
+        args: 命令行参数
+        pr_url (str): GitHub PR URL
+        
+    Returns:
+        dict: 整理好的PR信息
+    """
+    return Agent_utils(build_config(args, pr_url)).reformat_pr_info_for_user_prompt()
+
+def prefetch(args):
+    """
+    批量预热PR信息缓存：对列表中的每个PR获取并整理PR信息，已缓存（head SHA未变）的PR不会再调用LLM。
+    
+    Args:
+        args: 命令行参数
+        
+    Returns:
+        int: 失败的PR数量
+    """
+    pr_urls = read_pr_urls_from_file(args.pr_list) if os.path.isfile(args.pr_list) else [args.pr_list]
+    print(f"Prefetching PR context for {len(pr_urls)} PRs into {args.pr_context_dir}")
+    
+    failed = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        future_to_url = {executor.submit(prefetch_single_pr, args, pr_url): pr_url for pr_url in pr_urls}
+        for future in concurrent.futures.as_completed(future_to_url):
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Prefetching PR {future_to_url[future]} failed: {e}")
+    
+    print(f"Prefetched {len(pr_urls) - failed}/{len(pr_urls)} PRs")
+    return failed
+
 def run(args):
     """
     运行测试计划生成和评分任务。
@@ -182,87 +717,80 @@ def run(args):
     
     results = {}
     
+    # 启动时预加载嵌入模型（进程内共用一份）。进程后端的工作者在初始化时各自加载，
+    # 父进程不再加载：既浪费一份模型，fork时父进程已初始化的torch线程池也可能使工作者死锁
+    uses_process_workers = (args.backend == 'process' and args.multi_threading and len(pr_urls) > 1
+                            and not (args.models or args.strategies or args.judge_models or args.pipeline))
+    if args.preload_models and not uses_process_workers and (args.strategy == 'Embedding' or 'Embedding' in (args.strategies or [])):
+        registry.prewarm(EMBEDDING_MODELS, args.embedding_backend)
+    
+    # 运行清单逐条追加写入，中断后可以用--resume跳过已完成的阶段
+    manifest = RunManifest(args.output_dir)
+    if args.resume:
+        print(f"Resuming from run manifest: {manifest.path}")
+    
+    # 结构化追踪：每次LLM、工具和GitHub调用写入一条span，用python utils/telemetry.py汇总
+    if args.telemetry:
+        run_id = telemetry.configure(os.path.join(args.output_dir, 'telemetry.jsonl'))
+        print(f"Telemetry run {run_id}: {os.path.join(args.output_dir, 'telemetry.jsonl')}")
+    
+    if args.models or args.strategies or args.judge_models:
+        return run_sweep(args, pr_urls, manifest)
+    if args.pipeline:
+        return run_pipeline(args, pr_urls, manifest)
+    
+    # 批量评分时先只生成，最后统一评分
+    batch_judge = create_batch_judge(args, manifest)
+    score = args.score and batch_judge is None
+    configs = {}
+    
     if args.multi_threading and len(pr_urls) > 1:
-        # 使用线程池并发处理多个PR
-        print(f"Processing {len(pr_urls)} PRs in parallel with {args.max_workers} workers")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=args.max_workers) as executor:
-            # 为每个PR创建配置
-            configs = []
-            for pr_url in pr_urls:
-                config = generate_config(
-                    pr_url, 
-                    args.model, 
-                    args.output_dir, 
-                    args.strategy,
-                    args.judge_model,
-                    args.api_key,
-                    args.llm_api,
-                )
-                
-                # 如果要求保存配置
-                if args.save_config:
-                    # 为每个PR创建单独的配置文件
-                    parsed_url = urlparse(pr_url)
-                    path_parts = parsed_url.path.strip('/').split('/')
-                    pr_number = path_parts[4]
-                    config_file = os.path.join(os.path.dirname(args.config_output_dir), f"config_{pr_number}.yaml")
-                    save_config(config, config_file)
-                
-                configs.append(config)
-            
-            # 提交所有任务到线程池
-            future_to_config = {
-                executor.submit(
-                    process_single_pr, 
-                    config, 
-                    args.skip_generation, 
-                    args.test_plan_path, 
-                    args.score
-                ): config for config in configs
-            }
-            
-            # 收集结果
-            for future in concurrent.futures.as_completed(future_to_config):
-                config = future_to_config[future]
-                pr_url = config['Agent']['PR_url']
-                try:
-                    test_plan, scores = future.result()
-                    results[pr_url] = {
-                        'test_plan': test_plan,
-                        'scores': scores
-                    }
-                except Exception as e:
-                    print(f"Processing PR {pr_url} generated an exception: {e}")
-                    results[pr_url] = {
-                        'error': str(e)
-                    }
+        # 使用所选的执行后端并发处理多个PR（线程或进程）
+        print(f"Processing {len(pr_urls)} PRs in parallel with {args.max_workers} {args.backend} workers")
+        # 为每个PR创建配置
+        configs = {pr_url: build_config(args, pr_url) for pr_url in pr_urls}
+        
+        # 每个工作者限制torch线程数；嵌入策略预加载CodeT5+模型
+        torch_threads = args.torch_threads or default_threads_per_worker(args.backend, args.max_workers)
+        preload_models = EMBEDDING_MODELS if args.strategy == 'Embedding' and args.preload_models else ()
+        worker = functools.partial(
+            process_single_pr,
+            skip_generation=args.skip_generation,
+            test_plan_path=args.test_plan_path,
+            score=score,
+            manifest=manifest,
+            resume=args.resume
+        )
+        
+        # 收集结果
+        for config, result, error in map_unordered(
+            worker, list(configs.values()), args.backend, args.max_workers,
+            initializer=init_worker, initargs=(torch_threads, preload_models, args.embedding_backend)
+        ):
+            pr_url = config['Agent']['PR_url']
+            if error is None:
+                test_plan, scores = result
+                results[pr_url] = {
+                    'test_plan': test_plan,
+                    'scores': scores
+                }
+            else:
+                print(f"Processing PR {pr_url} generated an exception: {error}")
+                results[pr_url] = {
+                    'error': str(error)
+                }
     else:
         # 顺序处理PR
         for pr_url in pr_urls:
-            config = generate_config(
-                pr_url, 
-                args.model, 
-                args.output_dir, 
-                args.strategy,
-                args.judge_model,
-                args.api_key,
-                args.llm_api
-            )
-            
-            # 如果要求保存配置
-            if args.save_config:
-                # 为每个PR创建单独的配置文件
-                parsed_url = urlparse(pr_url)
-                path_parts = parsed_url.path.strip('/').split('/')
-                pr_number = path_parts[4]
-                config_file = os.path.join(os.path.dirname(args.config_output_dir), f"config_{pr_number}.yaml")
-                save_config(config, config_file)
+            config = configs[pr_url] = build_config(args, pr_url)
             
             test_plan, scores = process_single_pr(
                 config, 
                 args.skip_generation, 
                 args.test_plan_path, 
-                args.score
+                score,
+                manifest,
+                args.resume
             )
             
             results[pr_url] = {
@@ -270,6 +798,16 @@ def run(args):
                 'scores': scores
             }
     
+    if batch_judge is not None:
+        for pr_url, result in results.items():
+            if 'error' not in result:
+                result['scores'] = queue_batch_judge(
+                    batch_judge, configs[pr_url], default_test_plan_path(configs[pr_url], args),
+                    manifest, args.resume, regenerated=result['test_plan'] is not None
+                )
+        for result in batch_judge.run():
+            results[result['pr_url']]['scores'] = result.get('scores')
+    
     return results
 
 def main():
@@ -302,9 +840,13 @@ def main():
     
     # 任务设置
     parser.add_argument('--strategy', type=str, 
-                       choices=['InOut', 'Embedding', 'ReAct', 'TOT'], 
+                       choices=['InOut', 'Embedding', 'ReAct', 'ParallelReAct', 'TOT'], 
                        default='ReAct', 
                        help='Test plan generation strategy')
+    parser.add_argument('--function-calling', action='store_true',
+                       help='Use native tool calling instead of prompt-described tools (ReAct and ParallelReAct only)')
+    parser.add_argument('--max-actions-per-turn', type=int, default=5,
+                       help='Maximum number of actions executed per LLM response (ParallelReAct only)')
     
     # 裁判设置
     parser.add_argument('--score', default=True, type=bool,
@@ -321,14 +863,130 @@ def main():
                        help='Enable multi-threading for processing multiple PRs')
     parser.add_argument('--max-workers', type=int, default=5,
                        help='Maximum number of worker threads when multi-threading is enabled')
+    parser.add_argument('--backend', choices=BACKENDS, default='thread',
+                       help='Executor backend for --multi-threading (use process for CPU-heavy strategies such as Embedding)')
+    parser.add_argument('--torch-threads', type=int, default=0,
+                       help='torch threads per worker (0: split CPU cores across process workers)')
+    parser.add_argument('--preload-models', action='store_true',
+                       help='Load the embedding model at startup (once per process) instead of on the first Embedding task')
+    # 流水线参数
+    parser.add_argument('--pipeline', action='store_true',
+                       help='Process PRs with a staged fetch -> CKG -> generate -> judge pipeline')
+    parser.add_argument('--fetch-workers', type=int, default=4,
+                       help='Worker threads for the PR fetch stage')
+    parser.add_argument('--ckg-workers', type=int, default=1,
+                       help='Worker threads for the CKG preparation stage')
+    parser.add_argument('--generate-workers', type=int, default=5,
+                       help='Worker threads for the test plan generation stage')
+    parser.add_argument('--judge-workers', type=int, default=5,
+                       help='Worker threads for the judging stage')
+    parser.add_argument('--queue-size', type=int, default=10,
+                       help='Capacity of the queue in front of each pipeline stage')
+    
+    # 扫描参数：给出任意一个列表即进入扫描模式
+    parser.add_argument('--models', nargs='+',
+                       help='Sweep: LLM models to generate with (defaults to --model)')
+    parser.add_argument('--strategies', nargs='+',
+                       choices=['InOut', 'Embedding', 'ReAct', 'ParallelReAct', 'TOT'],
+                       help='Sweep: strategies to generate with (defaults to --strategy)')
+    parser.add_argument('--judge-models', nargs='+',
+                       help='Sweep: judge models to score every variant with (defaults to --judge-model)')
+    parser.add_argument('--sweep-workers', type=int, default=4,
+                       help='Concurrent generation/judge calls per PR in sweep mode')
+    parser.add_argument('--telemetry', action='store_true',
+                       help='Trace latency, tokens and cost of every LLM/tool/GitHub call to <output-dir>/telemetry.jsonl')
+    # 预评分参数
+    parser.add_argument('--prejudge', action='store_true',
+                       help='Score candidate vs reference locally (BM25) first and skip the LLM judge for degenerate plans')
+    parser.add_argument('--prejudge-embedding', action='store_true',
+                       help='Add CodeT5+ embedding cosine similarity to the pre-judge')
+    # 多样本评分参数
+    parser.add_argument('--judge-samples', type=int, default=1,
+                       help='Maximum judge samples per test plan; >1 aggregates samples drawn concurrently')
+    parser.add_argument('--judge-min-samples', type=int, default=3,
+                       help='Samples drawn in the first round before checking the confidence interval')
+    parser.add_argument('--judge-ci-half-width', type=float, default=1.0,
+                       help='Stop sampling once the 95%% CI half-width of the total score is below this')
+    parser.add_argument('--judge-aggregate', choices=['median', 'trimmed_mean', 'mean'], default='median',
+                       help='How judge samples are aggregated')
+    # 批量评分参数
+    parser.add_argument('--batch-judge', choices=BATCH_BACKENDS,
+                       help='Defer scoring and submit all judge requests at once (openai batch API, local stand-in, or concurrent)')
+    parser.add_argument('--judge-concurrency', type=int, default=16,
+                       help='Concurrent judge requests for the local and concurrent batch backends')
+    parser.add_argument('--batch-poll-interval', type=int, default=30,
+                       help='Seconds between status polls of an OpenAI batch')
+    parser.add_argument('--batch-api-base', default=OPENAI_COMPATIBLE_API_BASE,
+                       help='Batch API base URL for --batch-judge openai (must accept OPENAI_API_KEY)')
+    # PR信息缓存参数
+    parser.add_argument('--pr-context-dir', default=DEFAULT_PR_CONTEXT_DIR,
+                       help='Directory of the PR context store shared by all strategies and the judge')
+    parser.add_argument('--pr-context-offline', action='store_true',
+                       help='Use the cached PR context without contacting GitHub when available')
+    # 嵌入策略参数
+    parser.add_argument('--embedding-store-dir', default=DEFAULT_EMBEDDING_STORE_DIR,
+                       help='Directory of the persistent code embedding store shared across PRs and runs')
+    parser.add_argument('--no-embedding-store', action='store_true',
+                       help='Re-encode every code block instead of reusing stored embeddings')
+    parser.add_argument('--embedding-index', choices=INDEX_BACKENDS, default='auto',
+                       help='Vector index for code retrieval (auto: exact up to 50k blocks, HNSW/IVF beyond)')
+    parser.add_argument('--no-embedding-chunking', action='store_true',
+                       help='Truncate long code blocks at 512 tokens instead of embedding overlapping chunks')
+    parser.add_argument('--embedding-backend', choices=INFERENCE_BACKENDS, default='torch',
+                       help='CodeT5+ inference backend; int8/onnx run on CPU and fall back to fp32 if the accuracy guard fails')
+    parser.add_argument('--no-query-micro-batching', action='store_true',
+                       help='Encode each query with its own forward pass instead of coalescing concurrent queries')
+    parser.add_argument('--embedding-retrieval', choices=RETRIEVAL_MODES, default='hybrid',
+                       help='hybrid fuses dense and identifier BM25 rankings (RRF); dense uses CodeT5+ similarity only')
+    parser.add_argument('--embedding-top-k', type=int, default=25,
+                       help='Code blocks put into the Embedding prompt')
+    parser.add_argument('--no-ckg-boost', action='store_true',
+                       help='Do not boost changed files and their code knowledge graph neighbours in hybrid retrieval')
+    parser.add_argument('--no-embedding-diversify', action='store_true',
+                       help='Put all retrieved blocks into the prompt instead of dropping near-duplicates with MMR')
+    parser.add_argument('--embedding-mmr-lambda', type=float, default=DEFAULT_MMR_LAMBDA,
+                       help='MMR trade-off between relevance (1.0) and diversity (0.0)')
+    parser.add_argument('--embedding-dedup-threshold', type=float, default=DEFAULT_DEDUP_THRESHOLD,
+                       help='Cosine similarity at which a retrieved block counts as a near-duplicate of a selected one')
+    parser.add_argument('--embedding-context-tokens', type=int, default=DEFAULT_CONTEXT_TOKENS,
+                       help='Token budget of the similar code section of the Embedding prompt (0: unlimited)')
+    # 续跑参数
+    parser.add_argument('--resume', action='store_true',
+                       help='Skip stages recorded as completed in the run manifest under --output-dir and retry the rest')
+    
+    # 子命令：预热PR信息缓存
+    subparsers = parser.add_subparsers(dest='command')
+    prefetch_parser = subparsers.add_parser('prefetch', help='Warm the PR context store from a PR list file')
+    prefetch_parser.add_argument('pr_list', help='File containing PR URLs (or a single PR URL)')
+    prefetch_parser.add_argument('--workers', type=int, default=8,
+                                help='Concurrent PRs to fetch')
     
     args = parser.parse_args()
     
+    if args.command == 'prefetch':
+        return 1 if prefetch(args) else 0
+    
     # 验证论点
     if args.skip_generation and not args.test_plan_path:
         print("Error: --test-plan-path is required when using --skip-generation")
         return 1
-    
+    unsupported = [strategy for strategy in (args.strategies or [args.strategy]) if strategy not in FUNCTION_CALLING_STRATEGIES]
+    if args.function_calling and unsupported:
+        print(f"Error: --function-calling is only supported by {', '.join(FUNCTION_CALLING_STRATEGIES)} (got {', '.join(unsupported)})")
+        return 1
+    if args.max_actions_per_turn < 1:
+        print("Error: --max-actions-per-turn must be at least 1")
+        return 1
+    # 批量评分的限制在生成开始前检查，避免生成全部完成后才失败
+    if args.batch_judge and args.score:
+        unsupported = [model for model in (args.judge_models or [args.judge_model]) if not supports_openai_batch(model)]
+        if args.batch_judge == 'openai' and unsupported:
+            print(f"Error: --batch-judge openai only supports OpenAI-routed judge models (got {', '.join(unsupported)}); use --batch-judge concurrent")
+            return 1
+        if args.judge_samples > 1:
+            print("Error: --judge-samples is not supported with --batch-judge (each job is scored with a single request)")
+            return 1
+
     try:
         results = run(args)
         print(f"Processed {len(results)} PRs")
@@ -339,4 +997,4 @@ def main():
     return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -3,9 +3,38 @@ import json
 import yaml
 import requests
 import time
+import threading
 from abc import ABC, abstractmethod
 from datetime import datetime
 from utils.tools import Agent_utils
+from utils.tool_registry import ToolExecutor, create_agent_tool_registry
+from utils.function_calling import tools_for_model, parse_tool_response
+from utils import telemetry
+
+# OPENAI_API_KEY对应的OpenAI兼容代理
+OPENAI_COMPATIBLE_API_BASE = "https://api.gptsapi.net/v1"
+DASHSCOPE_API_BASE = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+
+
+def llm_endpoint(model):
+    """
+    模型对应的接口地址和密钥：deepseek/qwen使用DashScope，claude使用代理的messages接口，其他模型使用代理的chat/completions接口。
+    
+    Returns:
+        tuple: (api_key, url)
+    """
+    if 'deepseek' in model or 'qwen' in model:
+        return "sk-6072ffbc181542f2862a1fd04d8291c0", f"{DASHSCOPE_API_BASE}/chat/completions"
+    if 'claude' in model:
+        return os.environ.get('OPENAI_API_KEY'), f"{OPENAI_COMPATIBLE_API_BASE}/messages"
+    return os.environ.get('OPENAI_API_KEY'), f"{OPENAI_COMPATIBLE_API_BASE}/chat/completions"
+
+
+def supports_openai_batch(model):
+    """
+    只有路由到OPENAI_API_KEY对应的chat/completions接口的模型可以通过OpenAI Batch API评分。
+    """
+    return llm_endpoint(model)[1] == f"{OPENAI_COMPATIBLE_API_BASE}/chat/completions"
 
 class BaseTask(ABC):
     """
@@ -13,86 +42,156 @@ class BaseTask(ABC):
     该类定义了共同的接口并提供共享功能。
     """
     
-    def __init__(self, config):
+    def __init__(self, config, reformat_pr_info=None):
         """
         用提供的配置初始化任务。
         
         Args:
             config (dict): 任务的配置字典
+            reformat_pr_info (dict, optional): 已经整理好的PR信息，提供时不再请求GitHub和LLM
         """
         self.config = config
         self.agent_utils = Agent_utils(config)
-        self.reformat_pr_info = self.agent_utils.reformat_pr_info_for_user_prompt()
+        if reformat_pr_info is None:
+            reformat_pr_info = self.agent_utils.reformat_pr_info_for_user_prompt()
+        self.reformat_pr_info = reformat_pr_info
         self.PR_Content = self.reformat_pr_info['PR_Content']
         self.PR_Changed_Files = self.reformat_pr_info['PR_Changed_Files']
+        self.tool_executor = ToolExecutor(
+            create_agent_tool_registry(self.agent_utils),
+            max_workers=config['Agent'].get('tool_workers', 8),
+            timeouts=config['Agent'].get('tool_timeouts', None)
+        )
+        self.token_usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'llm_calls': 0}
+        self.usage_lock = threading.Lock()
     
-    def llm(self, system_prompt, user_prompt, model):
+    def llm(self, system_prompt, user_prompt, model, response_format=None):
         """
         用给定的提示调用语言模型API。
         
         Args:
             system_prompt (str): 系统提示为LLM
             user_prompt (str, optional): 用户提示llm
+            model (str): 模型名称
+            response_format (str, optional): 为'json'时要求模型只输出JSON
             
         Returns:
             str: LLM响应内容
         """
-            # Default API settings based on model
-        
-        if 'deepseek' in model or 'qwen' in model:
-            api_key = "sk-6072ffbc181542f2862a1fd04d8291c0"
-            url = "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"
-        else:
-            api_key = os.environ.get('OPENAI_API_KEY')
-            if 'claude' in model:
-                url = "https://api.gptsapi.net/v1/messages"
-            else:
-                url = "https://api.gptsapi.net/v1/chat/completions"
-
+        data = self.build_chat_request(system_prompt, user_prompt, model, response_format)
+        response_dict = self.post_llm_request(data, model)
+        return self.parse_chat_response(response_dict, model, response_format)
+    
+    def build_chat_request(self, system_prompt, user_prompt, model, response_format=None):
+        """
+        构建单轮对话的请求体（批量接口也使用同样的请求体）。
+        """
+        messages = [{"role": "user", "content": user_prompt}]
         
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
+        # JSON模式：OpenAI兼容接口使用response_format，Claude通过预填充"{"引导输出JSON
+        if response_format == 'json' and 'claude' in model:
+            messages.append({"role": "assistant", "content": "{"})
+        data = self.build_llm_request(system_prompt, messages, model)
+        if response_format == 'json' and 'claude' not in model:
+            data['response_format'] = {"type": "json_object"}
+        return data
+    
+    def parse_chat_response(self, response_dict, model, response_format=None):
+        """
+        从接口返回的JSON中取出回复文本。
+        """
+        if 'claude' in model:
+            content = response_dict["content"][0]["text"]
+            if response_format == 'json':
+                content = "{" + content
+        else:    
+            content = response_dict['choices'][0]['message']['content']
+        return content
+    
+    def llm_with_tools(self, system_prompt, messages, model, tool_schemas):
+        """
+        使用服务商原生的函数调用接口调用语言模型（OpenAI tools / Anthropic tool_use）。
         
+        Args:
+            system_prompt (str): 系统提示为LLM
+            messages (list): 对话消息（不含系统提示）
+            model (str): 模型名称
+            tool_schemas (list): 工具描述，见ToolRegistry.schemas()
+            
+        Returns:
+            dict: {'content': str, 'tool_calls': [{'id', 'name', 'arguments'}], 'assistant_message': dict}
+        """
+        data = self.build_llm_request(system_prompt, messages, model)
+        data['tools'] = tools_for_model(tool_schemas, model)
+        response_dict = self.post_llm_request(data, model)
+        return parse_tool_response(response_dict, model)
+    
+    def build_llm_request(self, system_prompt, messages, model):
+        """
+        构建请求体，Claude的系统提示单独传入，其他模型作为第一条消息。
+        """
         if 'claude' in model:
-            data = {
+            return {
                 "model": model,
                 "system": system_prompt,
-                "messages": [
-                    {"role": "user", "content": user_prompt}
-                ]
-            }
-        else:    
-            data = {
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
+                "messages": messages
             }
+        return {
+            "model": model,
+            "messages": [{"role": "system", "content": system_prompt}] + messages
+        }
+    
+    def post_llm_request(self, data, model):
+        """
+        发送请求到对应模型的接口，失败时指数退避重试。
+        
+        Returns:
+            dict: 接口返回的JSON
+        """
+        api_key, url = llm_endpoint(model)
+        
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
         
         max_retries = 5
-        for attempt in range(max_retries):
-            try:
-                response = requests.post(url, json=data, headers=headers)
-                response.raise_for_status()
-                break
-            except requests.exceptions.RequestException as e:
-                if attempt < max_retries - 1:
-                    print(f"Request failed. Retrying... (Attempt {attempt + 1}/{max_retries})")
-                    time.sleep(2 ** attempt)
-                    continue
-                else:
-                    print(e)
-                    raise e
+        with telemetry.span('llm', model) as record:
+            for attempt in range(max_retries):
+                record['retries'] = attempt
+                try:
+                    response = requests.post(url, json=data, headers=headers)
+                    response.raise_for_status()
+                    break
+                except requests.exceptions.RequestException as e:
+                    if attempt < max_retries - 1:
+                        print(f"Request failed. Retrying... (Attempt {attempt + 1}/{max_retries})")
+                        time.sleep(2 ** attempt)
+                        continue
+                    else:
+                        print(e)
+                        raise e
+            
+            response_dict = json.loads(response.text.strip())
+            record['tokens_in'], record['tokens_out'] = self.record_usage(response_dict)
+            record['cost'] = telemetry.estimate_cost(model, record['tokens_in'], record['tokens_out'])
+        return response_dict
+    
+    def record_usage(self, response_dict):
+        """
+        累计本任务的token用量（OpenAI为prompt/completion_tokens，Claude为input/output_tokens）。
         
-        response_dict = json.loads(response.text.strip())
-        if 'claude' in model:
-            content = response_dict["content"][0]["text"]
-        else:    
-            content = response_dict['choices'][0]['message']['content']
-        return content
+        Returns:
+            tuple: 本次调用的(输入token数, 输出token数)
+        """
+        usage = response_dict.get('usage') or {}
+        prompt_tokens = usage.get('prompt_tokens', usage.get('input_tokens', 0)) or 0
+        completion_tokens = usage.get('completion_tokens', usage.get('output_tokens', 0)) or 0
+        with self.usage_lock:
+            self.token_usage['prompt_tokens'] += prompt_tokens
+            self.token_usage['completion_tokens'] += completion_tokens
+            self.token_usage['llm_calls'] += 1
+        return prompt_tokens, completion_tokens
     
     def execute_tool(self, tool_name, tool_param):
         """
@@ -105,40 +204,26 @@ class BaseTask(ABC):
         Returns:
             dict or str: 执行工具的结果
         """
-        observation = ''
-        
-        if tool_name == 'search_class_in_project' or tool_name == 'search_function_in_project':
-            entity_type = tool_name.split('_')[1]
-            tool_params_name = tool_param.get(f"{entity_type}_name", '')
-            observation = self.agent_utils.search_entity_in_project(tool_params_name)
-        
-        elif tool_name == 'search_code_dependencies':
-            entity_name = tool_param.get('entity_name', '')
-            observation = self.agent_utils.search_code_dependencies(entity_name)
-        
-        elif tool_name == 'search_files_path_by_pattern':
-            pattern = tool_param.get('pattern', '')
-            observation = self.agent_utils.search_files_path_by_pattern(pattern)
-        
-        elif tool_name == 'view_file_contents':
-            file_path = tool_param.get('file_path', '')
-            index = tool_param.get('index', 0)
-            start_line = tool_param.get('start_line', None)
-            end_line = tool_param.get('end_line', None)
-            observation = self.agent_utils.view_file_contents(file_path, index, start_line, end_line)
-        
-        elif tool_name == 'view_code_changes':
-            file_path = tool_param.get('file_path', '')
-            observation = self.agent_utils.view_code_changes(file_path)
-        
-        elif tool_name == 'explore_project_structure':
-            root_path = tool_param.get("root_path", "/")
-            max_depth = tool_param.get("max_depth", 3)
-            include_patterns = tool_param.get("include_patterns", None)
-            exclude_patterns = tool_param.get("exclude_patterns", None)
-            observation = self.agent_utils.explore_project_structure(root_path, max_depth, include_patterns, exclude_patterns)
+        # 通过工具执行器调用，相同参数的调用在一次运行中只执行一次
+        return self.tool_executor.execute(tool_name, tool_param)
+    
+    def execute_tools(self, tool_calls):
+        """
+        并发执行一批相互独立的工具调用。
         
-        return observation
+        Args:
+            tool_calls (list): (tool_name, tool_param)元组的列表
+            
+        Returns:
+            list: 与输入顺序对应的观察结果
+        """
+        return self.tool_executor.execute_batch(tool_calls)
+    
+    def close(self):
+        """
+        任务结束后释放工具执行器的线程池和缓存。
+        """
+        self.tool_executor.shutdown()
     
     def save_result(self, user_prompt, test_plan=""):
         """
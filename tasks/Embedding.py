@@ -1,10 +1,18 @@
 import os
-import json
 import torch
 import numpy as np
-from transformers import T5EncoderModel, RobertaTokenizer
 from tqdm import tqdm
 from tasks.BaseTask import BaseTask
+from utils.model_registry import get_model
+from utils.embedding_server import get_embedding_server
+from utils.hybrid_retrieval import LexicalIndex, ckg_neighbour_blocks, changed_file_names, hybrid_rank
+from utils.embedding_store import EmbeddingStore, content_hash, DEFAULT_EMBEDDING_STORE_DIR, DEFAULT_MAX_SHARDS
+from utils.vector_index import build_index, embeddings_fingerprint
+from utils.code_chunker import chunk_blocks, max_sim_per_block, DEFAULT_OVERLAP_TOKENS
+from utils.batched_encoder import encode_texts
+from utils.code_extractor import extract_project, iter_records, iter_code_blocks
+from utils.context_selection import block_vectors, count_tokens, mmr_select, DEFAULT_MMR_LAMBDA, DEFAULT_DEDUP_THRESHOLD, DEFAULT_CONTEXT_TOKENS
+from utils.inference_backends import accuracy_guard, DEFAULT_ONNX_DIR
 from prompt.embedding.test_plan import EMBEDDING_TEST_PLAN_SYSTEM_PROMPT, EMBEDDING_TEST_PLAN_USER_PROMPT
 
 class Embedding(BaseTask):
@@ -13,31 +21,52 @@ class Embedding(BaseTask):
     扩展底座类。
     """
     
-    def __init__(self, config):
+    def __init__(self, config, reformat_pr_info=None):
         """
         用提供的配置初始化嵌入任务。
         
         Args:
             config (dict): 任务的配置字典
+            reformat_pr_info (dict, optional): 已经整理好的PR信息
         """
-        super().__init__(config)
+        super().__init__(config, reformat_pr_info)
         self.model_name = "Salesforce/codet5p-base"
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.tokenizer = None
         self.model = None
+        self.model_lock = None
         self.code_embeddings = None
         self.code_info = []
+        self.vector_index = None
+        # 长代码块切分为多个窗口，chunk_owners记录每个窗口（嵌入的每一行）所属的代码块
+        self.chunk_owners = None
+        self.block_chunks = None
+        # 代码块的BM25倒排索引（混合检索）
+        self.lexical_index = None
+        # 推理后端：torch（fp32）、int8、onnx或onnx-int8
+        self.inference_backend = config.get('Embedding', {}).get('inference_backend', 'torch')
+        self.embedding_store = None
+        self.open_embedding_store()
+    
+    def open_embedding_store(self):
+        """
+        打开嵌入存储：只编码新增或修改过的代码块，同一仓库的PR和多次运行共用。
+        不同推理后端的嵌入有微小差异，分开存储。
+        """
+        if self.config.get('Embedding', {}).get('use_store', True):
+            variant = "masked-mean512" if self.inference_backend == 'torch' else f"masked-mean512-{self.inference_backend}"
+            self.embedding_store = EmbeddingStore.from_config(self.config, f"{self.model_name}@{variant}")
     
     def load_models(self):
         """
-        加载codet5+模型和令牌。
+        从进程内的模型注册表获取codet5+模型和令牌，同一进程中的所有嵌入任务共用一份模型。
         """
-        print(f"Using device: {self.device}")
-        
-        # 负载令牌和型号
-        self.tokenizer = RobertaTokenizer.from_pretrained(self.model_name)
-        self.model = T5EncoderModel.from_pretrained(self.model_name).to(self.device)
-        self.model.eval()  # 设置为评估模式
+        loaded = get_model(
+            self.model_name, self.inference_backend,
+            onnx_dir=self.config.get('Embedding', {}).get('onnx_dir', DEFAULT_ONNX_DIR)
+        ) if self.inference_backend != 'torch' else get_model(self.model_name)
+        self.tokenizer, self.model, self.device, self.model_lock = loaded
+        print(f"Using device: {self.device} ({self.inference_backend})")
     
     def encode_text(self, text, max_length=512):
         """
@@ -50,111 +79,146 @@ class Embedding(BaseTask):
         Returns:
             torch.Tensor: 嵌入向量
         """
-        with torch.no_grad():
-            inputs = self.tokenizer(
-                text, 
-                return_tensors="pt", 
-                max_length=max_length, 
-                padding="max_length", 
-                truncation=True
-            ).to(self.device)
+        return self.encode_queries([text], max_length).to(self.device)
+    
+    def encode_queries(self, texts, max_length=512):
+        """
+        编码查询文本。默认提交给进程内的嵌入服务，与并发任务的查询合并为微批次一起编码。
+        
+        Args:
+            texts (list): 查询文本
+            max_length (int, optional): 编码文本的最大长度
             
-            outputs = self.model(
-                input_ids=inputs.input_ids,
-                attention_mask=inputs.attention_mask
+        Returns:
+            torch.Tensor: (n, dim)标准化嵌入，在CPU上
+        """
+        embedding_config = self.config.get('Embedding', {})
+        if embedding_config.get('micro_batching', True) and max_length == 512:
+            server = get_embedding_server(
+                self.model_name, self.inference_backend, onnx_dir=embedding_config.get('onnx_dir', DEFAULT_ONNX_DIR)
             )
-            
-            # 将最后一个隐藏状态的平均值作为文本嵌入
-            embedding = torch.mean(outputs.last_hidden_state, dim=1)
-            return embedding
+            return torch.stack(server.encode(texts))
+        # 不填充到max_length，只对实际token求平均，与代码块嵌入的计算方式一致
+        return encode_texts(texts, self.tokenizer, self.model, self.device, max_length, lock=self.model_lock)
     
-    def load_code_from_json(self, json_file):
+    def load_code_from_project(self, project_dir):
         """
-        Load code from a JSON file.
+        用共享的代码提取器读取项目中的代码块（按文件哈希增量解析，记录与代码知识图谱共用）。
         
         Args:
-            json_file (str): Path to the JSON file
+            project_dir (str): 项目目录
         """
-        print(f"Loading code from {json_file}...")
-        
-        with open(json_file, 'r', encoding='utf-8') as f:
-            code_structure = json.load(f)
-        
-        # 清除以前的信息
-        self.code_info = []
-        
-        # 递归处理JSON结构
-        def process_structure(structure, path=""):
-            for key, value in structure.items():
-                current_path = f"{path}/{key}" if path else key
-                
-                if isinstance(value, dict):
-                    # 如果是目录，请递归过程
-                    process_structure(value, current_path)
-                elif isinstance(value, list):
-                    # 如果是文件，请处理所有功能和类
-                    for item in value:
-                        code = item.get("code", "")
-                        name = item.get("name", "")
-                        item_type = item.get("type", "")
-                        file = item.get("file", "")
-                        
-                        if code and name:
-                            info = {
-                                "path": current_path,
-                                "file": file,
-                                "name": name,
-                                "type": item_type,
-                                "code": code
-                            }
-                            self.code_info.append(info)
-        
-        # 处理整个结构
-        process_structure(code_structure)
+        print(f"Extracting code from {project_dir}...")
+        records_path = extract_project(project_dir, self.config.get('Embedding', {}).get('records_path'), os.cpu_count() or 4)
+        self.code_info = list(iter_code_blocks(iter_records(records_path)))
         print(f"Found {len(self.code_info)} code blocks.")
     
     def compute_code_embeddings(self, batch_size=16):
         """
-        计算所有代码块的嵌入。
+        计算所有代码块的嵌入。超过512个token的代码块沿语句边界切分为有重叠的窗口，每个窗口单独编码，
+        与短代码块在同一批分桶批次中编码。使用嵌入存储时只编码存储中没有的窗口。
         
         Args:
             batch_size (int, optional): 批次尺寸用于处理
         """
+        codes = [item["code"] for item in self.code_info]
+        embedding_config = self.config.get('Embedding', {})
+        if self.inference_backend != 'torch':
+            self.check_inference_backend(codes[:embedding_config.get('guard_samples', 32)])
+        if embedding_config.get('chunking', True):
+            if not self.model or not self.tokenizer:
+                self.load_models()
+            codes, self.chunk_owners = chunk_blocks(codes, self.tokenizer, overlap_tokens=embedding_config.get('chunk_overlap', DEFAULT_OVERLAP_TOKENS))
+            print(f"Split {len(self.code_info)} code blocks into {len(codes)} chunks")
+        else:
+            self.chunk_owners = list(range(len(codes)))
+        
+        if self.embedding_store is None:
+            embeddings = self.encode_code_blocks(codes, batch_size)
+        else:
+            keys = [content_hash(code) for code in codes]
+            embeddings, missing = self.embedding_store.get(keys)
+            print(f"Embedding store: {len(keys) - len(missing)} cached, {len(missing)} to encode")
+            if missing:
+                new_embeddings = self.encode_code_blocks([codes[i] for i in missing], batch_size)
+                self.embedding_store.put([keys[i] for i in missing], new_embeddings.numpy())
+                # 每次写入生成一个分片，超过阈值时合并，避免分片和打开的memmap在一次运行中无限增长
+                if self.embedding_store.shard_count() > embedding_config.get('max_shards', DEFAULT_MAX_SHARDS):
+                    print(f"Compacting embedding store ({self.embedding_store.shard_count()} shards)")
+                    self.embedding_store.compact()
+                if embeddings is None:
+                    embeddings = np.zeros((len(keys), new_embeddings.shape[1]), dtype=np.float32)
+                embeddings[missing] = new_embeddings.numpy()
+            if embeddings is not None:
+                embeddings = torch.from_numpy(embeddings)
+        
+        if embeddings is not None and len(embeddings):
+            # 存储中的嵌入为float16，重新标准化
+            self.code_embeddings = torch.nn.functional.normalize(embeddings.float(), p=2, dim=1)
+            self.vector_index = None
+            self.block_chunks = None
+            print(f"Computed embeddings with shape: {self.code_embeddings.shape}")
+    
+    def check_inference_backend(self, sample_codes):
+        """
+        精度检查：在样本代码块上比较当前后端与fp32的嵌入，未通过时退回fp32。
+        
+        Args:
+            sample_codes (list): 样本代码块
+        """
+        if not sample_codes:
+            return
         if not self.model or not self.tokenizer:
             self.load_models()
-            
-        print("Computing embeddings for all code blocks...")
-        
-        all_embeddings = []
+        result = accuracy_guard(
+            self.model_name, self.inference_backend,
+            lambda texts: encode_texts(texts, self.tokenizer, self.model, self.device, lock=self.model_lock).numpy(),
+            sample_codes
+        )
+        print(f"Accuracy guard for {self.inference_backend}: min cosine {result['min_cosine']:.4f}, "
+              f"max similarity deviation {result['max_similarity_deviation']:.4f}")
+        if not result['passed']:
+            print(f"Warning: {self.inference_backend} embeddings deviate too much from fp32, falling back to torch")
+            self.inference_backend = 'torch'
+            self.tokenizer = None
+            self.model = None
+            self.model_lock = None
+            self.open_embedding_store()
+            self.load_models()
+    
+    def encode_code_blocks(self, codes, batch_size=16):
+        """
+        用模型编码代码块：按token长度分桶、动态填充，批次大小由token预算决定。
         
-        # Use batching for efficiency
-        for i in tqdm(range(0, len(self.code_info), batch_size)):
-            batch = [item["code"] for item in self.code_info[i:i+batch_size]]
+        Args:
+            codes (list): 代码文本
+            batch_size (int, optional): 未配置Embedding.batch_tokens时，以batch_size条512长度的序列作为token预算
             
-            with torch.no_grad():
-                inputs = self.tokenizer(
-                    batch, 
-                    return_tensors="pt", 
-                    max_length=512, 
-                    padding="max_length", 
-                    truncation=True
-                ).to(self.device)
-                
-                outputs = self.model(
-                    input_ids=inputs.input_ids,
-                    attention_mask=inputs.attention_mask
-                )
-                
-                # Use mean of last hidden state as code embedding
-                batch_embeddings = torch.mean(outputs.last_hidden_state, dim=1)
-                all_embeddings.append(batch_embeddings.cpu())
-        
-        # Combine all batch embeddings into a single tensor
-        if all_embeddings:
-            self.code_embeddings = torch.cat(all_embeddings, dim=0)
-            # Normalize embedding vectors
-            self.code_embeddings = torch.nn.functional.normalize(self.code_embeddings, p=2, dim=1)
-            print(f"Computed embeddings with shape: {self.code_embeddings.shape}")
+        Returns:
+            torch.Tensor: 标准化的嵌入(n, dim)，在CPU上
+        """
+        if not self.model or not self.tokenizer:
+            self.load_models()
+            
+        print(f"Computing embeddings for {len(codes)} code blocks...")
+        max_tokens = self.config.get('Embedding', {}).get('batch_tokens', batch_size * 512)
+        return encode_texts(codes, self.tokenizer, self.model, self.device, max_tokens=max_tokens, progress=tqdm, lock=self.model_lock)
+    
+    def build_vector_index(self):
+        """
+        用代码块嵌入构建向量索引，后端由Embedding.index_backend配置（默认auto）。
+        """
+        embedding_config = self.config.get('Embedding', {})
+        backend = embedding_config.get('index_backend', 'auto')
+        embeddings = self.code_embeddings.cpu().numpy()
+        path = None
+        if backend == 'disk':
+            # 路径包含嵌入的指纹，并发任务不会打开其他任务（不同代码块）的矩阵
+            path = os.path.join(
+                embedding_config.get('store_dir', DEFAULT_EMBEDDING_STORE_DIR), 'indexes',
+                f"{self.config['Judge']['repo']}-{embeddings_fingerprint(embeddings)}.npy"
+            )
+        self.vector_index = build_index(embeddings, backend, path=path)
     
     def find_similar_code(self, query_text, top_k=25):
         """
@@ -167,43 +231,151 @@ class Embedding(BaseTask):
         Returns:
             list: 包含类似代码块的字典列表
         """
+        return self.find_similar_code_batch([query_text], top_k)[0]
+    
+    def find_similar_code_batch(self, query_texts, top_k=25):
+        """
+        批量查找类似于查询文本的代码块，所有查询一起编码、一起检索。
+        
+        Args:
+            query_texts (list): 查询文本
+            top_k (int, optional): 每个查询返回的代码块数量
+            
+        Returns:
+            list: 每个查询的类似代码块字典列表
+        """
+        if self.code_embeddings is None:
+            print("No embeddings available. Please compute or load embeddings first.")
+            return [[] for _ in query_texts]
+        
+        print(f"Finding top {top_k} similar code blocks for {len(query_texts)} queries...")
+        _, all_blocks = self.search_blocks(query_texts, top_k)
+        return [[self.block_result(idx, score) for idx, score, _ in blocks] for blocks in all_blocks]
+    
+    def search_blocks(self, query_texts, top_k=25):
+        """
+        稠密检索：编码查询并在向量索引中检索，按代码块聚合窗口的分数。
+        
+        Args:
+            query_texts (list): 查询文本
+            top_k (int, optional): 每个查询返回的代码块数量
+            
+        Returns:
+            tuple: (查询嵌入(numpy), 每个查询的(代码块下标, 相似度, 窗口下标)列表)
+        """
+        if self.vector_index is None:
+            self.build_vector_index()
+        
+        # 计算查询文本的标准化嵌入
+        query_embeddings = self.encode_queries(query_texts).numpy()
+        
+        # 一个代码块可能有多个窗口命中，检索数量不够top_k个不同的代码块时加倍重试
+        k = top_k
+        while True:
+            all_scores, all_indices = self.vector_index.search(query_embeddings, k)
+            all_blocks = [
+                max_sim_per_block(scores, indices, self.chunk_owners, top_k)
+                for scores, indices in zip(all_scores, all_indices)
+            ]
+            if k >= len(self.chunk_owners) or all(len(blocks) >= min(top_k, len(self.code_info)) for blocks in all_blocks):
+                break
+            k = min(k * 2, len(self.chunk_owners))
+        return query_embeddings, all_blocks
+    
+    def block_result(self, idx, similarity_score, **extra):
+        info = self.code_info[idx]
+        return {
+            "block": idx,
+            "path": info["path"],
+            "file": info["file"],
+            "name": info["name"],
+            "type": info["type"],
+            "code": info["code"],
+            "similarity_score": float(similarity_score),
+            **extra
+        }
+    
+    def block_similarity(self, query_embedding, idx):
+        """
+        查询与一个代码块的相似度（代码块所有窗口中的最大值）。
+        """
+        if self.block_chunks is None:
+            self.block_chunks = {}
+            for chunk, owner in enumerate(self.chunk_owners):
+                self.block_chunks.setdefault(owner, []).append(chunk)
+        rows = self.code_embeddings[self.block_chunks[idx]].cpu().numpy()
+        return float((rows @ query_embedding).max())
+    
+    def retrieve_code(self, top_k=25):
+        """
+        为PR检索相关代码块。混合检索（默认）融合稠密检索和标识符BM25检索的排名（RRF），
+        并提升修改的文件及其在代码知识图谱中的邻居；dense只使用稠密检索。
+        
+        Args:
+            top_k (int, optional): 返回的代码块数量
+            
+        Returns:
+            list: 代码块字典列表
+        """
+        embedding_config = self.config.get('Embedding', {})
+        if embedding_config.get('retrieval', 'hybrid') != 'hybrid':
+            return self.find_similar_code(self.PR_Content, top_k)
         if self.code_embeddings is None:
             print("No embeddings available. Please compute or load embeddings first.")
             return []
         
-        print(f"Finding top {top_k} similar code blocks for query...")
+        candidate_k = top_k * embedding_config.get('candidate_factor', 4)
+        query_embeddings, all_blocks = self.search_blocks([self.PR_Content], candidate_k)
+        dense_scores = {idx: score for idx, score, _ in all_blocks[0]}
         
-        # 计算查询文本的嵌入
-        query_embedding = self.encode_text(query_text)
-        # 标准化查询嵌入
-        query_embedding = torch.nn.functional.normalize(query_embedding, p=2, dim=1)
+        if self.lexical_index is None:
+            path = os.path.join(embedding_config.get('store_dir', DEFAULT_EMBEDDING_STORE_DIR), 'lexical', f"{self.config['Judge']['repo']}.json")
+            self.lexical_index = LexicalIndex.load_or_build(path, self.code_info)
+        changed_files = changed_file_names(self.PR_Changed_Files)
+        lexical = self.lexical_index.search(f"{self.PR_Content} {' '.join(changed_files)}", candidate_k)
         
-        # 计算相似性得分
-        self.code_embeddings = self.code_embeddings.to(self.device)
-        similarity_scores = torch.mm(query_embedding, self.code_embeddings.t()).squeeze(0)
+        boosted = set()
+        if embedding_config.get('ckg_boost', True):
+            boosted = ckg_neighbour_blocks(self.config['CKG']['graph_pkl_dir'], changed_files, self.code_info)
         
-        # 获取top_k的索引最相似的项目
-        if len(similarity_scores.shape) == 0:
-            similarity_scores = similarity_scores.unsqueeze(0)
-        top_indices = torch.argsort(similarity_scores, descending=True)[:top_k].cpu().numpy()
+        ranked = hybrid_rank(list(dense_scores), [idx for idx, _ in lexical], boosted, top_k)
+        print(f"Hybrid retrieval: {len(dense_scores)} dense and {len(lexical)} lexical candidates, {len(boosted)} CKG-boosted blocks")
+        return [
+            self.block_result(
+                idx,
+                dense_scores[idx] if idx in dense_scores else self.block_similarity(query_embeddings[0], idx),
+                retrieval_score=score
+            )
+            for idx, score in ranked
+        ]
+    
+    def diversify_code(self, results):
+        """
+        检索后的多样化：用代码块嵌入做MMR选择，去掉近似重复的代码块（重载、复制的处理函数等），
+        并在token预算内选择放入提示的代码块。
         
-        # 准备结果
-        results = []
-        for idx in top_indices:
-            info = self.code_info[idx]
-            score = similarity_scores[idx].item()
+        Args:
+            results (list): retrieve_code返回的代码块字典列表（按相关性降序）
             
-            result = {
-                "path": info["path"],
-                "file": info["file"],
-                "name": info["name"],
-                "type": info["type"],
-                "code": info["code"],
-                "similarity_score": score
-            }
-            results.append(result)
-        
-        return results
+        Returns:
+            list: 选中的代码块，保持原来的顺序
+        """
+        embedding_config = self.config.get('Embedding', {})
+        if not embedding_config.get('diversify', True) or len(results) < 2 or self.code_embeddings is None:
+            return results
+        
+        vectors = block_vectors(self.code_embeddings.cpu().numpy(), self.chunk_owners, [result['block'] for result in results])
+        relevance = [result.get('retrieval_score', result['similarity_score']) for result in results]
+        costs = [count_tokens(self.format_code_results([result])) for result in results]
+        selected, stats = mmr_select(
+            relevance, vectors, costs,
+            token_budget=embedding_config.get('context_tokens', DEFAULT_CONTEXT_TOKENS),
+            mmr_lambda=embedding_config.get('mmr_lambda', DEFAULT_MMR_LAMBDA),
+            dedup_threshold=embedding_config.get('dedup_threshold', DEFAULT_DEDUP_THRESHOLD)
+        )
+        print(f"Context selection: kept {len(selected)}/{len(results)} blocks, {stats['tokens']}/{sum(costs)} tokens "
+              f"({stats['duplicates']} near-duplicates, {stats['over_budget']} over budget)")
+        return [results[i] for i in selected]
     
     def format_code_results(self, results):
         """
@@ -239,15 +411,17 @@ class Embedding(BaseTask):
         if not self.model or not self.tokenizer:
             self.load_models()
         
-        # 来自JSON文件的加载代码（使用配置中的路径）
-        json_file = os.path.join(self.config['CKG']['project_dir'], 'code_structure.json')
-        self.load_code_from_json(json_file)
+        # 从项目中提取代码块
+        self.load_code_from_project(self.config['CKG']['project_dir'])
         
         # 计算嵌入
         self.compute_code_embeddings()
         
         # 找到与PR内容的类似代码块
-        similar_code = self.find_similar_code(self.PR_Content, top_k=25)
+        similar_code = self.retrieve_code(top_k=self.config.get('Embedding', {}).get('top_k', 25))
+        
+        # 去掉近似重复的代码块，并限制在token预算内
+        similar_code = self.diversify_code(similar_code)
         
         # 格式化LLM输入的代码结果
         formatted_code_results = self.format_code_results(similar_code)
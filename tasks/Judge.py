@@ -1,8 +1,14 @@
 import os
 import json
-import re
 import yaml
+import threading
+import concurrent.futures
 from tasks.BaseTask import BaseTask
+from utils.output_parser import extract_json
+from utils.pr_context_store import PRContextStore
+from utils.judge_sampling import aggregate_samples, sample_totals, ci_half_width
+from utils import telemetry
+from utils.prejudge import extract_candidate_steps, prejudge_batch, short_circuit_scores, codet5_encoder
 from prompt.judge.test_plan_llm_judge_prompt_v1_1 import PR_TEST_PLAN_SCORING_SYSTEM_PROMPT, PR_TEST_PLAN_SCORING_USER_PROMPT
 
 class Judge(BaseTask):
@@ -24,10 +30,19 @@ class Judge(BaseTask):
         self.PR_Content = self.reformat_pr_info['PR_Content']
         self.PR_Changed_Files = self.reformat_pr_info['PR_Changed_Files']
         self.test_plan_path = test_plan_path
+        self.scores_path = None
+        self.token_usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'llm_calls': 0}
+        self.usage_lock = threading.Lock()
 
     def load_PR_content(self):
         tmp_dir = self.config['Judge']['tmp_dir']
         tmp_path = os.path.join(tmp_dir, f"{self.config['Judge']['pull_number']}_PR_body.json")
+        if not os.path.exists(tmp_path):
+            # 该策略目录下没有PR信息时，使用PR信息缓存中最近的一条
+            store = PRContextStore.from_config(self.config)
+            PR_content = store.get(*store.key_from_config(self.config))
+            if PR_content is not None:
+                return PR_content
         with open(f"{tmp_path}", 'r') as f:
             PR_content = json.load(f)
         return PR_content
@@ -49,15 +64,8 @@ class Judge(BaseTask):
             with open(self.test_plan_path, 'r') as f:
                 test_plan_result = f.readlines()
             
-            # 从测试计划中提取测试用例部分
-            full_content = ''.join(test_plan_result)
-            if "## 4. Test Cases" in full_content:
-                test_cases = full_content.split("## 4. Test Cases")[1].strip()
-            else:
-                # 如果找不到确切的部分标题，请使用整个测试计划
-                test_cases = full_content
-                
-            return test_cases
+            # 从测试计划中提取测试用例部分，找不到时使用整个测试计划
+            return extract_candidate_steps(''.join(test_plan_result))
         except Exception as e:
             print(f"Error loading test plan: {e}")
             return ""
@@ -70,6 +78,127 @@ class Judge(BaseTask):
             dict: 测试计划的分数
         """
         print("starting scoring......")
+        
+        # 本地预评分：退化的测试计划不调用LLM
+        prejudge_result = self.prejudge() if self.config['Judge'].get('prejudge', False) else None
+        if prejudge_result is not None and prejudge_result['degenerate']:
+            print(f"Pre-judge short-circuit: {prejudge_result['reason']}")
+            scores = short_circuit_scores(prejudge_result)
+            self.save_scores(scores)
+            return scores
+        
+        user_prompt = self.build_user_prompt()
+        
+        if self.config['Judge'].get('samples', 1) > 1:
+            # 多次采样并聚合，降低评分噪声
+            scores = self.run_multi_sample(user_prompt)
+        else:
+            # 从LLM获得分数（配置允许时使用JSON模式）
+            llm_response = self.llm(PR_TEST_PLAN_SCORING_SYSTEM_PROMPT, user_prompt, self.config['Judge']['llm_model'], response_format=self.response_format())
+            scores = self.parse_scores(llm_response)
+        if prejudge_result is not None:
+            scores['prejudge'] = prejudge_result
+        
+        # 保存分数
+        self.save_scores(scores)
+        
+        return scores
+    
+    def prejudge(self):
+        """
+        计算候选和参考测试计划的BM25（可选嵌入余弦）相似度。
+        
+        Returns:
+            dict: 见prejudge_batch
+        """
+        encoder = codet5_encoder() if self.config['Judge'].get('prejudge_embedding', False) else None
+        return prejudge_batch([self.load_test_plan()], [self.reformat_pr_info.get('Test_Plan', '') or ''], encoder)[0]
+    
+    def run_multi_sample(self, user_prompt):
+        """
+        并发抽取多个评分样本并聚合（中位数或截尾均值），总分的置信区间足够窄时提前停止。
+        配置项（Judge）：samples最多样本数，min_samples首轮样本数，samples_per_round之后每轮样本数，
+        ci_half_width目标置信区间半宽，aggregate聚合方式，temperature采样温度，seed随机种子。
+        
+        Args:
+            user_prompt (str): 评分的用户提示
+            
+        Returns:
+            dict: 聚合后的分数
+        """
+        judge_config = self.config['Judge']
+        max_samples = judge_config['samples']
+        min_samples = min(judge_config.get('min_samples', 3), max_samples)
+        per_round = judge_config.get('samples_per_round', 2)
+        target_half_width = judge_config.get('ci_half_width', 1.0)
+        confidence = judge_config.get('confidence', 0.95)
+        
+        samples = []
+        while len(samples) < max_samples:
+            count = min_samples if not samples else min(per_round, max_samples - len(samples))
+            samples.extend(self.draw_samples(user_prompt, count, seed_offset=len(samples)))
+            
+            totals = sample_totals(samples)
+            half_width = ci_half_width(totals, confidence)
+            print(f"Judge samples: {len(samples)}/{max_samples}, total score CI half-width: {half_width:.2f}")
+            if len(totals) >= min_samples and half_width <= target_half_width:
+                break
+        
+        return aggregate_samples(samples, judge_config.get('aggregate', 'median'), confidence)
+    
+    def draw_samples(self, user_prompt, count, seed_offset=0):
+        """
+        抽取count个评分样本。支持n参数的接口用一次请求返回多个样本，否则并发发送多个请求。
+        每个样本使用固定的种子（seed + 序号），相同配置的重复运行结果可复现。
+        
+        Returns:
+            list: 解析后的分数字典
+        """
+        model = self.config['Judge']['llm_model']
+        temperature = self.config['Judge'].get('temperature', 0.7)
+        seed = self.config['Judge'].get('seed', 0)
+        response_format = self.response_format()
+        
+        def build_request(n, sample_seed):
+            data = self.build_chat_request(PR_TEST_PLAN_SCORING_SYSTEM_PROMPT, user_prompt, model, response_format)
+            data['temperature'] = temperature
+            if 'claude' not in model:
+                data['seed'] = sample_seed
+            if n > 1:
+                data['n'] = n
+            return data
+        
+        if self.supports_n(model):
+            response_dict = self.post_llm_request(build_request(count, seed + seed_offset), model)
+            contents = [choice['message']['content'] for choice in response_dict['choices']]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=count) as executor:
+                # 每个请求带上当前上下文（PR和阶段），追踪记录中可以区分
+                futures = [
+                    executor.submit(telemetry.current_context().run, self.post_llm_request, build_request(1, seed + seed_offset + i), model)
+                    for i in range(count)
+                ]
+                responses = [future.result() for future in futures]
+            contents = [self.parse_chat_response(response_dict, model, response_format) for response_dict in responses]
+        
+        return [self.parse_scores(content) for content in contents]
+    
+    def supports_n(self, model):
+        """
+        是否可以用n参数在一次请求中取多个样本（OpenAI的模型支持，其他接口不保证）。
+        """
+        return self.config['Judge'].get('use_n', 'gpt' in model)
+    
+    def response_format(self):
+        return 'json' if self.config['Judge'].get('json_mode', False) else None
+    
+    def build_user_prompt(self):
+        """
+        构建评分的用户提示。
+        
+        Returns:
+            str: 用户提示
+        """
         # 从公关信息中加载参考测试计划
         reference_steps = self.reformat_pr_info.get('Test_Plan', '')
         
@@ -77,36 +206,39 @@ class Judge(BaseTask):
         candidate_steps = self.load_test_plan()
         
         # 创建提示进行评估
-        user_prompt = PR_TEST_PLAN_SCORING_USER_PROMPT.format(
+        return PR_TEST_PLAN_SCORING_USER_PROMPT.format(
             PR_Content=self.PR_Content,
             Reference_Steps=reference_steps,
             Candidate_Steps=candidate_steps
         ) + '\n'
+    
+    def build_scoring_request(self):
+        """
+        构建评分请求体，供批量评分使用。
         
-        # 从LLM获得分数
-        llm_response = self.llm(PR_TEST_PLAN_SCORING_SYSTEM_PROMPT, user_prompt, self.config['Judge']['llm_model'])
-        
-        try:
-            # JSON响应的解析分数
-            pattern = r"```json\s*(\{[\s\S]*?\})\s*```"
+        Returns:
+            dict: 请求体
+        """
+        return self.build_chat_request(
+            PR_TEST_PLAN_SCORING_SYSTEM_PROMPT,
+            self.build_user_prompt(),
+            self.config['Judge']['llm_model'],
+            self.response_format()
+        )
     
-            # Find the match
-            match = re.search(pattern, llm_response)
-            
-            if match:
-                # Return the JSON content
-                scores = json.loads(match.group(1))
-            else:
-                scores = {'scores': 'invalid'}
-            
-            # 保存分数
-            self.save_scores(scores)
-            
-            return scores
-        except json.JSONDecodeError as e:
-            print(f"Error parsing LLM response as JSON: {e}")
+    def parse_scores(self, llm_response):
+        """
+        宽松解析JSON响应（代码块或裸JSON、尾随逗号、截断）。
+        
+        Returns:
+            dict: 分数，无法解析时为{'scores': 'invalid'}
+        """
+        scores = extract_json(llm_response)
+        if not isinstance(scores, dict):
+            print(f"Error parsing LLM response as JSON")
             print(f"Response: {llm_response}")
-            return {"error": "Failed to parse response", "raw_response": llm_response}
+            scores = {'scores': 'invalid'}
+        return scores
     
     def save_scores(self, scores):
         """
@@ -130,4 +262,5 @@ class Judge(BaseTask):
             json.dump(scores, f, indent=2)
         
         print(f"Scores saved to {scores_path}")
+        self.scores_path = scores_path
         return scores_path
\ No newline at end of file
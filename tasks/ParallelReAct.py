@@ -0,0 +1,91 @@
+import json
+from tasks.ReAct import ReAct
+from utils.context_manager import ContextManager, BUDGET_EXHAUSTED_NOTICE
+from utils.output_parser import parse_react_output
+from prompt.parallel_react.test_plan import (
+    PR_TEST_PLAN_EDIT_USER_PROMPT,
+    PR_TEST_PLAN_EDIT_SYSTEM_PROMPT
+)
+
+class ParallelReAct(ReAct):
+    """
+    实施测试计划生成的并行React策略。
+    每次LLM调用可以给出多个相互独立的动作，这些动作并发执行，观察结果在下一条消息中一起返回。
+    """
+
+    def __init__(self, config, reformat_pr_info=None):
+        """
+        用提供的配置初始化并行React任务。
+
+        Args:
+            config (dict): 任务的配置字典
+            reformat_pr_info (dict, optional): 已经整理好的PR信息
+        """
+        super().__init__(config, reformat_pr_info)
+        self.max_actions = config['Agent'].get('max_actions_per_turn', 5)
+        # 提示中告诉LLM的动作上限与实际截断的上限一致
+        self.system_prompt = PR_TEST_PLAN_EDIT_SYSTEM_PROMPT.replace('{Max_Actions_Per_Turn}', str(self.max_actions))
+
+    def run(self):
+        """
+        运行并行React任务以生成测试计划。
+
+        Returns:
+            str: 生成的测试计划
+        """
+        if self.config['Agent'].get('function_calling', False):
+            return self.run_function_calling()
+
+        print("starting generating test plan......")
+        user_prompt = PR_TEST_PLAN_EDIT_USER_PROMPT.format(
+            PR_Project_Root_Dir=self.config['CKG']['project_dir'],
+            PR_Content=self.PR_Content,
+            PR_Changed_Files=self.PR_Changed_Files
+        ) + '\n'
+
+        test_plan = ""
+        context_manager = ContextManager(self.config, user_prompt)
+
+        # 最多可以进行20次迭代
+        for i in range(1, 20):
+            prompt = context_manager.build_prompt()
+            if context_manager.budget_exhausted():
+                prompt += BUDGET_EXHAUSTED_NOTICE
+            context_manager.log_prompt_size(i, prompt)
+            content = self.llm(self.system_prompt, prompt, self.config['Agent']['llm_model'])
+
+            # 单次扫描解析思想、动作和测试计划
+            parsed = parse_react_output(content, self.tool_executor.registry.names())
+            if parsed['test_plan'] is not None:
+                test_plan = parsed['test_plan']
+                session_message = f"Thought {i}: " + parsed['thought'] + '\n' + f"Test Plan: \n" + test_plan + '\n'
+                context_manager.add_round(i, session_message)
+                break
+
+            thought_content, actions = parsed['thought'], parsed['actions'][:self.max_actions]
+
+            # 验证是否存在所需的组件
+            if thought_content == '' or not actions:
+                print("Some components are empty, please check")
+                print(content + '\n')
+                break
+
+            # 并发执行本轮所有动作
+            observations = self.execute_tools(actions)
+
+            for j, ((action_name, action_param), observation) in enumerate(zip(actions, observations), start=1):
+                observation_str = json.dumps(observation) if isinstance(observation, (dict, list)) else str(observation)
+                action_message = f"Thought {i}: " + thought_content + '\n' if j == 1 else ''
+                action_message += f"Action {i}.{j}: " + action_name + '\n' + json.dumps(action_param) + '\n'
+                context_manager.add_round(f"{i}.{j}", action_message, observation_str)
+
+            print(f"Round {i}: executed {len(actions)} actions\n")
+            print(f"Thought {i}: {thought_content}")
+            for action_name, action_param in actions:
+                print(f"- {action_name} {json.dumps(action_param)}")
+            print("--------------------------------------\n")
+
+        # 保存结果（完整记录，不含压缩）
+        self.save_result(context_manager.full_transcript())
+
+        return test_plan
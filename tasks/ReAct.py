@@ -2,7 +2,11 @@ import os
 import json
 from datetime import datetime
 from tasks.BaseTask import BaseTask
+from utils.context_manager import ContextManager, BUDGET_EXHAUSTED_NOTICE
+from utils.output_parser import parse_react_output
+from utils.function_calling import tool_result_messages
 from prompt.test_plan_agent_prompt_v4_6 import PR_TEST_PLAN_EDIT_USER_PROMPT, PR_TEST_PLAN_EDIT_SYSTEM_PROMPT
+from prompt.parallel_react.test_plan import PR_TEST_PLAN_FUNCTION_CALLING_SYSTEM_PROMPT, PR_TEST_PLAN_EDIT_USER_PROMPT as FUNCTION_CALLING_USER_PROMPT
 
 class ReAct(BaseTask):
     """
@@ -10,14 +14,15 @@ class ReAct(BaseTask):
     扩展底座类。
     """
     
-    def __init__(self, config):
+    def __init__(self, config, reformat_pr_info=None):
         """
         用提供的配置初始化React任务。
         
         Args:
             config (dict): Configuration dictionary for the task
+            reformat_pr_info (dict, optional): 已经整理好的PR信息
         """
-        super().__init__(config)
+        super().__init__(config, reformat_pr_info)
     
     def run(self):
         """
@@ -26,6 +31,9 @@ class ReAct(BaseTask):
         Returns:
             str: 生成的测试计划
         """
+        if self.config['Agent'].get('function_calling', False):
+            return self.run_function_calling()
+        
         print("starting generating test plan......")
         user_prompt = PR_TEST_PLAN_EDIT_USER_PROMPT.format(
             PR_Project_Root_Dir=self.config['CKG']['project_dir'],
@@ -35,31 +43,33 @@ class ReAct(BaseTask):
         
         test_plan = ""
         session_messages = []
+        context_manager = ContextManager(self.config, user_prompt)
         
         # 最多可以进行20次迭代
         for i in range(1, 20):
-            content = self.llm(PR_TEST_PLAN_EDIT_SYSTEM_PROMPT, user_prompt, self.config['Agent']['llm_model'])
+            # 构建本轮提示（超出预算时压缩较早的观察结果）
+            prompt = context_manager.build_prompt()
+            if context_manager.budget_exhausted():
+                prompt += BUDGET_EXHAUSTED_NOTICE
+            context_manager.log_prompt_size(i, prompt)
+            content = self.llm(PR_TEST_PLAN_EDIT_SYSTEM_PROMPT, prompt, self.config['Agent']['llm_model'])
+            
+            # 单次扫描解析思想、行动和测试计划
+            parsed = parse_react_output(content, self.tool_executor.registry.names())
+            thought_content = parsed['thought']
             
             # 检查测试计划是否完成
-            if 'Test Plan Details' in content:
-                thought_content = ''.join(content.split('Thought')[1].split('Test Plan Details')[0].split(':')[1:]).replace('#', '').strip()
-                
+            if parsed['test_plan'] is not None:
                 session_message = f"Thought {i}: " + thought_content + '\n'
-                test_plan = '\n'.join(content.split('Test Plan Details')[1].splitlines()[1:]).replace('```', '').strip()
+                test_plan = parsed['test_plan']
                 session_message += f"Test Plan: \n" + test_plan + '\n'
                 
-                user_prompt += session_message
+                context_manager.add_round(i, session_message)
                 session_messages.append(session_message)
                 break
             else:
-                # 提取思想和行动
-                thought_content = ''.join(content.split('Thought')[1].split('Action')[0].split(':')[1:]).replace('#', '').strip()
-                action_name = content.split('Action')[1].splitlines()[1].replace('```','').strip()
-                
-                try:
-                    action_param = json.loads(''.join(content.split('Action')[1].splitlines()[2:]).replace('```', ''))
-                except json.JSONDecodeError:
-                    action_param = {}
+                # 每轮只执行第一个动作
+                action_name, action_param = parsed['actions'][0] if parsed['actions'] else ('', {})
                 
                 # 验证是否存在所需的组件
                 if action_name == '' or thought_content == '' or action_param is None:
@@ -77,21 +87,92 @@ class ReAct(BaseTask):
                 observation_str = json.dumps(observation) if isinstance(observation, (dict, list)) else observation
                 
                 # 格式化会话消息
-                session_message = (
+                action_message = (
                     f"Thought {i}: " + thought_content + '\n' + 
                     f"Action {i}: " + action_name + '\n' + 
-                    json.dumps(action_param) + '\n' + 
-                    f"Observation {i}: " + observation_str + '\n'
+                    json.dumps(action_param) + '\n'
                 )
+                session_message = action_message + f"Observation {i}: " + observation_str + '\n'
                 
-                user_prompt += session_message
+                context_manager.add_round(i, action_message, observation_str)
                 session_messages.append(session_message)
                 
                 print(f"Round {i}\n")
                 print(session_message)
                 print("--------------------------------------\n")
         
-        # 保存结果
-        self.save_result(user_prompt)
+        # 保存结果（完整记录，不含压缩）
+        self.save_result(context_manager.full_transcript())
+        
+        return test_plan
+    
+    def run_function_calling(self):
+        """
+        使用服务商原生的函数调用接口运行React任务（ReAct和ParallelReAct共用）。
+        工具描述由Agent_utils的方法签名生成，不再写在提示中；模型一次返回的所有工具调用并发执行。
+        工具结果与提示模式一样由上下文管理器去重和压缩，整次运行的预算快用完时要求模型直接给出测试计划。
+        
+        Returns:
+            str: 生成的测试计划
+        """
+        print("starting generating test plan with native function calling......")
+        model = self.config['Agent']['llm_model']
+        user_prompt = FUNCTION_CALLING_USER_PROMPT.format(
+            PR_Project_Root_Dir=self.config['CKG']['project_dir'],
+            PR_Content=self.PR_Content,
+            PR_Changed_Files=self.PR_Changed_Files
+        ) + '\n'
+        
+        tool_schemas = self.tool_executor.registry.schemas()
+        messages = [{"role": "user", "content": user_prompt}]
+        context_manager = ContextManager(self.config, user_prompt)
+        # 每个工具结果所在的消息（Claude为tool_result内容块），压缩后同步更新
+        result_slots = []
+        test_plan = ""
+        
+        # 最多可以进行20次迭代
+        for i in range(1, 20):
+            # 超出预算时压缩较早的工具结果
+            context_manager.log_prompt_size(i, context_manager.build_prompt())
+            for slot, current_round in result_slots:
+                slot['content'] = context_manager.observation_text(current_round)
+            system_prompt = PR_TEST_PLAN_FUNCTION_CALLING_SYSTEM_PROMPT
+            if context_manager.budget_exhausted():
+                system_prompt += BUDGET_EXHAUSTED_NOTICE
+            
+            response = self.llm_with_tools(system_prompt, messages, model, tool_schemas)
+            messages.append(response['assistant_message'])
+            
+            # 没有工具调用时即为最终回答
+            if not response['tool_calls']:
+                parsed = parse_react_output(response['content'])
+                test_plan = parsed['test_plan'] if parsed['test_plan'] is not None else response['content'].strip()
+                context_manager.add_round(i, f"Thought {i}: " + parsed['thought'] + '\n' + f"Test Plan: \n" + test_plan + '\n')
+                break
+            
+            # 每个工具调用都必须有对应的结果，因此全部执行
+            tool_calls = response['tool_calls']
+            observations = self.execute_tools([(call['name'], call['arguments']) for call in tool_calls])
+            observation_strs = [
+                json.dumps(observation) if isinstance(observation, (dict, list)) else str(observation)
+                for observation in observations
+            ]
+            result_messages = tool_result_messages(tool_calls, observation_strs, model)
+            messages.extend(result_messages)
+            slots = result_messages[0]['content'] if 'claude' in model else result_messages
+            
+            for j, (call, observation_str, slot) in enumerate(zip(tool_calls, observation_strs, slots), start=1):
+                action_message = f"Thought {i}: " + response['content'].strip() + '\n' if j == 1 else ''
+                action_message += f"Action {i}.{j}: " + call['name'] + '\n' + json.dumps(call['arguments']) + '\n'
+                context_manager.add_round(f"{i}.{j}", action_message, observation_str)
+                result_slots.append((slot, context_manager.rounds[-1]))
+            
+            print(f"Round {i}: executed {len(tool_calls)} tool calls\n")
+            for call in tool_calls:
+                print(f"- {call['name']} {json.dumps(call['arguments'])}")
+            print("--------------------------------------\n")
+        
+        # 保存结果（完整记录，不含压缩）
+        self.save_result(context_manager.full_transcript())
         
-        return test_plan
\ No newline at end of file
+        return test_plan
@@ -2,6 +2,8 @@ import re
 import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tasks.BaseTask import BaseTask
+from utils import telemetry
+from utils.output_parser import parse_thought_action_pairs
 from prompt.tot.test_plan import (
     PR_TEST_PLAN_EDIT_USER_PROMPT, 
     PR_TEST_PLAN_EDIT_SYSTEM_PROMPT, 
@@ -15,14 +17,15 @@ class TOT(BaseTask):
     扩展底座类。
     """
     
-    def __init__(self, config):
+    def __init__(self, config, reformat_pr_info=None):
         """
         用提供的配置初始化TOT任务。
         
         Args:
             config (dict): 任务的配置字典
+            reformat_pr_info (dict, optional): 已经整理好的PR信息
         """
-        super().__init__(config)
+        super().__init__(config, reformat_pr_info)
         self.cache_react_pair = {}
     
     def extract_thought_action_pairs(self, text):
@@ -35,39 +38,7 @@ class TOT(BaseTask):
         Returns:
             list: 包含思想表演对的字典列表
         """
-        thought_pattern = r'\*\*Thought\*\*: (.*?)\n'
-        action_name_pattern = r'```(.*?)\n'
-        action_params_pattern = r'```.*?\n(.*?)```'
-        expected_info_pattern = r'\*\*Expected Information\*\*: (.*?)\n'
-        
-        pair_pattern = r'#### Thought-Action Pair (TA\d+)(.*?)(?=#### Thought-Action Pair TA\d+|\Z)'
-        pairs = re.findall(pair_pattern, text, re.DOTALL)
-        
-        results = []
-        
-        for pair_id, pair_content in pairs:
-            thought_match = re.search(thought_pattern, pair_content)
-            action_name_match = re.search(action_name_pattern, pair_content)
-            action_params_match = re.search(action_params_pattern, pair_content, re.DOTALL)
-            expected_info_match = re.search(expected_info_pattern, pair_content)
-            
-            if thought_match and action_name_match and action_params_match and expected_info_match:
-                try:
-                    action_params_json = json.loads(action_params_match.group(1).strip())
-                except json.JSONDecodeError:
-                    action_params_json = {"error": "Invalid JSON"}
-                
-                pair_dict = {
-                    "id": pair_id.strip(),
-                    "thought": thought_match.group(1).strip(),
-                    "action_name": action_name_match.group(1).strip(),
-                    "action_parameters": action_params_json,
-                    "expected_information": expected_info_match.group(1).strip()
-                }
-                
-                results.append(pair_dict)
-        
-        return results
+        return parse_thought_action_pairs(text)
     
     def extract_relevance_evaluation(self, response_text):
         """
@@ -178,7 +149,7 @@ class TOT(BaseTask):
                 future_to_react = {}
                 
                 for react in ReAct_pair_list:
-                    future = executor.submit(self.process_react_pair, react)
+                    future = executor.submit(telemetry.current_context().run, self.process_react_pair, react)
                     future_to_react[future] = react
                 
                 # 流程完成的任务
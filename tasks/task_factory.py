@@ -1,4 +1,5 @@
 from tasks.ReAct import ReAct
+from tasks.ParallelReAct import ParallelReAct
 from tasks.TOT import TOT
 from tasks.Embedding import Embedding
 from tasks.Judge import Judge
@@ -8,12 +9,15 @@ class TaskFactory:
     """
     
     @staticmethod
-    def create_task(config, task_type="generator", test_plan_path=None):
+    def create_task(config, task_type="generator", test_plan_path=None, reformat_pr_info=None):
         """
         基于配置中指定的策略创建一个任务实例。
         
         Args:
             config (dict): 任务的配置字典
+            task_type (str, optional): "generator"或"judge"
+            test_plan_path (str, optional): 法官任务要评估的测试计划路径
+            reformat_pr_info (dict, optional): 已经整理好的PR信息，生成任务不再重复请求
             
         Returns:
             BaseTask: 任务类的实例
@@ -35,10 +39,12 @@ class TaskFactory:
             # InOut is not implemented yet
             raise ValueError("InOut strategy is not implemented yet")
         elif strategy == 'Embedding':
-            return Embedding(config)
+            return Embedding(config, reformat_pr_info)
         elif strategy == 'ReAct':
-            return ReAct(config)
+            return ReAct(config, reformat_pr_info)
+        elif strategy == 'ParallelReAct':
+            return ParallelReAct(config, reformat_pr_info)
         elif strategy == 'TOT':
-            return TOT(config)
+            return TOT(config, reformat_pr_info)
         else:
             raise ValueError(f"Unknown strategy: {strategy}")
\ No newline at end of file
@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 将项目根目录加入执行目录列表
+
+from CKG.utils import parse_python_file
+from utils.code_extractor import extract_project, iter_records, build_ckg_structure
+
+# 顶层函数run与Task.run同名，并且定义在类之前
+FIXTURE = '''import os
+
+def run(path):
+    return helper(path)
+
+class Task:
+    def run(self):
+        return os.path.join('a', 'b')
+
+    async def fetch(self):
+        return await self.run()
+
+def helper(path):
+    def inner():
+        return path
+    return inner()
+'''
+
+
+def normalize(items):
+    return sorted(
+        ({**item, 'references': sorted(item.get('references', [])),
+          'methods': normalize(item.get('methods', []))} for item in items),
+        key=lambda item: item['start_line']
+    )
+
+
+def extract(project, tmp_path, backend):
+    records_path = extract_project(str(project), str(tmp_path / 'records' / 'project.jsonl'), 2, backend)
+    return records_path, build_ckg_structure(iter_records(records_path))
+
+
+def test_ckg_structure_matches_parse_python_file(tmp_path):
+    project = tmp_path / 'project'
+    (project / 'pkg').mkdir(parents=True)
+    (project / 'pkg' / 'mod.py').write_text(FIXTURE)
+    (project / 'README.md').write_text('readme')
+
+    _, structure = extract(project, tmp_path, 'thread')
+    classes, functions, text = parse_python_file(str(project / 'pkg' / 'mod.py'))
+    parsed = structure['pkg']['mod.py']
+    assert [f['name'] for f in parsed['functions']] == ['run', 'helper', 'inner']
+    assert normalize(parsed['classes']) == normalize(classes)
+    assert normalize(parsed['functions']) == normalize(functions)
+    assert parsed['text'] == text
+    assert structure['README.md'] == {}
+
+
+def test_records_are_written_outside_the_project_and_reused(tmp_path):
+    project = tmp_path / 'project'
+    project.mkdir()
+    for i in range(5):
+        (project / f'm{i}.py').write_text(f'def f{i}():\n    return {i}\n')
+
+    records_path, first = extract(project, tmp_path, 'process')
+    assert sorted(p.name for p in project.iterdir()) == [f'm{i}.py' for i in range(5)]
+    (project / 'm0.py').write_text('def g():\n    return 0\n')
+    _, second = extract(project, tmp_path, 'process')
+    assert [f['name'] for f in second['m0.py']['functions']] == ['g']
+    assert {k: v for k, v in second.items() if k != 'm0.py'} == {k: v for k, v in first.items() if k != 'm0.py'}
+    assert [record['path'] for record in iter_records(records_path)] == [f'm{i}.py' for i in range(5)]
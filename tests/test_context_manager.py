@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+import pytest
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 将项目根目录加入执行目录列表
+
+pytest.importorskip('tiktoken')
+from utils.context_manager import ContextManager
+
+
+def test_compacting_a_referenced_observation_reinlines_it():
+    observation = 'def handler(request):\n    return request\n' * 200
+    manager = ContextManager({'Agent': {'token_budget': 2000, 'keep_recent_observations': 2}}, 'PR\n')
+    manager.add_round(1, 'Action 1\n', observation)
+    manager.add_round(2, 'Action 2\n', 'other ' * 1500)
+    manager.add_round(3, 'Action 3\n', observation)
+    manager.add_round(4, 'Action 4\n', observation)
+    manager.add_round(5, 'Action 5\n', 'done')
+
+    prompt = manager.build_prompt()
+    assert manager.rounds[0]['compacted'] is not None
+    # 完整内容转移到最后一个重复的轮次，其他重复轮次引用它
+    assert observation in prompt
+    assert 'Same as Observation 1.' not in prompt
+    assert 'Same as Observation 4.' in prompt
+
+    manager.add_round(6, 'Action 6\n', observation)
+    assert manager.rounds[-1]['duplicate_of'] == 4
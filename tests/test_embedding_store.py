@@ -0,0 +1,37 @@
+import sys
+import glob
+from pathlib import Path
+import pytest
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 将项目根目录加入执行目录列表
+
+np = pytest.importorskip('numpy')
+from utils.embedding_store import EmbeddingStore
+
+
+def test_compact_merges_shards_and_keeps_embeddings(tmp_path):
+    store = EmbeddingStore(str(tmp_path), 'model', 'repo')
+    vectors = np.arange(12, dtype=np.float32).reshape(6, 2)
+    for i in range(3):
+        store.put([f'k{2 * i}', f'k{2 * i + 1}'], vectors[2 * i:2 * i + 2])
+    assert store.shard_count() == 3
+
+    assert store.compact() == 6
+    assert store.shard_count() == 1
+    assert len(glob.glob(str(tmp_path / 'model' / 'repo' / 'shard_*.npy'))) == 1
+    embeddings, missing = store.get([f'k{i}' for i in range(6)])
+    assert missing == [] and np.allclose(embeddings, vectors)
+
+    # 重新打开后只读取合并后的分片
+    reopened = EmbeddingStore(str(tmp_path), 'model', 'repo')
+    assert reopened.shard_count() == 1 and len(reopened) == 6
+
+
+def test_compact_picks_up_shards_from_other_writers(tmp_path):
+    store = EmbeddingStore(str(tmp_path), 'model', 'repo')
+    other = EmbeddingStore(str(tmp_path), 'model', 'repo')
+    store.put(['a'], np.ones((1, 2)))
+    other.put(['b'], np.zeros((1, 2)))
+
+    assert store.compact(keep={'a', 'b'}) == 2
+    assert len(glob.glob(str(tmp_path / 'model' / 'repo' / 'shard_*.json'))) == 1
+    assert EmbeddingStore(str(tmp_path), 'model', 'repo').get(['a', 'b'])[1] == []
@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 将项目根目录加入执行目录列表
+
+from utils.judge_sampling import aggregate_samples
+
+
+def test_aggregate_samples_without_numeric_scores_is_invalid():
+    # extract_json截断修复后可能只剩overall_feedback
+    assert aggregate_samples([{'evaluation': {'overall_feedback': 'x'}}]) == {'scores': 'invalid'}
+    assert aggregate_samples([{'evaluation': {'coverage': {'analysis': 'a', 'score': 'n/a'}}}]) == {'scores': 'invalid'}
+
+
+def test_aggregate_samples_skips_samples_without_scores():
+    samples = [
+        {'evaluation': {'overall_feedback': 'truncated'}},
+        {'evaluation': {'coverage': {'analysis': 'a', 'score': 4}, 'total_score': 4, 'overall_feedback': 'ok'}},
+        {'evaluation': {'coverage': {'analysis': 'b', 'score': 2}, 'total_score': 2, 'overall_feedback': 'meh'}},
+    ]
+    result = aggregate_samples(samples)
+    assert result['evaluation']['total_score'] == 3
+    assert result['evaluation']['coverage']['samples'] == [4, 2]
@@ -0,0 +1,39 @@
+import sys
+import copy
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 将项目根目录加入执行目录列表
+
+from utils.manifest import RunManifest
+
+CONFIG = {
+    'Agent': {'strategy': 'Embedding', 'llm_model': 'gpt-4o', 'PR_url': 'https://api.github.com/repos/o/r/pulls/1',
+              'output_dir': './result', 'function_calling': False},
+    'Embedding': {'store_dir': './source/embeddings', 'top_k': 5},
+    'Judge': {'llm_model': 'gpt-4o', 'tmp_dir': './result/tmp'}
+}
+
+
+def test_append_after_partial_last_line(tmp_path):
+    manifest = RunManifest(str(tmp_path))
+    with open(manifest.path, 'w') as f:
+        f.write('{"key": "x", "stage": "generate", "status": "compl')
+    manifest.write({'key': 'y', 'stage': 'generate', 'status': 'completed'})
+    assert ('y', 'generate') in RunManifest(str(tmp_path)).state
+
+
+def test_generate_key_depends_on_strategy_options():
+    other_top_k = copy.deepcopy(CONFIG)
+    other_top_k['Embedding']['top_k'] = 10
+    other_paths = copy.deepcopy(CONFIG)
+    other_paths['Embedding']['store_dir'] = './elsewhere'
+    other_paths['Agent']['output_dir'] = './elsewhere'
+
+    assert RunManifest.run_key(CONFIG, 'generate') != RunManifest.run_key(other_top_k, 'generate')
+    assert RunManifest.run_key(CONFIG, 'generate') == RunManifest.run_key(other_paths, 'generate')
+    assert RunManifest.run_key(CONFIG, 'fetch') == RunManifest.run_key(other_top_k, 'fetch')
+
+
+def test_fetch_key_only_depends_on_pr():
+    other_strategy = copy.deepcopy(CONFIG)
+    other_strategy['Agent'].update({'strategy': 'ReAct', 'llm_model': 'claude'})
+    assert RunManifest.run_key(CONFIG, 'fetch') == RunManifest.run_key(other_strategy, 'fetch') == CONFIG['Agent']['PR_url']
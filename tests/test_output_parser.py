@@ -0,0 +1,84 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 将项目根目录加入执行目录列表
+
+from utils.output_parser import extract_json, parse_react_output, parse_thought_action_pairs
+
+TOOLS = ['view_code_changes', 'view_file_contents']
+
+
+def test_extract_json_skips_brackets_in_preceding_prose():
+    assert extract_json('Here: { not json } and then {"a":1}') == {'a': 1}
+    assert extract_json('score [1] then {"a":1}') == {'a': 1}
+
+
+def test_extract_json_falls_back_to_array_and_truncation_repair():
+    assert extract_json('[{"a": 1}]') == [{'a': 1}]
+    assert extract_json('[ref] {"a": {"b": 1,') == {'a': {'b': 1}}
+    assert extract_json('no json here') is None
+
+
+def test_react_action_without_input_gets_empty_parameters():
+    parsed = parse_react_output("Thought: look at the diff\nAction: view_code_changes\n", TOOLS)
+    assert parsed['actions'] == [('view_code_changes', {})]
+    assert parsed['thought'] == 'look at the diff'
+
+
+def test_react_multiple_thought_action_pairs():
+    content = (
+        "### Thought 1: first\n### Action 1:\n```view_code_changes\n{\"file_path\": \"a.py\"}\n```\n"
+        "### Thought 2: second\n### Action 2:\n```view_file_contents\n{\"file_path\": \"b.py\", \"index\": 0,}\n```\n"
+    )
+    parsed = parse_react_output(content, TOOLS)
+    assert parsed['thought'] == 'first\nsecond'
+    assert parsed['actions'] == [
+        ('view_code_changes', {'file_path': 'a.py'}),
+        ('view_file_contents', {'file_path': 'b.py', 'index': 0}),
+    ]
+    assert parsed['test_plan'] is None
+
+
+def test_react_final_answer_mixed_with_action():
+    content = (
+        "Thought: enough context\nAction:\n```view_code_changes\n{\"file_path\": \"a.py\"}\n```\n"
+        "### Test Plan Details:\n1. Test a\n```\nAction: not an action\n```\n"
+    )
+    parsed = parse_react_output(content, TOOLS)
+    # 测试计划之后的内容不再解析为动作
+    assert parsed['actions'] == [('view_code_changes', {'file_path': 'a.py'})]
+    assert parsed['test_plan'] == '1. Test a\n\nAction: not an action'
+
+
+def test_react_stops_at_invented_observation():
+    parsed = parse_react_output("Thought: x\nAction: view_code_changes\nObservation: fake\nAction: view_file_contents {}\n", TOOLS)
+    assert parsed['actions'] == [('view_code_changes', {})]
+
+
+def test_thought_action_pairs():
+    text = """#### Thought-Action Pair TA001
+- **Thought**: check the diff
+  of a.py
+- **Action**:
+```view_code_changes
+{"file_path": "a.py"}
+```
+- **Expected Information**: changed lines
+
+#### Thought-Action Pair TA002
+- **Thought**: look at the file
+- **Action**: view_file_contents
+- **Expected Information**: contents
+
+#### Thought-Action Pair TA003
+- **Thought**: no action here
+- **Expected Information**: nothing
+"""
+    pairs = parse_thought_action_pairs(text)
+    # 缺少动作的思想行动对被丢弃，缺少参数的动作参数为空
+    assert [pair['id'] for pair in pairs] == ['TA001', 'TA002']
+    assert pairs[0]['thought'] == 'check the diff of a.py'
+    assert pairs[0]['action_name'] == 'view_code_changes'
+    assert pairs[0]['action_parameters'] == {'file_path': 'a.py'}
+    assert pairs[0]['expected_information'] == 'changed lines'
+    assert pairs[1]['action_name'] == 'view_file_contents'
+    assert pairs[1]['action_parameters'] == {}
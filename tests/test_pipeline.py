@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+import pytest
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 将项目根目录加入执行目录列表
+
+from utils.pipeline import Stage, StagedPipeline
+
+
+def double(item):
+    item['value'] *= 2
+    return item
+
+
+def test_failing_item_is_recorded_and_others_finish():
+    def check(item):
+        if item['value'] < 0:
+            raise ValueError('Invalid PR URL format')
+        return item
+
+    pipeline = StagedPipeline([Stage('check', check, 2), Stage('double', double, 2)])
+    results = pipeline.run({'pr_url': str(v), 'value': v} for v in (1, -1, 2))
+    by_url = {item['pr_url']: item for item in results}
+    assert by_url['-1']['error'] == 'check: Invalid PR URL format'
+    assert by_url['1']['value'] == 2 and by_url['2']['value'] == 4
+
+
+def test_workers_stop_when_items_raise():
+    def items():
+        yield {'pr_url': '1', 'value': 1}
+        raise ValueError('bad input')
+
+    stages = [Stage('double', double, 3)]
+    pipeline = StagedPipeline(stages)
+    with pytest.raises(ValueError):
+        pipeline.run(items())
+    # 已经提交的条目处理完毕，工作线程全部退出
+    assert [item['value'] for item in pipeline.results] == [2]
+    assert stages[0].queue.qsize() == 0
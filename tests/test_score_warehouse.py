@@ -0,0 +1,33 @@
+import sys
+import json
+from pathlib import Path
+import pytest
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 将项目根目录加入执行目录列表
+
+pytest.importorskip('pandas')
+from utils.score_warehouse import ScoreWarehouse
+
+# Judge.save_scores写出的分数文件
+JUDGE_SCORES = {
+    'evaluation': {
+        'accuracy': {'analysis': 'Matches the reference on the API changes', 'score': 7},
+        'completeness': {'analysis': 'Misses the error paths', 'score': '6/10'},
+        'clarity': {'analysis': 'Steps are easy to follow', 'score': 8},
+        'overall_feedback': 'Covers 2 of the 5 scenarios',
+        'total_score': 21
+    }
+}
+
+
+def test_ingest_judge_score_file(tmp_path):
+    scores_dir = tmp_path / 'ReAct' / 'repo' / 'scores'
+    scores_dir.mkdir(parents=True)
+    (scores_dir / 'gpt-4o_gpt-4o_12.json').write_text(json.dumps(JUDGE_SCORES))
+
+    warehouse = ScoreWarehouse(str(tmp_path / 'scores.db'))
+    try:
+        assert warehouse.ingest(str(tmp_path))['updated'] == 1
+        rows = dict(warehouse.conn.execute("SELECT criterion, score FROM scores").fetchall())
+    finally:
+        warehouse.close()
+    assert rows == {'accuracy': 7.0, 'completeness': 6.0, 'clarity': 8.0, 'total_score': 21.0}
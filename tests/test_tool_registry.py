@@ -0,0 +1,57 @@
+import sys
+import json
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 将项目根目录加入执行目录列表
+
+from utils.tool_registry import ToolRegistry, ToolExecutor
+
+
+def test_timed_out_call_is_not_reused():
+    release = threading.Event()
+    calls = []
+
+    def tool(param):
+        calls.append(param)
+        if len(calls) == 1:
+            release.wait(5)
+        return 'ok'
+
+    registry = ToolRegistry()
+    registry.register('tool', tool, timeout=0.05)
+    executor = ToolExecutor(registry)
+    try:
+        assert 'timed out' in executor.execute('tool', {'a': 1})
+        assert executor.execute('tool', {'a': 1}) == 'ok'
+        assert len(calls) == 2
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_error_results_are_not_cached():
+    calls = []
+
+    def tool(param):
+        calls.append(param)
+        return json.dumps({'error': 'Code knowledge graph file not found'}) if len(calls) == 1 else 'ok'
+
+    registry = ToolRegistry()
+    registry.register('tool', tool)
+    executor = ToolExecutor(registry)
+    try:
+        assert 'error' in executor.execute('tool', {})
+        assert executor.execute('tool', {}) == 'ok'
+        assert executor.execute('tool', {}) == 'ok'
+        assert len(calls) == 2
+    finally:
+        executor.shutdown()
+
+
+def test_shutdown_releases_pool():
+    registry = ToolRegistry()
+    registry.register('tool', lambda param: 'ok')
+    executor = ToolExecutor(registry)
+    executor.execute('tool', {})
+    executor.shutdown()
+    assert executor.pool is None and executor.memo == {}
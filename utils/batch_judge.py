@@ -0,0 +1,294 @@
+import os
+import json
+import time
+import requests
+import threading
+import concurrent.futures
+from datetime import datetime
+from tasks.Judge import Judge
+from tasks.BaseTask import supports_openai_batch, OPENAI_COMPATIBLE_API_BASE
+from utils.manifest import track_stage
+from utils.prejudge import prejudge_batch, short_circuit_scores, codet5_encoder
+
+BATCH_BACKENDS = ('openai', 'local', 'concurrent')
+TERMINAL_BATCH_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+class BatchJudge:
+    """
+    批量评分：先收集所有(配置, 测试计划)评分任务，再一次性提交。
+    - openai：OpenAI Batch API（上传JSONL、创建批次、轮询、下载结果）
+    - local：本地模拟批处理接口，读写与Batch API相同格式的JSONL，逐行并发调用普通接口
+    - concurrent：高并发直接调用普通接口
+    所有请求的系统提示相同且放在最前面，便于服务商复用提示前缀缓存。
+    """
+
+    def __init__(self, backend='concurrent', concurrency=16, poll_interval=30,
+                 api_base=OPENAI_COMPATIBLE_API_BASE, work_dir='./result/judge_batches', manifest=None):
+        """
+        Args:
+            backend (str, optional): 'openai'、'local'或'concurrent'
+            concurrency (int, optional): local和concurrent后端的并发请求数
+            poll_interval (int, optional): openai后端轮询批次状态的间隔（秒）
+            api_base (str, optional): Batch API的地址
+            work_dir (str, optional): 批次输入输出文件和汇总分数文件的目录
+            manifest (RunManifest, optional): 运行清单
+        """
+        if backend not in BATCH_BACKENDS:
+            raise ValueError(f"Unknown batch judge backend: {backend}")
+        self.backend = backend
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.api_base = api_base.rstrip('/')
+        self.work_dir = work_dir
+        self.manifest = manifest
+        self.jobs = []
+        self.lock = threading.Lock()
+
+    def add(self, config, test_plan_path):
+        """
+        添加一个评分任务。批量评分每个任务只发送一个请求，不支持多样本评分（Judge.samples > 1）。
+
+        Returns:
+            str: 任务的custom_id
+        """
+        if config['Judge'].get('samples', 1) > 1:
+            raise ValueError("batch judging does not support Judge.samples > 1")
+        if self.backend == 'openai' and not supports_openai_batch(config['Judge']['llm_model']):
+            raise ValueError(f"OpenAI batch backend does not support judge model {config['Judge']['llm_model']} (use --batch-judge concurrent)")
+        with self.lock:
+            custom_id = f"{len(self.jobs)}-{config['Agent']['strategy']}-{config['Agent']['llm_model']}-{config['Judge']['llm_model']}-{config['Judge']['pull_number']}"
+            self.jobs.append({'custom_id': custom_id, 'config': config, 'test_plan_path': test_plan_path})
+        return custom_id
+
+    def run(self):
+        """
+        提交所有评分任务，保存每个PR的分数文件和一个汇总分数文件。
+
+        Returns:
+            list: 每个任务的结果字典（pr_url、strategy、llm_model、judge_model、test_plan_path、scores或error）
+        """
+        if not self.jobs:
+            return []
+        os.makedirs(self.work_dir, exist_ok=True)
+        batch_name = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        # 构建请求体
+        judges = {}
+        build_errors = {}
+        for job in self.jobs:
+            try:
+                judges[job['custom_id']] = Judge(job['config'], job['test_plan_path'])
+            except Exception as e:
+                build_errors[job['custom_id']] = f"failed to build scoring request: {e}"
+        
+        # 本地预评分（整批向量化计算），退化的测试计划不提交LLM评分
+        prejudge_results = self.prejudge(judges)
+        short_circuited = {
+            custom_id: short_circuit_scores(result) for custom_id, result in prejudge_results.items() if result['degenerate']
+        }
+        
+        batch_requests = []
+        for job in self.jobs:
+            if job['custom_id'] in judges and job['custom_id'] not in short_circuited:
+                try:
+                    body = judges[job['custom_id']].build_scoring_request()
+                    batch_requests.append({'custom_id': job['custom_id'], 'model': job['config']['Judge']['llm_model'], 'body': body})
+                except Exception as e:
+                    build_errors[job['custom_id']] = f"failed to build scoring request: {e}"
+
+        print(f"Submitting {len(batch_requests)} scoring requests with the {self.backend} backend")
+        if not batch_requests:
+            responses = {}
+        elif self.backend == 'concurrent':
+            responses = self.run_concurrent(batch_requests, judges)
+        else:
+            input_path = os.path.join(self.work_dir, f"batch_{batch_name}_input.jsonl")
+            write_batch_input(batch_requests, input_path)
+            if self.backend == 'openai':
+                output_text = self.run_openai_batch(input_path, batch_requests)
+            else:
+                output_text = self.run_local_batch(input_path, judges)
+            output_path = os.path.join(self.work_dir, f"batch_{batch_name}_output.jsonl")
+            with open(output_path, 'w') as f:
+                f.write(output_text)
+            responses = read_batch_output(output_text)
+
+        # 解析分数并保存每个PR的分数文件
+        results = []
+        for job in self.jobs:
+            config = job['config']
+            judge = judges.get(job['custom_id'])
+            result = {
+                'pr_url': config['Agent']['PR_url'],
+                'strategy': config['Agent']['strategy'],
+                'llm_model': config['Agent']['llm_model'],
+                'judge_model': config['Judge']['llm_model'],
+                'test_plan_path': job['test_plan_path']
+            }
+            if job['custom_id'] in build_errors:
+                print(f"Error scoring test plan for PR {result['pr_url']} ({result['strategy']}/{result['llm_model']}): {build_errors[job['custom_id']]}")
+                result['error'] = build_errors[job['custom_id']]
+                results.append(result)
+                continue
+            if job['custom_id'] in short_circuited:
+                result['scores'] = short_circuited[job['custom_id']]
+                with track_stage(self.manifest, config, 'judge') as record:
+                    record['artifact'] = judge.save_scores(result['scores'])
+                results.append(result)
+                continue
+            response_dict = responses.get(job['custom_id'])
+            try:
+                with track_stage(self.manifest, config, 'judge') as record:
+                    # 在阶段内抛出，清单中记录为失败
+                    if response_dict is None:
+                        raise ValueError("no response returned for this request")
+                    if self.backend == 'openai':
+                        judge.record_usage(response_dict)
+                    content = judge.parse_chat_response(response_dict, config['Judge']['llm_model'], judge.response_format())
+                    result['scores'] = judge.parse_scores(content)
+                    # 与Judge.run相同，LLM评分的结果也附带预评分指标
+                    if job['custom_id'] in prejudge_results:
+                        result['scores']['prejudge'] = prejudge_results[job['custom_id']]
+                    record['artifact'] = judge.save_scores(result['scores'])
+                    record['tokens'] = dict(judge.token_usage)
+            except Exception as e:
+                print(f"Error scoring test plan for PR {result['pr_url']} ({result['strategy']}/{result['llm_model']}): {e}")
+                result['error'] = str(e)
+            results.append(result)
+
+        # 汇总分数文件
+        consolidated_path = os.path.join(self.work_dir, f"scores_{batch_name}.json")
+        with open(consolidated_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Consolidated scores saved to {consolidated_path}")
+        return results
+
+    def prejudge(self, judges):
+        """
+        对配置了Judge.prejudge的任务整批计算预评分。
+        
+        Returns:
+            dict: custom_id到预评分结果的映射（见prejudge_batch）
+        """
+        ids = [custom_id for custom_id, judge in judges.items() if judge.config['Judge'].get('prejudge', False)]
+        if not ids:
+            return {}
+        use_embedding = any(judges[custom_id].config['Judge'].get('prejudge_embedding', False) for custom_id in ids)
+        results = prejudge_batch(
+            [judges[custom_id].load_test_plan() for custom_id in ids],
+            [judges[custom_id].reformat_pr_info.get('Test_Plan', '') or '' for custom_id in ids],
+            codet5_encoder() if use_embedding else None
+        )
+        print(f"Pre-judge skipped {sum(result['degenerate'] for result in results)}/{len(ids)} degenerate test plans")
+        return dict(zip(ids, results))
+    
+    def run_concurrent(self, batch_requests, judges):
+        """
+        Returns:
+            dict: custom_id到接口返回JSON的映射（失败的请求为None）
+        """
+        responses = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            future_to_id = {
+                executor.submit(judges[request['custom_id']].post_llm_request, request['body'], request['model']): request['custom_id']
+                for request in batch_requests
+            }
+            for future in concurrent.futures.as_completed(future_to_id):
+                try:
+                    responses[future_to_id[future]] = future.result()
+                except Exception as e:
+                    print(f"Scoring request {future_to_id[future]} failed: {e}")
+                    responses[future_to_id[future]] = None
+        return responses
+
+    def run_local_batch(self, input_path, judges):
+        """
+        本地模拟的批处理接口：读取Batch API格式的输入文件，返回Batch API格式的输出文本。
+        """
+        with open(input_path, 'r') as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        batch_requests = [{'custom_id': line['custom_id'], 'model': line['body']['model'], 'body': line['body']} for line in lines]
+        responses = self.run_concurrent(batch_requests, judges)
+
+        output_lines = []
+        for request in batch_requests:
+            response_dict = responses.get(request['custom_id'])
+            if response_dict is None:
+                output_lines.append({'custom_id': request['custom_id'], 'response': None, 'error': {'message': 'request failed'}})
+            else:
+                output_lines.append({'custom_id': request['custom_id'], 'response': {'status_code': 200, 'body': response_dict}, 'error': None})
+        return ''.join(json.dumps(line) + '\n' for line in output_lines)
+
+    def run_openai_batch(self, input_path, batch_requests):
+        """
+        通过OpenAI Batch API提交并等待批次完成。Claude、DashScope（deepseek/qwen）等不走OpenAI兼容接口的模型
+        在add时已经被拒绝，应使用concurrent后端。
+        """
+        headers = {"Authorization": f"Bearer {os.environ.get('OPENAI_API_KEY')}"}
+
+        with open(input_path, 'rb') as f:
+            response = requests.post(f"{self.api_base}/files", headers=headers, files={'file': f}, data={'purpose': 'batch'})
+        response.raise_for_status()
+        input_file_id = response.json()['id']
+
+        response = requests.post(f"{self.api_base}/batches", headers=headers, json={
+            'input_file_id': input_file_id,
+            'endpoint': '/v1/chat/completions',
+            'completion_window': '24h'
+        })
+        response.raise_for_status()
+        batch = response.json()
+        print(f"Created batch {batch['id']}")
+
+        while batch['status'] not in TERMINAL_BATCH_STATUSES:
+            time.sleep(self.poll_interval)
+            response = requests.get(f"{self.api_base}/batches/{batch['id']}", headers=headers)
+            response.raise_for_status()
+            batch = response.json()
+            counts = batch.get('request_counts') or {}
+            print(f"Batch {batch['id']}: {batch['status']} ({counts.get('completed', 0)}/{counts.get('total', 0)})")
+
+        if not batch.get('output_file_id'):
+            raise RuntimeError(f"Batch {batch['id']} finished with status {batch['status']} and no output")
+        response = requests.get(f"{self.api_base}/files/{batch['output_file_id']}/content", headers=headers)
+        response.raise_for_status()
+        return response.text
+
+
+def write_batch_input(batch_requests, input_path):
+    """
+    写入Batch API格式的输入文件（每行一个请求）。
+    """
+    with open(input_path, 'w') as f:
+        for request in batch_requests:
+            f.write(json.dumps({
+                'custom_id': request['custom_id'],
+                'method': 'POST',
+                'url': '/v1/chat/completions',
+                'body': request['body']
+            }) + '\n')
+    return input_path
+
+
+def read_batch_output(output_text):
+    """
+    解析Batch API格式的输出文本，跳过无法解析的行。
+
+    Returns:
+        dict: custom_id到接口返回JSON的映射（失败的请求为None）
+    """
+    responses = {}
+    for line in output_text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        response = record.get('response') or {}
+        if record.get('error') or response.get('status_code') != 200:
+            responses[record.get('custom_id')] = None
+        else:
+            responses[record.get('custom_id')] = response.get('body')
+    return responses
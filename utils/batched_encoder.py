@@ -0,0 +1,83 @@
+import torch
+
+DEFAULT_MAX_LENGTH = 512
+# 每个批次的token预算（批次大小 x 批次内最长序列），默认与原来16条x512的固定批次相同
+DEFAULT_BATCH_TOKENS = 8192
+DEFAULT_MAX_BATCH_SIZE = 64
+
+
+def plan_batches(lengths, max_tokens=DEFAULT_BATCH_TOKENS, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+    """
+    按token长度排序后切分批次：长度相近的序列放在同一批次里，填充浪费最少；
+    每个批次的大小由token预算决定，短序列的批次更大，长序列的批次更小。
+
+    Args:
+        lengths (list): 每条文本的token数
+        max_tokens (int, optional): 每个批次的token预算
+        max_batch_size (int, optional): 批次大小上限
+
+    Returns:
+        list: 每个批次的原始位置列表
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    current = []
+    for i in order:
+        # 升序排列，当前序列就是加入后批次内最长的序列
+        if current and ((len(current) + 1) * lengths[i] > max_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def mean_pool(hidden, attention_mask):
+    """
+    只对非填充位置求平均。
+    """
+    mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+    return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+
+
+def encode_texts(texts, tokenizer, model, device, max_length=DEFAULT_MAX_LENGTH, max_tokens=DEFAULT_BATCH_TOKENS,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE, progress=None, lock=None):
+    """
+    长度分桶、动态填充的批量编码：一次性分词（不填充），按长度排序分批，每个批次只填充到批次内最长序列，
+    编码后按原始顺序返回标准化的嵌入。
+
+    Args:
+        texts (list): 文本列表
+        tokenizer: 分词器
+        model: 编码器模型，返回last_hidden_state
+        device (torch.device): 模型所在设备
+        max_length (int, optional): 截断长度
+        max_tokens (int, optional): 每个批次的token预算
+        max_batch_size (int, optional): 批次大小上限
+        progress (callable, optional): 包装批次迭代器的进度条，例如tqdm
+        lock (threading.Lock, optional): 共享模型的推理锁，按批次获取，多个任务的批次可以交替执行
+
+    Returns:
+        torch.Tensor: (n, dim)标准化嵌入，在CPU上，与texts顺序一致
+    """
+    if not texts:
+        return torch.zeros((0, model.config.d_model))
+
+    encoded = tokenizer(list(texts), max_length=max_length, truncation=True)
+    input_ids = encoded['input_ids']
+    batches = plan_batches([len(ids) for ids in input_ids], max_tokens, max_batch_size)
+
+    embeddings = [None] * len(texts)
+    with torch.no_grad():
+        for batch in (progress(batches) if progress else batches):
+            inputs = tokenizer.pad({'input_ids': [input_ids[i] for i in batch]}, return_tensors='pt').to(device)
+            if lock is not None:
+                with lock:
+                    hidden = model(input_ids=inputs['input_ids'], attention_mask=inputs['attention_mask']).last_hidden_state
+            else:
+                hidden = model(input_ids=inputs['input_ids'], attention_mask=inputs['attention_mask']).last_hidden_state
+            pooled = torch.nn.functional.normalize(mean_pool(hidden, inputs['attention_mask']).float(), p=2, dim=1).cpu()
+            for row, i in enumerate(batch):
+                embeddings[i] = pooled[row]
+    return torch.stack(embeddings)
@@ -0,0 +1,183 @@
+import ast
+import textwrap
+
+# 编码器的512个位置中去掉首尾两个特殊token
+DEFAULT_CHUNK_TOKENS = 510
+DEFAULT_OVERLAP_TOKENS = 64
+# 嵌套语句最多展开到第几层（类 -> 方法 -> 方法体中的语句）
+MAX_BOUNDARY_DEPTH = 3
+
+
+def statement_boundaries(code):
+    """
+    代码块中可以切分的行号（从0开始）：Python代码使用ast，取各层语句（含装饰器）的起始行；
+    无法解析的代码（其他语言或不完整的片段）退化为空行之后的行和缩进不超过一层的行。
+
+    Returns:
+        list: 升序的行号，第一个总是0
+    """
+    lines = code.split('\n')
+    boundaries = {0}
+    try:
+        tree = ast.parse(textwrap.dedent(code))
+    except SyntaxError:
+        tree = None
+
+    if tree is not None:
+        def visit(body, depth):
+            for stmt in body:
+                decorators = getattr(stmt, 'decorator_list', [])
+                boundaries.add(min([stmt.lineno] + [d.lineno for d in decorators]) - 1)
+                if depth < MAX_BOUNDARY_DEPTH:
+                    for field in ('body', 'orelse', 'finalbody'):
+                        children = getattr(stmt, field, None)
+                        if isinstance(children, list) and children and isinstance(children[0], ast.stmt):
+                            visit(children, depth + 1)
+                    for handler in getattr(stmt, 'handlers', []):
+                        boundaries.add(handler.lineno - 1)
+                        visit(handler.body, depth + 1)
+        visit(tree.body, 1)
+    else:
+        indents = [len(line) - len(line.lstrip()) for line in lines if line.strip()]
+        base = min(indents) if indents else 0
+        for i in range(1, len(lines)):
+            line = lines[i]
+            if not line.strip():
+                continue
+            if not lines[i - 1].strip() or len(line) - len(line.lstrip()) <= base + 4:
+                boundaries.add(i)
+    return sorted(b for b in boundaries if 0 <= b < len(lines))
+
+
+# 窗口中相邻片段之间用换行连接，每个片段按多一个token计算
+JOIN_TOKENS = 1
+# 合并后的窗口重新计数仍超过预算时，缩小预算重新切分的最多次数
+MAX_RESPLIT_DEPTH = 3
+
+
+def chunk_code(code, count_tokens, max_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+    """
+    把长代码块沿语句边界切分为有重叠的窗口：相邻的语句段尽量合并到max_tokens以内，
+    下一个窗口以上一个窗口末尾不超过overlap_tokens的语句段开头。单个语句段超过预算时按行切分。
+    合并后的窗口会重新计数（分别分词再相加与整体分词的结果不完全相同），超过预算的窗口缩小预算后再切分。
+
+    Args:
+        code (str): 代码块
+        count_tokens (callable): 文本列表到token数列表的函数
+        max_tokens (int, optional): 每个窗口的token预算
+        overlap_tokens (int, optional): 窗口之间重叠的token数上限
+
+    Returns:
+        list: 窗口文本，短代码块只有它本身
+    """
+    return _chunk_code(code, count_tokens, max_tokens, overlap_tokens, max_tokens, 0)
+
+
+def _chunk_code(code, count_tokens, budget, overlap_tokens, max_tokens, depth):
+    lines = code.split('\n')
+    boundaries = statement_boundaries(code) + [len(lines)]
+    segments = ['\n'.join(lines[start:end]) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+    counts = count_tokens(segments)
+
+    # 超过预算的语句段按行切分；每个片段加上与前一个片段之间换行的token
+    pieces = []
+    for segment, count in zip(segments, counts):
+        if count + JOIN_TOKENS <= budget:
+            pieces.append((segment, count + JOIN_TOKENS))
+        else:
+            segment_lines = segment.split('\n')
+            pieces.extend((line, line_count + JOIN_TOKENS) for line, line_count in zip(segment_lines, count_tokens(segment_lines)))
+
+    chunks = []
+    window = []
+    window_tokens = 0
+    for piece, count in pieces:
+        if window and window_tokens + count > budget:
+            chunks.append('\n'.join(text for text, _ in window))
+            # 保留末尾的语句段作为重叠部分
+            overlap = []
+            overlap_count = 0
+            for text, text_count in reversed(window):
+                if overlap_count + text_count > overlap_tokens or overlap_count + text_count + count > budget:
+                    break
+                overlap.insert(0, (text, text_count))
+                overlap_count += text_count
+            window = overlap
+            window_tokens = overlap_count
+        window.append((piece, count))
+        window_tokens += count
+    if window:
+        chunks.append('\n'.join(text for text, _ in window))
+    if not chunks:
+        return [code]
+
+    # 整体重新计数，仍超过预算的窗口按超出的部分缩小预算再切分
+    results = []
+    for chunk, count in zip(chunks, count_tokens(chunks)):
+        if count > max_tokens and depth < MAX_RESPLIT_DEPTH and '\n' in chunk:
+            results.extend(_chunk_code(chunk, count_tokens, budget - (count - max_tokens), overlap_tokens, max_tokens, depth + 1))
+        else:
+            results.append(chunk)
+    return results
+
+
+def chunk_blocks(codes, tokenizer, max_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+    """
+    把所有代码块展开为编码用的窗口列表，不超过预算的代码块原样保留。
+
+    Args:
+        codes (list): 代码块文本
+        tokenizer: 分词器
+        max_tokens (int, optional): 每个窗口的token预算
+        overlap_tokens (int, optional): 窗口之间重叠的token数上限
+
+    Returns:
+        tuple: (窗口文本列表, 每个窗口所属代码块的下标列表)
+    """
+    def count_tokens(texts):
+        if not texts:
+            return []
+        return [len(ids) for ids in tokenizer(list(texts), add_special_tokens=False)['input_ids']]
+
+    # 每个token至少对应一个字符，字符数不超过预算的代码块不需要分词
+    long_blocks = [i for i, code in enumerate(codes) if len(code) > max_tokens]
+    long_counts = dict(zip(long_blocks, count_tokens([codes[i] for i in long_blocks])))
+
+    chunks = []
+    owners = []
+    for i, code in enumerate(codes):
+        if long_counts.get(i, 0) > max_tokens:
+            block_chunks = chunk_code(code, count_tokens, max_tokens, overlap_tokens)
+        else:
+            block_chunks = [code]
+        chunks.extend(block_chunks)
+        owners.extend([i] * len(block_chunks))
+    return chunks, owners
+
+
+def max_sim_per_block(scores, chunk_indices, owners, top_k):
+    """
+    按代码块聚合窗口的检索结果：每个代码块取其窗口中的最高分（max-sim）。
+
+    Args:
+        scores (list): 按分数降序的窗口分数
+        chunk_indices (list): 对应的窗口下标（-1表示空位）
+        owners (list): 每个窗口所属代码块的下标
+        top_k (int): 返回的代码块数量
+
+    Returns:
+        list: (代码块下标, 分数, 窗口下标)，按分数降序
+    """
+    results = []
+    seen = set()
+    for score, chunk in zip(scores, chunk_indices):
+        if chunk < 0:
+            continue
+        block = owners[chunk]
+        if block in seen:
+            continue
+        seen.add(block)
+        results.append((block, float(score), int(chunk)))
+        if len(results) >= top_k:
+            break
+    return results
@@ -0,0 +1,408 @@
+import os
+import ast
+import sys
+import json
+import hashlib
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
+
+from utils.executors import BACKENDS, map_unordered
+
+# 记录文件的默认目录（每个项目一个文件），增量更新时读取上一次的记录
+DEFAULT_RECORDS_DIR = str(Path(__file__).resolve().parents[1] / 'source' / 'code_records')
+LANGUAGES = {'py': 'python', 'ts': 'typescript', 'tsx': 'tsx', 'js': 'javascript'}
+
+# 每个工作者进程中按语言缓存的tree-sitter解析器
+_parsers = {}
+
+
+def file_hash(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+def _get_parser(ext):
+    if ext not in _parsers:
+        try:
+            from tree_sitter_languages import get_parser
+            _parsers[ext] = get_parser(LANGUAGES[ext])
+        except ImportError:
+            _parsers[ext] = None
+    return _parsers[ext]
+
+
+class _CallCollector(ast.NodeVisitor):
+    """
+    收集函数体中调用的函数名：func()记为func，obj.method()记为method。
+    """
+
+    def __init__(self):
+        self.calls = set()
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name):
+            self.calls.add(node.func.id)
+        elif isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name):
+            self.calls.add(node.func.attr)
+        self.generic_visit(node)
+
+
+def _python_definitions(content):
+    """
+    用ast提取Python文件中所有层级的类和函数（先序遍历，类在其方法之前）。
+    列号为UTF-8字节偏移，与tree-sitter一致。
+    """
+    tree = ast.parse(content)
+    definitions = []
+
+    def visit(node, parent_class):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                definition = {
+                    'type': 'class' if isinstance(child, ast.ClassDef) else 'function',
+                    'name': child.name,
+                    'start_line': child.lineno,
+                    'end_line': child.end_lineno,
+                    'start_col': child.col_offset,
+                    'end_col': child.end_col_offset,
+                    # 直接定义在类体中的方法记录所属的类
+                    'parent': parent_class
+                }
+                if isinstance(child, ast.AsyncFunctionDef):
+                    definition['async'] = True
+                if not isinstance(child, ast.ClassDef):
+                    collector = _CallCollector()
+                    collector.visit(child)
+                    definition['references'] = sorted(collector.calls)
+                definitions.append(definition)
+                visit(child, child.name if isinstance(child, ast.ClassDef) else None)
+            else:
+                visit(child, None)
+
+    visit(tree, None)
+    return definitions
+
+
+def _tree_sitter_definitions(content, ext):
+    """
+    用tree-sitter提取类和函数（ts/tsx/js，以及ast无法解析的Python文件）。
+    """
+    parser = _get_parser(ext)
+    if parser is None:
+        return None
+    if ext == 'py':
+        kinds = {'function_definition': 'function', 'class_definition': 'class'}
+    else:
+        kinds = {'function_declaration': 'function', 'method_definition': 'function', 'class_declaration': 'class'}
+
+    definitions = []
+    stack = [parser.parse(content).root_node]
+    while stack:
+        node = stack.pop()
+        if node.type in kinds:
+            name = next((child.text.decode('utf8') for child in node.children if child.type == 'identifier'), None)
+            if name:
+                definitions.append({
+                    'type': kinds[node.type],
+                    'name': name,
+                    'start_line': node.start_point[0] + 1,
+                    'end_line': node.end_point[0] + 1,
+                    'start_col': node.start_point[1],
+                    'end_col': node.end_point[1],
+                    'parent': None
+                })
+        # 逆序压栈，保持先序遍历的顺序
+        stack.extend(reversed(node.children))
+    return definitions
+
+
+def extract_file(item):
+    """
+    解析一个文件（在工作者进程中执行）。
+
+    Args:
+        item (tuple): (相对路径, 文件内容bytes, 内容哈希)
+
+    Returns:
+        dict: 文件记录 {path, hash, lang, parser, text, definitions}
+    """
+    rel_path, content, content_hash = item
+    ext = rel_path.rsplit('.', 1)[-1]
+    text = content.decode('utf8', errors='replace')
+    definitions = None
+    parser = 'ast'
+    if ext == 'py':
+        try:
+            definitions = _python_definitions(content)
+        except (SyntaxError, ValueError):
+            definitions = None
+    if definitions is None:
+        parser = 'tree-sitter'
+        definitions = _tree_sitter_definitions(content, ext) or []
+    return {'path': rel_path, 'hash': content_hash, 'lang': ext, 'parser': parser, 'text': text, 'definitions': definitions}
+
+
+def iter_records(records_path):
+    """
+    逐行读取记录文件。
+    """
+    with open(records_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def default_records_path(directory):
+    """
+    项目的默认记录文件：保存在仓库的source/code_records目录下，而不是被分析的项目目录中，
+    避免弄脏项目的工作区，也不会被代理的文件搜索工具和代码知识图谱扫描到。
+    """
+    directory = os.path.abspath(directory)
+    digest = hashlib.sha1(directory.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(DEFAULT_RECORDS_DIR, f"{os.path.basename(directory)}-{digest}.jsonl")
+
+
+def _index_records(records_path):
+    """
+    为已有的记录文件建立索引 {相对路径: (内容哈希, 行的字节偏移)}，不在内存中保存记录内容。
+    """
+    index = {}
+    offset = 0
+    with open(records_path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                index[record['path']] = (record['hash'], offset)
+            offset += len(line)
+    return index
+
+
+def extract_project(directory, records_path=None, workers=4, backend='process'):
+    """
+    流式、并行、增量地提取项目中所有代码文件的类和函数定义，写入JSONL记录文件（每个文件一行，按路径排序）。
+    内容哈希与上一次记录相同的文件直接复用，只解析新增或修改过的文件。
+    文件边遍历边提交给工作者，解析结果直接写入临时文件；内存中只保存每个文件记录的位置。
+
+    Args:
+        directory (str): 项目目录
+        records_path (str, optional): 记录文件路径，默认见default_records_path
+        workers (int, optional): 并行解析的工作者数量
+        backend (str, optional): 执行后端，见utils.executors.BACKENDS。解析受GIL限制，默认使用进程；
+            进程用spawn启动（调用方可能已经加载了torch，fork后其线程池不可用）
+
+    Returns:
+        str: 记录文件路径
+    """
+    records_path = records_path or default_records_path(directory)
+    records_dir = os.path.dirname(os.path.abspath(records_path))
+    os.makedirs(records_dir, exist_ok=True)
+
+    previous = {}
+    previous_file = None
+    if os.path.exists(records_path):
+        try:
+            previous = _index_records(records_path)
+            previous_file = open(records_path, 'rb')
+        except (json.JSONDecodeError, KeyError, OSError):
+            previous = {}
+
+    # 新解析的记录先按完成顺序写入spool，最后按路径排序合并；locations: 相对路径 -> (文件, 偏移)
+    spool = tempfile.TemporaryFile(dir=records_dir)
+    locations = {}
+    counts = {'changed': 0, 'unchanged': 0}
+
+    def write_record(record):
+        spool.seek(0, os.SEEK_END)
+        locations[record['path']] = (spool, spool.tell())
+        spool.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    def changed_files():
+        for root, _, files in os.walk(directory):
+            for file in files:
+                file_path = os.path.join(root, file)
+                if os.path.abspath(file_path) == os.path.abspath(records_path) or (
+                        file.startswith(os.path.basename(records_path) + '.') and file.endswith('.tmp')):
+                    continue
+                rel_path = Path(os.path.relpath(file_path, directory)).as_posix()
+                if file.rsplit('.', 1)[-1] not in LANGUAGES or '.' not in file:
+                    # 非代码文件只记录路径（代码知识图谱的目录结构需要）
+                    write_record({'path': rel_path, 'hash': None, 'lang': None, 'parser': None, 'text': None, 'definitions': []})
+                    continue
+                try:
+                    with open(file_path, 'rb') as f:
+                        content = f.read()
+                except OSError as e:
+                    print(f"Error reading {file_path}: {e}")
+                    continue
+                content_hash = file_hash(content)
+                if rel_path in previous and previous[rel_path][0] == content_hash:
+                    locations[rel_path] = (previous_file, previous[rel_path][1])
+                    counts['unchanged'] += 1
+                else:
+                    counts['changed'] += 1
+                    yield rel_path, content, content_hash
+
+    tmp_path = None
+    try:
+        mp_context = multiprocessing.get_context('spawn') if backend == 'process' else None
+        for item, record, error in map_unordered(extract_file, changed_files(), backend, workers, mp_context=mp_context):
+            if error is not None:
+                # 工作者异常退出时在当前进程中重新解析，避免记录中缺少文件
+                try:
+                    record = extract_file(item)
+                except Exception as e:
+                    print(f"Error processing {item[0]}: {e}")
+                    continue
+            write_record(record)
+        print(f"Code extraction: {counts['changed']} changed files, {counts['unchanged']} unchanged code files")
+
+        # 同一个仓库可能有多个任务同时提取，每次写入唯一的临时文件再原子替换
+        fd, tmp_path = tempfile.mkstemp(dir=records_dir, prefix=os.path.basename(records_path) + '.', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            for rel_path in sorted(locations):
+                source, offset = locations[rel_path]
+                source.seek(offset)
+                line = source.readline()
+                f.write(line if line.endswith(b'\n') else line + b'\n')
+        os.replace(tmp_path, records_path)
+        tmp_path = None
+    finally:
+        spool.close()
+        if previous_file is not None:
+            previous_file.close()
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return records_path
+
+
+def definition_code(record, definition):
+    """
+    定义的源代码（按行号和字节列号从文件文本中截取）。
+    """
+    lines = record['text'].split('\n')[definition['start_line'] - 1:definition['end_line']]
+    if not lines:
+        return ''
+    encoded = [line.encode('utf8') for line in lines]
+    if len(encoded) == 1:
+        return encoded[0][definition['start_col']:definition['end_col']].decode('utf8', errors='replace')
+    encoded[0] = encoded[0][definition['start_col']:]
+    encoded[-1] = encoded[-1][:definition['end_col']]
+    return b'\n'.join(encoded).decode('utf8', errors='replace')
+
+
+def iter_code_blocks(records):
+    """
+    嵌入策略使用的代码块：{path, file, name, type, code}，path为文件的相对路径。
+    """
+    for record in records:
+        for definition in record['definitions']:
+            code = definition_code(record, definition)
+            if code and definition['name']:
+                yield {
+                    'path': record['path'],
+                    'file': os.path.basename(record['path']),
+                    'name': definition['name'],
+                    'type': definition['type'],
+                    'code': code
+                }
+
+
+def _tree_node(tree, rel_path):
+    parts = rel_path.split('/')
+    current = tree
+    for part in parts[:-1]:
+        current = current.setdefault(part, {})
+    return current, parts[-1]
+
+
+def build_code_structure(records):
+    """
+    parse_project输出的code_structure.json结构：{目录: {文件名: [{type, name, code, file}]}}，只包含有定义的文件。
+    """
+    results = {}
+    for record in records:
+        items = [
+            {'type': block['type'], 'name': block['name'], 'code': block['code'], 'file': block['file']}
+            for block in iter_code_blocks([record])
+        ]
+        if items:
+            current, file_name = _tree_node(results, record['path'])
+            current.setdefault(file_name, []).extend(items)
+    return results
+
+
+def build_ckg_structure(records):
+    """
+    代码知识图谱使用的仓库结构（与CKG.utils.create_structure相同）：
+    Python文件为{classes, functions, text}，其他文件为{}。
+    """
+    structure = {}
+    for record in records:
+        current, file_name = _tree_node(structure, record['path'])
+        if record['lang'] != 'py':
+            current[file_name] = {}
+            continue
+        if record['parser'] != 'ast':
+            # ast无法解析的文件与原来的parse_python_file一样留空
+            current[file_name] = {'classes': [], 'functions': [], 'text': ''}
+            continue
+        lines = record['text'].splitlines()
+        classes = []
+        functions = []
+        definitions = record['definitions']
+        for definition in definitions:
+            text = lines[definition['start_line'] - 1:definition['end_line']]
+            if definition['type'] == 'class':
+                methods = [
+                    {
+                        'name': d['name'],
+                        'start_line': d['start_line'],
+                        'end_line': d['end_line'],
+                        'text': lines[d['start_line'] - 1:d['end_line']],
+                        'references': d.get('references', [])
+                    }
+                    for d in definitions
+                    if d['parent'] == definition['name'] and d['type'] == 'function' and not d.get('async')
+                ]
+                classes.append({
+                    'name': definition['name'],
+                    'start_line': definition['start_line'],
+                    'end_line': definition['end_line'],
+                    'text': text,
+                    'methods': methods
+                })
+            elif not definition.get('async') and definition['parent'] is None:
+                # 按所属的类排除方法；不能按名称排除，否则与某个方法同名的顶层函数会丢失
+                functions.append({
+                    'name': definition['name'],
+                    'start_line': definition['start_line'],
+                    'end_line': definition['end_line'],
+                    'text': text,
+                    'references': definition.get('references', [])
+                })
+        current[file_name] = {'classes': classes, 'functions': functions, 'text': lines}
+    return structure
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incrementally extract class/function definitions of a project into JSONL records')
+    parser.add_argument('directory', help='Project directory')
+    parser.add_argument('--records', help=f'Records file (default: {DEFAULT_RECORDS_DIR}/<project>-<hash>.jsonl)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='Parallel parser workers')
+    parser.add_argument('--backend', choices=BACKENDS, default='process', help='Run the parser workers as spawned processes or threads')
+    parser.add_argument('--code-structure', help='Also write the parse_project code_structure.json to this path')
+    args = parser.parse_args()
+
+    records_path = extract_project(args.directory, args.records, args.workers, args.backend)
+    print(f"Records saved to {records_path}")
+    if args.code_structure:
+        with open(args.code_structure, 'w', encoding='utf-8') as f:
+            json.dump(build_code_structure(iter_records(records_path)), f, ensure_ascii=False, indent=2)
+        print(f"Code structure saved to {args.code_structure}")
+
+
+if __name__ == '__main__':
+    main()
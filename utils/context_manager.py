@@ -0,0 +1,222 @@
+import hashlib
+import tiktoken
+
+BUDGET_EXHAUSTED_NOTICE = (
+    "\nThe exploration budget for this run is almost used up. "
+    "Do not call any more tools; provide the Test Plan Details now.\n"
+)
+
+
+class ContextManager:
+    """
+    ReAct循环的上下文管理器。
+    统计提示的token数量，对相同的观察结果去重，并在接近预算时压缩较早的观察结果。
+    重复的观察结果引用第一次出现的轮次；被引用的轮次被压缩时，完整内容转移到最后一个重复的轮次。
+    """
+
+    def __init__(self, config, base_prompt):
+        """
+        用提供的配置初始化上下文管理器。
+
+        Args:
+            config (dict): 任务的配置字典
+            base_prompt (str): 每轮都会发送的固定用户提示（PR信息等）
+        """
+        agent_config = config['Agent']
+        self.token_budget = agent_config.get('token_budget', 60000)
+        self.compact_ratio = agent_config.get('compact_ratio', 0.8)
+        self.keep_recent = agent_config.get('keep_recent_observations', 2)
+        self.compact_observation_tokens = agent_config.get('compact_observation_tokens', 256)
+        self.run_token_budget = agent_config.get('run_token_budget', None)
+        self.tokens_sent = 0
+
+        self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.base_prompt = base_prompt
+        self.base_tokens = self.count_tokens(base_prompt)
+
+        self.rounds = []
+        self.observation_index = {}
+        self.prompt_sizes = []
+
+    def count_tokens(self, text):
+        """
+        计算文本的token数量。
+
+        Args:
+            text (str): 要计算的文本
+
+        Returns:
+            int: token数量
+        """
+        if not text:
+            return 0
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def add_round(self, index, header, observation=None):
+        """
+        记录一轮交互。相同的观察结果只保留第一次出现的内容。
+
+        Args:
+            index (int): 轮次编号
+            header (str): 本轮的Thought/Action部分
+            observation (str, optional): 工具返回的观察结果，None表示本轮没有观察结果
+        """
+        duplicate_of = None
+        digest = None
+        if observation is not None:
+            digest = hashlib.sha1(observation.encode('utf-8')).hexdigest()
+            if digest in self.observation_index:
+                duplicate_of = self.observation_index[digest]
+            else:
+                self.observation_index[digest] = index
+
+        current_round = {
+            'index': index,
+            'header': header,
+            'observation': observation,
+            'digest': digest,
+            'duplicate_of': duplicate_of,
+            'compacted': None
+        }
+        current_round['tokens'] = self.count_tokens(self.render_round(current_round))
+        self.rounds.append(current_round)
+
+    def render_round(self, current_round, full=False):
+        """
+        将一轮交互格式化为提示文本。
+
+        Args:
+            current_round (dict): 轮次记录
+            full (bool, optional): 为True时忽略去重和压缩，输出原始内容
+
+        Returns:
+            str: 格式化后的会话消息
+        """
+        message = current_round['header']
+        if current_round['observation'] is None:
+            return message
+        observation = current_round['observation'] if full else self.observation_text(current_round)
+        return message + f"Observation {current_round['index']}: " + observation + '\n'
+
+    def observation_text(self, current_round):
+        """
+        一轮的观察结果在提示中的内容（去重或压缩后）。
+
+        Args:
+            current_round (dict): 轮次记录
+
+        Returns:
+            str: 观察结果
+        """
+        if current_round['duplicate_of'] is not None:
+            return f"Same as Observation {current_round['duplicate_of']}."
+        if current_round['compacted'] is not None:
+            return current_round['compacted']
+        return current_round['observation']
+
+    def total_tokens(self):
+        """
+        Returns:
+            int: 当前提示（含压缩结果）的token总数
+        """
+        return self.base_tokens + sum(r['tokens'] for r in self.rounds)
+
+    def truncate_observation(self, observation, max_tokens):
+        """
+        按token截断观察结果，保留开头部分并注明被省略的长度。
+
+        Args:
+            observation (str): 观察结果
+            max_tokens (int): 保留的最大token数
+
+        Returns:
+            str: 截断后的观察结果
+        """
+        tokens = self.encoding.encode(observation, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return observation
+        if max_tokens <= 0:
+            return f"[observation omitted to save context, {len(tokens)} tokens]"
+        head = self.encoding.decode(tokens[:max_tokens])
+        return head + f"\n[... truncated {len(tokens) - max_tokens} tokens to save context ...]"
+
+    def compact(self):
+        """
+        当提示接近预算时压缩较早的观察结果。
+        先截断最近几轮之外的观察结果，仍超出预算时再完全省略它们。
+        """
+        limit = self.token_budget * self.compact_ratio
+        if self.total_tokens() <= limit:
+            return
+
+        older_rounds = self.rounds[:max(0, len(self.rounds) - self.keep_recent)]
+        for max_tokens in (self.compact_observation_tokens, 0):
+            for current_round in older_rounds:
+                if self.total_tokens() <= limit:
+                    return
+                # 重复的轮次可能在压缩前面的轮次时变为完整内容，因此在遍历时判断
+                if current_round['observation'] is None or current_round['duplicate_of'] is not None:
+                    continue
+                self.reinline_duplicates(current_round)
+                current_round['compacted'] = self.truncate_observation(current_round['observation'], max_tokens)
+                current_round['tokens'] = self.count_tokens(self.render_round(current_round))
+
+    def reinline_duplicates(self, current_round):
+        """
+        压缩一轮之前，把它的完整观察结果转移到引用它的最后一个重复轮次，
+        其他重复轮次和之后相同的观察结果改为引用该轮次，避免"Same as Observation N"指向被压缩的内容。
+
+        Args:
+            current_round (dict): 即将被压缩的轮次
+        """
+        duplicates = [r for r in self.rounds if r['duplicate_of'] == current_round['index']]
+        if not duplicates:
+            return
+        holder = duplicates[-1]
+        holder['duplicate_of'] = None
+        for duplicate in duplicates[:-1]:
+            duplicate['duplicate_of'] = holder['index']
+            duplicate['tokens'] = self.count_tokens(self.render_round(duplicate))
+        holder['tokens'] = self.count_tokens(self.render_round(holder))
+        self.observation_index[holder['digest']] = holder['index']
+
+    def build_prompt(self):
+        """
+        构建下一轮发送给LLM的用户提示。
+
+        Returns:
+            str: 用户提示
+        """
+        self.compact()
+        return self.base_prompt + ''.join(self.render_round(r) for r in self.rounds)
+
+    def full_transcript(self):
+        """
+        Returns:
+            str: 未经去重和压缩的完整会话记录，用于保存结果
+        """
+        return self.base_prompt + ''.join(self.render_round(r, full=True) for r in self.rounds)
+
+    def log_prompt_size(self, index, prompt):
+        """
+        记录并打印每轮提示的大小。
+
+        Args:
+            index (int): 轮次编号
+            prompt (str): 本轮发送的用户提示
+        """
+        prompt_tokens = self.count_tokens(prompt)
+        self.tokens_sent += prompt_tokens
+        self.prompt_sizes.append({'round': index, 'prompt_tokens': prompt_tokens})
+        print(f"Round {index} prompt size: {prompt_tokens} tokens (budget {self.token_budget})")
+
+    def budget_exhausted(self):
+        """
+        判断按当前提示大小再发送一轮是否会超出整次运行的token预算。
+
+        Returns:
+            bool: 是否应该要求LLM直接给出测试计划
+        """
+        if self.run_token_budget is None:
+            return False
+        return self.tokens_sent + 2 * self.total_tokens() > self.run_token_budget
@@ -0,0 +1,99 @@
+import numpy as np
+import tiktoken
+
+# MMR中相关性的权重（1为只看相关性），以及视为重复的余弦相似度
+DEFAULT_MMR_LAMBDA = 0.7
+DEFAULT_DEDUP_THRESHOLD = 0.95
+# 相似代码部分的token预算，0表示不限制
+DEFAULT_CONTEXT_TOKENS = 12000
+
+_encoding = None
+
+
+def count_tokens(text):
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return len(_encoding.encode(text or '', disallowed_special=()))
+
+
+def block_vectors(embeddings, chunk_owners, blocks):
+    """
+    代码块的向量：代码块所有窗口嵌入的平均值（标准化）。
+
+    Args:
+        embeddings (np.ndarray): (窗口数, dim)的标准化嵌入
+        chunk_owners (list): 每个窗口所属的代码块下标
+        blocks (list): 需要的代码块下标
+
+    Returns:
+        np.ndarray: (len(blocks), dim)
+    """
+    owners = np.asarray(chunk_owners)
+    position = {block: i for i, block in enumerate(blocks)}
+    rows = np.nonzero(np.isin(owners, list(position)))[0]
+    vectors = np.zeros((len(blocks), embeddings.shape[1]), dtype=np.float32)
+    np.add.at(vectors, [position[owner] for owner in owners[rows].tolist()], embeddings[rows])
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def mmr_select(relevance, vectors, costs=None, token_budget=0, max_blocks=None,
+               mmr_lambda=DEFAULT_MMR_LAMBDA, dedup_threshold=DEFAULT_DEDUP_THRESHOLD):
+    """
+    最大边际相关性（MMR）选择：每一步选 lambda * 相关性 - (1 - lambda) * 与已选代码块的最大相似度 最高的候选，
+    与已选代码块的相似度达到阈值的候选视为重复直接丢弃，超出剩余token预算的候选跳过。
+
+    Args:
+        relevance (list): 候选的相关性分数（内部归一化到[0, 1]）
+        vectors (np.ndarray): (候选数, dim)的标准化向量
+        costs (list, optional): 每个候选的token数
+        token_budget (int, optional): token预算，0表示不限制
+        max_blocks (int, optional): 最多选择的数量
+        mmr_lambda (float, optional): 相关性的权重
+        dedup_threshold (float, optional): 去重的余弦相似度阈值
+
+    Returns:
+        tuple: (按候选顺序排列的选中下标, 统计信息{duplicates, over_budget, tokens})
+    """
+    n = len(relevance)
+    relevance = np.asarray(relevance, dtype=np.float64)
+    if n and relevance.max() > relevance.min():
+        relevance = (relevance - relevance.min()) / (relevance.max() - relevance.min())
+    else:
+        relevance = np.ones(n)
+    costs = np.zeros(n) if costs is None else np.asarray(costs, dtype=np.float64)
+    budget = token_budget if token_budget else np.inf
+    max_blocks = n if max_blocks is None else min(max_blocks, n)
+
+    available = np.ones(n, dtype=bool)
+    max_sim = np.zeros(n)
+    selected = []
+    duplicates = 0
+    over_budget = 0
+    while len(selected) < max_blocks:
+        fits = costs <= budget
+        over_budget += int((available & ~fits).sum())
+        available &= fits
+        if not available.any():
+            break
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * max_sim
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        budget -= costs[best]
+
+        # 第一次选择前max_sim为0，之后为与已选代码块的最大相似度
+        similarity = vectors @ vectors[best]
+        max_sim = similarity if len(selected) == 1 else np.maximum(max_sim, similarity)
+        duplicate = available & (max_sim >= dedup_threshold)
+        duplicates += int(duplicate.sum())
+        available &= ~duplicate
+
+    selected.sort()
+    return selected, {
+        'duplicates': duplicates,
+        'over_budget': over_budget,
+        'tokens': int(costs[selected].sum()) if selected else 0
+    }
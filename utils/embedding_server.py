@@ -0,0 +1,130 @@
+import time
+import queue
+import threading
+import concurrent.futures
+
+from utils.batched_encoder import encode_texts, DEFAULT_MAX_LENGTH
+from utils.model_registry import get_model
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5
+
+# 每个(模型, 推理后端)一个服务
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+class EmbeddingServer:
+    """
+    进程内的嵌入服务：并发任务提交的查询进入同一个队列，后台线程把它们合并为微批次一起编码。
+    第一个请求到达后最多等待max_wait_ms收集更多请求，凑满max_batch_size时立即编码。
+    """
+
+    def __init__(self, loaded, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS, max_length=DEFAULT_MAX_LENGTH):
+        """
+        Args:
+            loaded (LoadedModel): 模型注册表中的模型
+            max_batch_size (int, optional): 每个微批次的最大请求数
+            max_wait_ms (float, optional): 收集微批次的最长等待时间（毫秒）
+            max_length (int, optional): 截断长度
+        """
+        self.loaded = loaded
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_length = max_length
+        self.requests = queue.Queue()
+        self.stats = {'requests': 0, 'batches': 0, 'max_batch': 0}
+        self.closed = False
+        self.worker = threading.Thread(target=self._serve, name='embedding-server', daemon=True)
+        self.worker.start()
+
+    def submit(self, text):
+        """
+        提交一条查询。
+
+        Returns:
+            concurrent.futures.Future: 结果为(dim,)的标准化嵌入（torch.Tensor，在CPU上）
+        """
+        if self.closed:
+            raise RuntimeError("Embedding server is closed")
+        future = concurrent.futures.Future()
+        self.requests.put((text, future))
+        return future
+
+    def encode(self, texts):
+        """
+        提交多条查询并等待结果。
+
+        Returns:
+            list: 每条查询的嵌入
+        """
+        return [future.result() for future in [self.submit(text) for text in texts]]
+
+    def close(self):
+        self.closed = True
+        self.requests.put(None)
+        self.worker.join()
+
+    def _collect(self):
+        first = self.requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # 关闭信号放回队列，处理完当前批次后退出
+                self.requests.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _serve(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # 调用方已经取消的请求不再编码
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                embeddings = encode_texts(
+                    [text for text, _ in batch], self.loaded.tokenizer, self.loaded.model, self.loaded.device,
+                    self.max_length, max_batch_size=self.max_batch_size, lock=self.loaded.lock
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+            self.stats['requests'] += len(batch)
+            self.stats['batches'] += 1
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+
+
+def get_embedding_server(model_name, backend='torch', **options):
+    """
+    获取(模型, 推理后端)对应的嵌入服务，第一次调用时从模型注册表加载模型并启动服务。
+
+    Args:
+        model_name (str): 模型名称
+        backend (str, optional): 推理后端
+        **options: 传给模型注册表的参数
+
+    Returns:
+        EmbeddingServer: 嵌入服务
+    """
+    key = (model_name, backend)
+    with _servers_lock:
+        if key not in _servers:
+            _servers[key] = EmbeddingServer(get_model(model_name, backend, **options))
+        return _servers[key]
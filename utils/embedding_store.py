@@ -0,0 +1,185 @@
+import os
+import re
+import json
+import glob
+import uuid
+import hashlib
+import threading
+
+import numpy as np
+
+DEFAULT_EMBEDDING_STORE_DIR = './source/embeddings'
+# 分片数量超过该值时合并（每个PR的增量写入都会生成一个新分片）
+DEFAULT_MAX_SHARDS = 32
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode('utf-8', errors='replace')).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    代码块嵌入的持久化存储，以(模型, 代码内容哈希)为键，同一仓库的所有PR和多次运行共用。
+    嵌入以float16保存为不可变的NumPy分片，读取时使用memmap，只把键索引放在内存中。
+    目录结构：{root}/{model}/{namespace}/shard_{id}.npy 和对应的 shard_{id}.json（分片中每行的哈希）。
+    分片的键文件在数据文件之后写入，键文件存在即表示分片完整；多个进程同时写入时各自生成新分片，不需要加锁。
+    """
+
+    def __init__(self, root=DEFAULT_EMBEDDING_STORE_DIR, model_name="Salesforce/codet5p-base", namespace='default'):
+        """
+        Args:
+            root (str, optional): 存储根目录
+            model_name (str, optional): 模型名称（连同编码方式），不同模型的嵌入互不混用
+            namespace (str, optional): 命名空间，通常为仓库名
+        """
+        self.directory = os.path.join(root, re.sub(r'[^A-Za-z0-9_.@-]+', '_', model_name), namespace)
+        self.lock = threading.Lock()
+        self.dim = None
+        self.shards = {}
+        self.index = {}
+        self.load()
+
+    @classmethod
+    def from_config(cls, config, model_name):
+        embedding_config = config.get('Embedding', {})
+        return cls(embedding_config.get('store_dir', DEFAULT_EMBEDDING_STORE_DIR), model_name, config['Judge']['repo'])
+
+    def load(self):
+        """
+        读取所有完整分片的键，建立哈希到(分片, 行号)的索引。
+        """
+        with self.lock:
+            for keys_path in sorted(glob.glob(os.path.join(self.directory, 'shard_*.json'))):
+                shard_id = os.path.basename(keys_path)[len('shard_'):-len('.json')]
+                if shard_id in self.shards:
+                    continue
+                try:
+                    with open(keys_path, 'r') as f:
+                        keys = json.load(f)
+                    data = np.load(os.path.join(self.directory, f'shard_{shard_id}.npy'), mmap_mode='r')
+                except (json.JSONDecodeError, OSError, ValueError):
+                    continue
+                if data.ndim != 2 or len(data) != len(keys) or (self.dim is not None and data.shape[1] != self.dim):
+                    continue
+                self.dim = data.shape[1]
+                self.shards[shard_id] = data
+                for row, key in enumerate(keys):
+                    self.index.setdefault(key, (shard_id, row))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def get(self, keys):
+        """
+        批量读取嵌入。
+
+        Args:
+            keys (list): 代码内容哈希
+
+        Returns:
+            tuple: (float32矩阵(n, dim)，未命中的位置列表)；存储为空时矩阵为None
+        """
+        missing = [i for i, key in enumerate(keys) if key not in self.index]
+        if self.dim is None:
+            return None, missing
+        embeddings = np.zeros((len(keys), self.dim), dtype=np.float32)
+        by_shard = {}
+        for i, key in enumerate(keys):
+            location = self.index.get(key)
+            if location is not None:
+                positions, rows = by_shard.setdefault(location[0], ([], []))
+                positions.append(i)
+                rows.append(location[1])
+        # 每个分片一次花式索引读取，避免逐行访问memmap
+        for shard_id, (positions, rows) in by_shard.items():
+            embeddings[positions] = self.shards[shard_id][rows]
+        return embeddings, missing
+
+    def put(self, keys, embeddings):
+        """
+        写入新的嵌入，已经存在的键会被跳过。
+
+        Args:
+            keys (list): 代码内容哈希
+            embeddings (numpy.ndarray): (n, dim)嵌入矩阵
+
+        Returns:
+            int: 新写入的行数
+        """
+        embeddings = np.asarray(embeddings)
+        with self.lock:
+            if self.dim is not None and embeddings.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match the store ({self.dim})")
+            seen = set()
+            new_rows = []
+            for i, key in enumerate(keys):
+                if key not in self.index and key not in seen:
+                    seen.add(key)
+                    new_rows.append(i)
+            if not new_rows:
+                return 0
+            shard_id = self._write_shard([keys[i] for i in new_rows], embeddings[new_rows])
+            for row, i in enumerate(new_rows):
+                self.index[keys[i]] = (shard_id, row)
+            return len(new_rows)
+
+    def _write_shard(self, keys, embeddings):
+        """
+        写入一个新分片（先写数据文件，再写键文件）并打开它的memmap，调用方持有锁并负责更新索引。
+
+        Returns:
+            str: 分片id
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        shard_id = uuid.uuid4().hex[:16]
+        data_path = os.path.join(self.directory, f'shard_{shard_id}.npy')
+        tmp_path = data_path + '.tmp'
+        shard = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float16, shape=embeddings.shape)
+        shard[:] = embeddings
+        shard.flush()
+        del shard
+        os.replace(tmp_path, data_path)
+        keys_path = os.path.join(self.directory, f'shard_{shard_id}.json')
+        with open(keys_path + '.tmp', 'w') as f:
+            json.dump(list(keys), f)
+        os.replace(keys_path + '.tmp', keys_path)
+
+        self.dim = embeddings.shape[1]
+        self.shards[shard_id] = np.load(data_path, mmap_mode='r')
+        return shard_id
+
+    def shard_count(self):
+        return len(self.shards)
+
+    def compact(self, keep=None):
+        """
+        把所有分片合并为一个分片，可选只保留仍在使用的键。合并前重新读取其他进程写入的分片；
+        合并后的分片写完之后才删除旧分片，中途失败不会丢失嵌入。
+
+        Args:
+            keep (set, optional): 需要保留的哈希，为None时保留全部
+
+        Returns:
+            int: 合并后的行数
+        """
+        self.load()
+        with self.lock:
+            keys = [key for key in self.index if keep is None or key in keep]
+            embeddings, _ = self.get(keys)
+            old_shards = list(self.shards)
+            if keys:
+                shard_id = self._write_shard(keys, embeddings)
+                self.index = {key: (shard_id, row) for row, key in enumerate(keys)}
+            else:
+                self.index = {}
+                self.dim = None
+            for old_shard_id in old_shards:
+                del self.shards[old_shard_id]
+                for suffix in ('.json', '.npy'):
+                    path = os.path.join(self.directory, f'shard_{old_shard_id}{suffix}')
+                    if os.path.exists(path):
+                        os.remove(path)
+        return len(keys)
@@ -0,0 +1,87 @@
+import os
+import itertools
+import concurrent.futures
+
+BACKENDS = ('thread', 'process')
+
+
+def init_worker(num_threads=0, preload_models=(), inference_backend='torch'):
+    """
+    工作者初始化函数：限制torch的线程数，并在模型注册表中预加载嵌入模型，避免每个任务重复加载。
+    线程后端的所有工作者共用同一个注册表，模型只加载一次。
+
+    Args:
+        num_threads (int, optional): 每个工作者的torch线程数，0表示不修改
+        preload_models (tuple, optional): 需要预加载的CodeT5+模型名称
+        inference_backend (str, optional): 预加载模型的推理后端
+    """
+    try:
+        import torch
+    except ImportError:
+        return
+
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+
+    if preload_models:
+        from utils.model_registry import registry
+        registry.prewarm(preload_models, inference_backend)
+
+
+def default_threads_per_worker(backend, max_workers):
+    """
+    进程后端下平分CPU核数，避免多个进程的torch线程互相抢占；线程后端共享同一个torch线程池，不做修改。
+    """
+    if backend != 'process':
+        return 0
+    return max(1, (os.cpu_count() or 1) // max(1, max_workers))
+
+
+def _run_pool(executor, func, items, max_pending):
+    # 按需提交：同时最多max_pending个未完成的条目，空闲的工作者从共享队列中取下一个条目，长短任务之间自动均衡；
+    # items可以是惰性的生成器，不会一次性把所有条目读入内存
+    items = iter(items)
+    pending = {}
+
+    def fill():
+        for item in itertools.islice(items, max(0, max_pending - len(pending))):
+            pending[executor.submit(func, item)] = item
+
+    fill()
+    while pending:
+        done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            item = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                yield item, None, e
+            else:
+                yield item, result, None
+        fill()
+
+
+def map_unordered(func, items, backend='thread', max_workers=4, initializer=None, initargs=(), mp_context=None):
+    """
+    用指定的执行后端并发处理条目，按完成顺序返回结果。
+
+    Args:
+        func (callable): 处理函数，进程后端下必须可以被pickle（模块级函数或functools.partial）
+        items (iterable): 条目，可以是生成器（按需读取，最多同时提交2 * max_workers个）
+        backend (str, optional): 'thread'或'process'
+        max_workers (int, optional): 工作者数量
+        initializer (callable, optional): 每个工作者启动时调用的初始化函数，例如init_worker
+        initargs (tuple, optional): 初始化函数的参数
+        mp_context (multiprocessing.context.BaseContext, optional): 进程后端的启动方式，例如spawn
+
+    Yields:
+        tuple: (条目, 结果, 异常)，成功时异常为None
+    """
+    if backend == 'thread':
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, initializer=initializer, initargs=initargs) as executor:
+            yield from _run_pool(executor, func, items, 2 * max_workers)
+    elif backend == 'process':
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context, initializer=initializer, initargs=initargs) as executor:
+            yield from _run_pool(executor, func, items, 2 * max_workers)
+    else:
+        raise ValueError(f"Unknown executor backend: {backend}")
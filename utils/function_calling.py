@@ -0,0 +1,211 @@
+import re
+import json
+import inspect
+import typing as t
+
+PARAM_DOC_PATTERN = re.compile(r'^\s*:param\s+(\w+)\s*:\s*(.*)$')
+ARGS_DOC_PATTERN = re.compile(r'^\s*(\w+)\s*(?:\(([^)]*)\))?\s*:\s*(.*)$')
+
+
+def parse_docstring(docstring):
+    """
+    解析函数文档，支持":param x:"和"Args:"两种写法。
+
+    Args:
+        docstring (str): 函数文档
+
+    Returns:
+        tuple: (函数描述, {参数名: 参数描述})
+    """
+    if not docstring:
+        return "", {}
+
+    lines = inspect.cleandoc(docstring).splitlines()
+    description_lines = []
+    params = {}
+    in_args = False
+
+    for line in lines:
+        stripped = line.strip()
+        param_match = PARAM_DOC_PATTERN.match(line)
+        if param_match:
+            params[param_match.group(1)] = param_match.group(2).strip()
+            continue
+        if stripped in ('Args:', 'Arguments:', 'Parameters:'):
+            in_args = True
+            continue
+        if stripped in ('Returns:', 'Raises:') or stripped.startswith(':return'):
+            in_args = False
+            continue
+        if in_args:
+            args_match = ARGS_DOC_PATTERN.match(line)
+            if args_match:
+                params[args_match.group(1)] = args_match.group(3).strip()
+            continue
+        if not params and stripped:
+            description_lines.append(stripped)
+
+    return ' '.join(description_lines), params
+
+
+def annotation_to_schema(annotation, default=inspect.Parameter.empty):
+    """
+    将类型注解（或默认值的类型）转换为JSON Schema。
+    """
+    origin = t.get_origin(annotation)
+    args = t.get_args(annotation)
+
+    if origin is t.Union:
+        non_none = [a for a in args if a is not type(None)]
+        if len(non_none) == 1:
+            return annotation_to_schema(non_none[0])
+    if origin in (list, t.List):
+        return {"type": "array", "items": annotation_to_schema(args[0]) if args else {}}
+    if origin in (dict, t.Dict):
+        return {"type": "object"}
+
+    simple_types = {str: "string", int: "integer", float: "number", bool: "boolean", dict: "object", list: "array"}
+    if annotation in simple_types:
+        return {"type": simple_types[annotation]}
+    if annotation is inspect.Parameter.empty and default not in (inspect.Parameter.empty, None):
+        return annotation_to_schema(type(default))
+    return {"type": "string"}
+
+
+def schema_from_signature(func, name=None, description=None, param_renames=None):
+    """
+    根据函数签名和文档生成工具描述（与服务商无关的通用格式）。
+
+    Args:
+        func (callable): 工具函数（通常是Agent_utils的方法）
+        name (str, optional): 工具名称，默认为函数名
+        description (str, optional): 工具描述，默认取自函数文档
+        param_renames (dict, optional): 参数改名，例如 {'entity_name': 'class_name'}
+
+    Returns:
+        dict: {'name', 'description', 'parameters'}，parameters为JSON Schema
+    """
+    param_renames = param_renames or {}
+    doc_description, param_docs = parse_docstring(inspect.getdoc(func))
+    signature = inspect.signature(func)
+    try:
+        hints = t.get_type_hints(func)
+    except Exception:
+        hints = {}
+
+    properties = {}
+    required = []
+    for param_name, param in signature.parameters.items():
+        if param_name == 'self' or param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        schema = annotation_to_schema(hints.get(param_name, param.annotation), param.default)
+        if param_name in param_docs:
+            schema["description"] = param_docs[param_name]
+        exposed_name = param_renames.get(param_name, param_name)
+        properties[exposed_name] = schema
+        if param.default is inspect.Parameter.empty:
+            required.append(exposed_name)
+
+    return {
+        "name": name or func.__name__,
+        "description": description or doc_description,
+        "parameters": {"type": "object", "properties": properties, "required": required}
+    }
+
+
+def to_openai_tools(tool_schemas):
+    """
+    转换为OpenAI的tools格式。
+    """
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": schema["name"],
+                "description": schema["description"],
+                "parameters": schema["parameters"]
+            }
+        }
+        for schema in tool_schemas
+    ]
+
+
+def to_anthropic_tools(tool_schemas):
+    """
+    转换为Anthropic的tool_use格式。
+    """
+    return [
+        {
+            "name": schema["name"],
+            "description": schema["description"],
+            "input_schema": schema["parameters"]
+        }
+        for schema in tool_schemas
+    ]
+
+
+def tools_for_model(tool_schemas, model):
+    if 'claude' in model:
+        return to_anthropic_tools(tool_schemas)
+    return to_openai_tools(tool_schemas)
+
+
+def parse_tool_response(response_dict, model):
+    """
+    将不同服务商的响应统一为文本和工具调用列表。
+
+    Args:
+        response_dict (dict): 接口返回的JSON
+        model (str): 模型名称
+
+    Returns:
+        dict: {'content': str, 'tool_calls': [{'id', 'name', 'arguments'}], 'assistant_message': dict}
+    """
+    tool_calls = []
+    if 'claude' in model:
+        blocks = response_dict.get("content", [])
+        content = ''.join(block.get("text", "") for block in blocks if block.get("type") == "text")
+        for block in blocks:
+            if block.get("type") == "tool_use":
+                tool_calls.append({"id": block["id"], "name": block["name"], "arguments": block.get("input") or {}})
+        assistant_message = {"role": "assistant", "content": blocks}
+    else:
+        message = response_dict['choices'][0]['message']
+        content = message.get('content') or ''
+        for call in message.get('tool_calls') or []:
+            try:
+                arguments = json.loads(call['function'].get('arguments') or '{}')
+            except json.JSONDecodeError:
+                arguments = {}
+            tool_calls.append({"id": call['id'], "name": call['function']['name'], "arguments": arguments})
+        assistant_message = {"role": "assistant", "content": message.get('content')}
+        if message.get('tool_calls'):
+            assistant_message["tool_calls"] = message['tool_calls']
+
+    return {'content': content, 'tool_calls': tool_calls, 'assistant_message': assistant_message}
+
+
+def tool_result_messages(tool_calls, observations, model):
+    """
+    构建把工具执行结果返回给模型的消息。
+
+    Args:
+        tool_calls (list): parse_tool_response返回的工具调用
+        observations (list): 与工具调用顺序对应的观察结果（字符串）
+        model (str): 模型名称
+
+    Returns:
+        list: 需要追加到对话中的消息
+    """
+    if 'claude' in model:
+        return [{
+            "role": "user",
+            "content": [
+                {"type": "tool_result", "tool_use_id": call["id"], "content": observation}
+                for call, observation in zip(tool_calls, observations)
+            ]
+        }]
+    return [
+        {"role": "tool", "tool_call_id": call["id"], "content": observation}
+        for call, observation in zip(tool_calls, observations)
+    ]
@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import math
+import pickle
+import hashlib
+import tempfile
+from collections import Counter
+
+IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+SUBTOKEN_PATTERN = re.compile(r'[A-Z]+(?=[A-Z][a-z]|\d|\b)|[A-Z]?[a-z]+|[A-Z]+|\d+')
+# RRF的常数，越大各排名之间的差距越小
+DEFAULT_RRF_K = 60
+RETRIEVAL_MODES = ('dense', 'hybrid')
+
+
+def code_tokens(text):
+    """
+    代码和PR文本的词项：完整标识符（小写）加上驼峰/下划线拆分后的子词，
+    例如 parseHttpRequest -> parsehttprequest, parse, http, request。
+    """
+    tokens = []
+    for identifier in IDENTIFIER_PATTERN.findall(text or ''):
+        lowered = identifier.lower()
+        tokens.append(lowered)
+        parts = [part.lower() for piece in identifier.split('_') for part in SUBTOKEN_PATTERN.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if len(part) > 1)
+    return tokens
+
+
+def block_document(info):
+    """
+    代码块在词法索引中的文本：名称、路径和代码。
+    """
+    return f"{info['name']} {info['path']} {info['code']}"
+
+
+def index_fingerprint(code_info):
+    digest = hashlib.sha1()
+    for info in code_info:
+        digest.update(block_document(info).encode('utf-8', errors='replace'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class LexicalIndex:
+    """
+    代码块的BM25倒排索引，每个仓库构建一次并保存到磁盘，代码块不变时直接读取。
+    """
+
+    def __init__(self, postings, doc_lengths, fingerprint=None, k1=1.2, b=0.75):
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.fingerprint = fingerprint
+        self.k1 = k1
+        self.b = b
+        self.avg_length = sum(doc_lengths) / max(len(doc_lengths), 1)
+
+    @classmethod
+    def build(cls, code_info):
+        postings = {}
+        doc_lengths = []
+        for doc, info in enumerate(code_info):
+            counts = Counter(code_tokens(block_document(info)))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+        return cls(postings, doc_lengths, index_fingerprint(code_info))
+
+    @classmethod
+    def load_or_build(cls, path, code_info):
+        """
+        读取磁盘上的索引，代码块有变化（指纹不同）或文件不存在时重新构建并保存。
+        """
+        fingerprint = index_fingerprint(code_info)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                if data.get('fingerprint') == fingerprint:
+                    return cls(data['postings'], data['doc_lengths'], fingerprint)
+            except (json.JSONDecodeError, KeyError, OSError):
+                pass
+        index = cls.build(code_info)
+        index.save(path)
+        return index
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 同一个仓库的多个任务可能同时构建索引，每次写入唯一的临时文件再原子替换
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + '.', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'doc_lengths': self.doc_lengths, 'postings': self.postings}, f)
+        os.replace(tmp_path, path)
+
+    def search(self, query_text, k=100):
+        """
+        Args:
+            query_text (str): 查询文本（PR描述和修改的文件）
+            k (int, optional): 返回数量
+
+        Returns:
+            list: (代码块下标, BM25分数)，按分数降序
+        """
+        n_docs = len(self.doc_lengths)
+        scores = Counter()
+        for term in set(code_tokens(query_text)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log((n_docs - len(postings) + 0.5) / (len(postings) + 0.5) + 1.0)
+            for doc, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc] / max(self.avg_length, 1e-9))
+                scores[doc] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores.most_common(k)
+
+
+def rrf_fuse(rankings, k=DEFAULT_RRF_K, weights=None):
+    """
+    倒数排名融合：每个排名列表中排第r位（从1开始）的条目得到 weight / (k + r)。
+
+    Args:
+        rankings (list): 每个检索器按相关性降序的条目列表
+        k (int, optional): RRF常数
+        weights (list, optional): 每个检索器的权重
+
+    Returns:
+        dict: 条目到融合分数的映射
+    """
+    fused = {}
+    for ranking, weight in zip(rankings, weights or [1.0] * len(rankings)):
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + weight / (k + rank)
+    return fused
+
+
+def changed_file_names(pr_changed_files):
+    """
+    从PR_Changed_Files（GitHub文件列表或文件名列表）中取出文件名。
+    """
+    names = []
+    for file in pr_changed_files or []:
+        name = file.get('filename') if isinstance(file, dict) else file
+        if isinstance(name, str) and name:
+            names.append(name.replace('\\', '/'))
+    return names
+
+
+def _matches_changed_file(path, changed_files):
+    path = (path or '').replace('\\', '/')
+    path = path[2:] if path.startswith('./') else path
+    return bool(path) and any(path == name or path.endswith('/' + name) or name.endswith('/' + path) for name in changed_files)
+
+
+def ckg_neighbour_blocks(graph_path, changed_files, code_info):
+    """
+    修改的文件中的代码块，以及在代码知识图谱中与这些文件中定义的实体相邻（调用或被调用）的代码块。
+
+    Args:
+        graph_path (str): 代码知识图谱的pickle文件（CKG.graph_pkl_dir）
+        changed_files (list): 修改的文件名
+        code_info (list): 代码块信息
+
+    Returns:
+        set: 代码块下标
+    """
+    boosted = {i for i, info in enumerate(code_info) if _matches_changed_file(info['path'], changed_files)}
+    try:
+        with open(graph_path, 'rb') as f:
+            graph = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError):
+        return boosted
+
+    changed_entities = [
+        node for node, attributes in graph.nodes(data=True)
+        if _matches_changed_file(attributes.get('fname'), changed_files)
+    ]
+    neighbours = set(changed_entities)
+    for entity in changed_entities:
+        neighbours.update(graph.predecessors(entity))
+        neighbours.update(graph.successors(entity))
+    boosted.update(i for i, info in enumerate(code_info) if info['name'] in neighbours)
+    return boosted
+
+
+def hybrid_rank(dense_ranking, lexical_ranking, boosted=(), top_k=25, rrf_k=DEFAULT_RRF_K, boost_weight=1.0):
+    """
+    融合稠密检索和词法检索的排名，图谱邻居额外加上相当于一次第1名的分数。
+
+    Args:
+        dense_ranking (list): 稠密检索按相似度降序的代码块下标
+        lexical_ranking (list): 词法检索按BM25分数降序的代码块下标
+        boosted (set, optional): 图谱邻居代码块下标
+        top_k (int, optional): 返回数量
+        rrf_k (int, optional): RRF常数
+        boost_weight (float, optional): 图谱邻居加分的权重
+
+    Returns:
+        list: (代码块下标, 融合分数)，按分数降序
+    """
+    fused = rrf_fuse([dense_ranking, lexical_ranking], rrf_k)
+    for block in boosted:
+        if block in fused:
+            fused[block] += boost_weight / (rrf_k + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
@@ -0,0 +1,184 @@
+import os
+import re
+import gc
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+INFERENCE_BACKENDS = ('torch', 'int8', 'onnx', 'onnx-int8')
+DEFAULT_ONNX_DIR = './source/onnx'
+# 与fp32嵌入的最低余弦相似度，以及两两相似度矩阵的最大偏差
+MIN_EMBEDDING_COSINE = 0.99
+MAX_SIMILARITY_DEVIATION = 0.02
+
+# 每个(模型, 后端)的精度检查结果只计算一次
+_guard_results = {}
+_guard_lock = threading.Lock()
+
+
+class OnnxEncoder:
+    """
+    ONNX Runtime会话的包装，调用方式与T5EncoderModel相同：model(input_ids=..., attention_mask=...).last_hidden_state
+    """
+
+    def __init__(self, path, config, num_threads=0):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.config = config
+
+    def __call__(self, input_ids, attention_mask):
+        outputs = self.session.run(['last_hidden_state'], {
+            'input_ids': input_ids.cpu().numpy().astype(np.int64),
+            'attention_mask': attention_mask.cpu().numpy().astype(np.int64)
+        })
+        return SimpleNamespace(last_hidden_state=torch.from_numpy(outputs[0]))
+
+    def eval(self):
+        return self
+
+
+def export_onnx(model, tokenizer, path, quantize=False):
+    """
+    把编码器导出为ONNX（批次和序列长度为动态维度），可选再做int8动态量化。已经存在时直接返回路径。
+    """
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fp32_path = path.replace('-int8.onnx', '.onnx') if quantize else path
+    if not os.path.exists(fp32_path):
+        inputs = tokenizer(["def f(x):\n    return x"], return_tensors="pt")
+        torch.onnx.export(
+            model.cpu(),
+            (inputs['input_ids'], inputs['attention_mask']),
+            fp32_path + '.tmp',
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['last_hidden_state'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'last_hidden_state': {0: 'batch', 1: 'sequence'}
+            },
+            opset_version=14
+        )
+        os.replace(fp32_path + '.tmp', fp32_path)
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, path + '.tmp', weight_type=QuantType.QInt8)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def load_encoder(model_name, backend='torch', onnx_dir=DEFAULT_ONNX_DIR, num_threads=0):
+    """
+    加载CodeT5+编码器。
+
+    Args:
+        model_name (str): 模型名称
+        backend (str, optional): 'torch'（fp32）、'int8'（torch动态量化）、'onnx'或'onnx-int8'（ONNX Runtime）
+        onnx_dir (str, optional): 导出的ONNX模型目录
+        num_threads (int, optional): ONNX Runtime的线程数，0表示默认
+
+    Returns:
+        tuple: (tokenizer, model, device)
+    """
+    from transformers import T5EncoderModel, T5Config, RobertaTokenizer
+
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    tokenizer = RobertaTokenizer.from_pretrained(model_name)
+
+    if backend in ('onnx', 'onnx-int8'):
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        path = os.path.join(onnx_dir, f"{slug}-int8.onnx" if backend == 'onnx-int8' else f"{slug}.onnx")
+        # 已经导出过时只读取模型配置，不再加载fp32权重（低内存的CPU机器上正是要省下这部分内存）
+        if os.path.exists(path):
+            config = T5Config.from_pretrained(model_name)
+        else:
+            model = T5EncoderModel.from_pretrained(model_name)
+            model.eval()
+            export_onnx(model, tokenizer, path, quantize=backend == 'onnx-int8')
+            config = model.config
+            del model
+        return tokenizer, OnnxEncoder(path, config, num_threads), torch.device("cpu")
+
+    model = T5EncoderModel.from_pretrained(model_name)
+    model.eval()
+    if backend == 'torch':
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        return tokenizer, model.to(device), device
+
+    # 量化后端只用于CPU
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    quantized.eval()
+    return tokenizer, quantized, torch.device("cpu")
+
+
+def compare_encoders(reference, candidate, texts):
+    """
+    在样本上比较两个编码器：每条文本嵌入的余弦相似度，以及样本两两相似度矩阵的最大偏差（检索排序依赖的量）。
+
+    Args:
+        reference (callable): 文本列表到标准化嵌入(numpy)的函数（fp32）
+        candidate (callable): 同上（待检查的后端）
+        texts (list): 样本文本
+
+    Returns:
+        dict: min_cosine、mean_cosine、max_similarity_deviation
+    """
+    expected = reference(texts)
+    actual = candidate(texts)
+    cosines = (expected * actual).sum(axis=1)
+    deviation = np.abs(expected @ expected.T - actual @ actual.T).max() if len(texts) > 1 else 0.0
+    return {
+        'min_cosine': float(cosines.min()),
+        'mean_cosine': float(cosines.mean()),
+        'max_similarity_deviation': float(deviation)
+    }
+
+
+def accuracy_guard(model_name, backend, candidate, texts, reference=None):
+    """
+    检查非fp32后端的嵌入是否足够接近fp32，每个(模型, 后端)只检查一次。
+
+    Args:
+        model_name (str): 模型名称
+        backend (str): 后端名称
+        candidate (callable): 待检查后端的编码函数
+        texts (list): 样本文本
+        reference (callable, optional): fp32编码函数，为None时使用注册表中的fp32模型
+
+    Returns:
+        dict: 比较结果，passed表示是否通过
+    """
+    from utils.batched_encoder import encode_texts
+
+    with _guard_lock:
+        key = (model_name, backend)
+        if key not in _guard_results:
+            reference_model = None
+            if reference is None:
+                from utils.model_registry import registry
+                loaded = registry.models.get((model_name, 'torch'))
+                if loaded is None:
+                    # 注册表中没有fp32模型时临时加载，检查完立即释放，不与量化模型同时常驻内存
+                    reference_model = load_encoder(model_name, 'torch')
+                    tokenizer, model, device = reference_model
+
+                    def reference(batch):
+                        return encode_texts(batch, tokenizer, model, device).numpy()
+                else:
+                    def reference(batch):
+                        return encode_texts(batch, loaded.tokenizer, loaded.model, loaded.device, lock=loaded.lock).numpy()
+            result = compare_encoders(reference, candidate, texts)
+            if reference_model is not None:
+                del reference, reference_model, tokenizer, model
+                gc.collect()
+            result['passed'] = result['min_cosine'] >= MIN_EMBEDDING_COSINE and result['max_similarity_deviation'] <= MAX_SIMILARITY_DEVIATION
+            _guard_results[key] = result
+        return _guard_results[key]
@@ -0,0 +1,151 @@
+import re
+import math
+import statistics
+
+NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+
+# 95%置信水平下t分布的临界值（自由度1-10），自由度更大时使用正态近似
+T_CRITICAL_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228]
+
+
+def to_number(value):
+    """
+    将分数转换为数值，支持8、"8"、"8/10"等写法，无法转换时返回None。
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = NUMBER_PATTERN.search(value)
+        if match:
+            return float(match.group(0))
+    return None
+
+
+def critical_value(n, confidence=0.95):
+    """
+    n个样本均值置信区间的临界值（小样本使用t分布）。
+    """
+    try:
+        from scipy.stats import t
+        return float(t.ppf(0.5 + confidence / 2, max(1, n - 1)))
+    except ImportError:
+        if confidence == 0.95 and 1 <= n - 1 <= len(T_CRITICAL_95):
+            return T_CRITICAL_95[n - 2]
+        return {0.9: 1.645, 0.95: 1.96, 0.99: 2.576}.get(round(confidence, 2), 1.96)
+
+
+def ci_half_width(values, confidence=0.95):
+    """
+    Returns:
+        float: 均值置信区间的半宽，样本少于2个时为无穷大
+    """
+    if len(values) < 2:
+        return math.inf
+    return critical_value(len(values), confidence) * statistics.stdev(values) / math.sqrt(len(values))
+
+
+def trimmed_mean(values, proportion=0.2):
+    """
+    去掉两端各proportion比例的样本后求均值。
+    """
+    ordered = sorted(values)
+    cut = int(len(ordered) * proportion)
+    if len(ordered) - 2 * cut <= 0:
+        return statistics.median(ordered)
+    return statistics.mean(ordered[cut:len(ordered) - cut])
+
+
+def aggregate(values, method='median'):
+    if method == 'trimmed_mean':
+        return trimmed_mean(values)
+    if method == 'mean':
+        return statistics.mean(values)
+    return statistics.median(values)
+
+
+def sample_totals(samples):
+    """
+    取每个样本的总分，没有总分时用各项分数之和代替。
+
+    Args:
+        samples (list): Judge解析出的分数字典
+
+    Returns:
+        list: 有效样本的总分
+    """
+    totals = []
+    for sample in samples:
+        evaluation = sample.get('evaluation') if isinstance(sample, dict) else None
+        if not isinstance(evaluation, dict):
+            continue
+        total = to_number(evaluation.get('total_score'))
+        if total is None:
+            criteria = [to_number(d.get('score')) for d in evaluation.values() if isinstance(d, dict)]
+            criteria = [c for c in criteria if c is not None]
+            total = sum(criteria) if criteria else None
+        if total is not None:
+            totals.append(total)
+    return totals
+
+
+def aggregate_samples(samples, method='median', confidence=0.95):
+    """
+    将多个评分样本聚合为一个与单次评分格式相同的分数字典，并附带每项的样本和置信区间。
+
+    Args:
+        samples (list): Judge解析出的分数字典
+        method (str, optional): 'median'、'trimmed_mean'或'mean'
+        confidence (float, optional): 置信水平
+
+    Returns:
+        dict: {'evaluation': {...}, 'sampling': {...}}，没有有效样本时为{'scores': 'invalid'}
+    """
+    valid = [s for s in samples if isinstance(s, dict) and isinstance(s.get('evaluation'), dict)]
+    if not valid:
+        return {'scores': 'invalid'}
+
+    criteria = {}
+    for sample in valid:
+        for criterion, details in sample['evaluation'].items():
+            if isinstance(details, dict):
+                score = to_number(details.get('score'))
+                if score is not None:
+                    criteria.setdefault(criterion, []).append((score, details.get('analysis', '')))
+
+    evaluation = {}
+    for criterion, pairs in criteria.items():
+        values = [score for score, _ in pairs]
+        center = aggregate(values, method)
+        half_width = ci_half_width(values, confidence)
+        # 使用分数最接近聚合值的样本的分析文字
+        analysis = min(pairs, key=lambda pair: abs(pair[0] - center))[1]
+        evaluation[criterion] = {
+            'analysis': analysis,
+            'score': center,
+            'samples': values,
+            'ci': [center - half_width, center + half_width] if math.isfinite(half_width) else None
+        }
+
+    totals = sample_totals(valid)
+    # 能解析但没有任何数值分数的样本（例如截断修复后只剩overall_feedback）视为无效
+    if not criteria or not totals:
+        return {'scores': 'invalid'}
+    total = aggregate(totals, method)
+    feedback = min(valid, key=lambda s: abs((sample_totals([s]) or [total])[0] - total))['evaluation'].get('overall_feedback', '')
+    evaluation['overall_feedback'] = feedback
+    evaluation['total_score'] = total
+
+    half_width = ci_half_width(totals, confidence)
+    return {
+        'evaluation': evaluation,
+        'sampling': {
+            'samples': len(samples),
+            'valid_samples': len(valid),
+            'aggregate': method,
+            'total_scores': totals,
+            'confidence': confidence,
+            'ci_half_width': half_width if math.isfinite(half_width) else None
+        }
+    }
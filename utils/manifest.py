@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+import threading
+from contextlib import contextmanager
+from utils import telemetry
+
+# 不影响阶段结果的配置项（PR标识、路径和缓存设置），不参与记录的键
+IDENTITY_KEYS = {
+    'Agent': {'diff_url', 'PR_url', 'llm_model', 'strategy', 'output_dir', 'output_file_name', 'pr_context_dir', 'pr_context_offline'},
+    'Embedding': {'store_dir', 'use_store', 'micro_batching'},
+    'Judge': {'llm_model', 'tmp_dir', 'pull_number', 'repo', 'scores_output_dir'}
+}
+
+
+def options_fingerprint(config, sections):
+    """
+    配置中影响结果的选项（去掉IDENTITY_KEYS后）的短哈希。
+
+    Args:
+        config (dict): 配置字典
+        sections (tuple): 参与计算的配置部分
+
+    Returns:
+        str: 12位十六进制哈希
+    """
+    options = {
+        section: {k: v for k, v in config[section].items() if k not in IDENTITY_KEYS.get(section, ())}
+        for section in sections if section in config
+    }
+    return hashlib.sha1(json.dumps(options, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:12]
+
+
+class RunManifest:
+    """
+    批量运行的清单文件（只追加的JSONL）。
+    逐条记录每个PR每个阶段的状态、产物路径、耗时和token数量，用于断点续跑。
+    写入时同时持有线程锁和文件锁，多线程和多进程的工作者可以安全地共用同一个清单。
+    """
+
+    def __init__(self, output_dir, file_name='run_manifest.jsonl'):
+        """
+        Args:
+            output_dir (str): 输出目录，清单文件保存在该目录下
+            file_name (str, optional): 清单文件名
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, file_name)
+        self.lock = threading.Lock()
+        self.state = {}
+        self.load()
+
+    def __getstate__(self):
+        # 传给进程池的工作者时不能序列化线程锁，子进程中重新创建
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def run_key(config, stage):
+        """
+        生成记录的键。获取阶段只由PR URL决定；生成阶段还包含策略选项（如函数调用、Embedding配置）的哈希，
+        选项不同的运行不会在续跑时被跳过；评分阶段再加上法官模型和评分选项。
+        """
+        if stage == 'fetch':
+            # PR信息与策略和模型无关，扫描或更换策略时不重复获取
+            return config['Agent']['PR_url']
+        key = f"{config['Agent']['strategy']}|{config['Agent']['llm_model']}|{config['Agent']['PR_url']}"
+        key += f"|{options_fingerprint(config, ('Agent', 'Embedding'))}"
+        if stage == 'judge':
+            key += f"|{config['Judge']['llm_model']}|{options_fingerprint(config, ('Judge',))}"
+        return key
+
+    def load(self):
+        """
+        读取已有的清单，保留每个(键, 阶段)的最新记录。忽略写了一半的最后一行。
+        """
+        self.state = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.state[(record['key'], record['stage'])] = record
+
+    def write(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        with self.lock:
+            with open(self.path, 'ab+') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # 上一次运行中断时最后一行可能没有写完，先补上换行，避免新记录接在半行后面一起损坏
+                    size = f.seek(0, os.SEEK_END)
+                    if size:
+                        f.seek(size - 1)
+                        if f.read(1) != b'\n':
+                            line = b'\n' + line
+                    f.write(line)
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            self.state[(record['key'], record['stage'])] = record
+
+    def completed_artifact(self, config, stage):
+        """
+        查询某阶段是否已经完成。
+
+        Args:
+            config (dict): 配置字典
+            stage (str): 阶段名称
+
+        Returns:
+            str: 已完成阶段的产物路径（产物文件必须仍然存在），否则返回None
+        """
+        with self.lock:
+            record = self.state.get((self.run_key(config, stage), stage))
+        if record is None or record['status'] != 'completed':
+            return None
+        artifact = record.get('artifact')
+        if not artifact or not os.path.exists(artifact):
+            return None
+        return artifact
+
+    @contextmanager
+    def track(self, config, stage):
+        """
+        记录一个阶段的开始、完成或失败。调用方可以在yield出的字典中填写artifact和tokens。
+
+        Args:
+            config (dict): 配置字典
+            stage (str): 阶段名称
+        """
+        key = self.run_key(config, stage)
+        base = {
+            'key': key,
+            'stage': stage,
+            'pr_url': config['Agent']['PR_url'],
+            'strategy': config['Agent']['strategy'],
+            'llm_model': config['Agent']['llm_model'],
+            'judge_model': config['Judge']['llm_model'],
+            'pid': os.getpid()
+        }
+        start = time.time()
+        self.write(dict(base, status='started', timestamp=start))
+        result = {'artifact': None, 'tokens': None}
+        try:
+            yield result
+        except Exception as e:
+            self.write(dict(base, status='failed', timestamp=time.time(), duration=time.time() - start, error=str(e)))
+            raise
+        self.write(dict(
+            base, status='completed', timestamp=time.time(), duration=time.time() - start,
+            artifact=result['artifact'], tokens=result['tokens']
+        ))
+
+
+@contextmanager
+def track_stage(manifest, config, stage):
+    """
+    manifest为None时什么都不记录，便于在不使用清单的调用路径中复用同一段代码。
+    阶段内的LLM、工具和GitHub调用的追踪记录都会带上PR和阶段。
+    """
+    with telemetry.bind(pr=config['Agent']['PR_url'], stage=stage, strategy=config['Agent']['strategy']):
+        if manifest is None:
+            yield {'artifact': None, 'tokens': None}
+        else:
+            with manifest.track(config, stage) as result:
+                yield result
@@ -0,0 +1,60 @@
+import threading
+from collections import namedtuple
+
+LoadedModel = namedtuple('LoadedModel', ['tokenizer', 'model', 'device', 'lock'])
+
+
+class ModelRegistry:
+    """
+    进程内的模型注册表：每个(模型, 推理后端)只加载一次，所有任务和线程共用同一份权重。
+    加载时每个键一把锁，同一个模型不会被两个线程同时加载，不同模型可以并行加载；
+    推理时共用条目中的锁，多个线程的前向计算依次进行（CPU上torch本身已经使用多线程）。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.models = {}
+        self.loading_locks = {}
+
+    def get(self, model_name, backend='torch', **options):
+        """
+        获取已加载的模型，第一次调用时加载。
+
+        Args:
+            model_name (str): 模型名称
+            backend (str, optional): 推理后端，见utils.inference_backends.INFERENCE_BACKENDS
+            **options: 传给load_encoder的参数（如onnx_dir），只在第一次加载时生效
+
+        Returns:
+            LoadedModel: (tokenizer, model, device, lock)
+        """
+        key = (model_name, backend)
+        loaded = self.models.get(key)
+        if loaded is not None:
+            return loaded
+        with self.lock:
+            loading_lock = self.loading_locks.setdefault(key, threading.Lock())
+        with loading_lock:
+            if key not in self.models:
+                from utils.inference_backends import load_encoder
+                print(f"Loading {model_name} ({backend})")
+                tokenizer, model, device = load_encoder(model_name, backend, **options)
+                self.models[key] = LoadedModel(tokenizer, model, device, threading.Lock())
+        return self.models[key]
+
+    def prewarm(self, model_names, backend='torch', **options):
+        """
+        启动时预加载模型，第一个任务不再承担加载时间。
+        """
+        for model_name in model_names:
+            self.get(model_name, backend, **options)
+
+    def loaded(self):
+        return list(self.models)
+
+
+registry = ModelRegistry()
+
+
+def get_model(model_name, backend='torch', **options):
+    return registry.get(model_name, backend, **options)
@@ -0,0 +1,344 @@
+import re
+import json
+
+# 段落标记，例如 "### Thought: ..."、"Action 2:"、"**Thought**: ..."、"### Test Plan Details:"
+SECTION_PATTERN = re.compile(
+    r'^\s*(?:#{1,6}\s*)?(?:[-*]\s+)?\**\s*(Thought|Actions?|Observation|Test Plan Details)(?:\s*\d+(?:\.\d+)?)?\s*\**\s*(?::\**\s*(.*)|$)',
+    re.IGNORECASE
+)
+# 思想行动对的标题，例如 "#### Thought-Action Pair TA001"
+PAIR_PATTERN = re.compile(r'^\s*#*\s*Thought-Action Pair\s+\[?(TA\d+)\]?', re.IGNORECASE)
+# 思想行动对中的字段，例如 "- **Thought**: ..."、"- **Action**:"
+FIELD_PATTERN = re.compile(
+    r'^\s*[-*]?\s*\**\s*(Thought|Action|Expected Information)\s*\**\s*:\s*\**\s*(.*)$',
+    re.IGNORECASE
+)
+IDENTIFIER_PATTERN = re.compile(r'^[A-Za-z_]\w*$')
+FENCED_BLOCK_PATTERN = re.compile(r'```[ \t]*(?:json|JSON)?[ \t]*\n(.*?)```', re.DOTALL)
+
+
+def _scan_json(text, start):
+    """
+    从start处的'{'或'['开始扫描，找到与之匹配的结束位置。
+
+    Returns:
+        tuple: (片段, 是否完整, 未闭合的括号栈, 结束时是否在字符串内)
+    """
+    stack = []
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append(char)
+        elif char in '}]':
+            if stack:
+                stack.pop()
+            if not stack:
+                return text[start:i + 1], True, [], False
+    return text[start:], False, stack, in_string
+
+
+def _remove_trailing_commas(text):
+    """
+    删除字符串之外、紧跟在'}'或']'之前的逗号。
+    """
+    result = []
+    in_string = False
+    escape = False
+    for i, char in enumerate(text):
+        if in_string:
+            result.append(char)
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char == ',':
+            rest = text[i + 1:].lstrip()
+            if not rest or rest[0] in '}]':
+                continue
+        result.append(char)
+    return ''.join(result)
+
+
+def _close_partial(snippet):
+    """
+    补全被截断的JSON：闭合字符串和括号，必要时回退到上一个逗号。
+    """
+    for _ in range(20):
+        _, complete, stack, in_string = _scan_json(snippet, 0)
+        repaired = snippet + ('"' if in_string else '')
+        repaired = repaired.rstrip()
+        if repaired.endswith(':'):
+            repaired += ' null'
+        repaired += ''.join('}' if c == '{' else ']' for c in reversed(stack))
+        try:
+            return json.loads(_remove_trailing_commas(repaired))
+        except json.JSONDecodeError:
+            cut = snippet.rfind(',')
+            if cut <= 0:
+                return None
+            snippet = snippet[:cut]
+    return None
+
+
+def extract_json(text):
+    """
+    从LLM输出中宽松地提取JSON对象或数组。
+    支持```json代码块或裸JSON、尾随逗号，以及被截断的不完整JSON。
+
+    Args:
+        text (str): LLM输出
+
+    Returns:
+        dict or list: 解析结果，无法解析时返回None
+    """
+    if not text:
+        return None
+
+    candidates = [m.group(1) for m in FENCED_BLOCK_PATTERN.finditer(text)]
+    candidates.append(text)
+
+    # 逐个尝试每个'{'和'['的位置：前面的文字中可能有不是JSON的括号。优先返回第一个对象，其次是第一个数组
+    decoder = json.JSONDecoder()
+    first_array = None
+    truncated = None
+    for candidate in candidates:
+        i = 0
+        while i < len(candidate):
+            if candidate[i] not in '{[':
+                i += 1
+                continue
+            try:
+                value, end = decoder.raw_decode(candidate, i)
+            except json.JSONDecodeError:
+                snippet, complete, _, _ = _scan_json(candidate, i)
+                if not complete:
+                    if truncated is None:
+                        truncated = snippet
+                    i += 1
+                    continue
+                try:
+                    value, end = json.loads(_remove_trailing_commas(snippet)), i + len(snippet)
+                except json.JSONDecodeError:
+                    i += 1
+                    continue
+            if isinstance(value, dict):
+                return value
+            if first_array is None:
+                first_array = value
+            # 跳过已经解析的数组，不再返回其中的元素
+            i = end
+
+    if first_array is not None:
+        return first_array
+    # 没有完整的JSON时，补全被截断的JSON
+    return _close_partial(truncated) if truncated is not None else None
+
+
+def parse_react_output(content, tool_names=None):
+    """
+    单次扫描解析Thought/Action/Test Plan格式的LLM输出。
+    支持一个响应中包含多个动作，遇到Observation标记（模型自己编造的观察结果）时停止。
+
+    Args:
+        content (str): LLM的响应文本
+        tool_names (list, optional): 已知的工具名称，出现在Action段之外的同名代码块也会被识别为动作
+
+    Returns:
+        dict: {'thought': str, 'actions': [(action_name, action_param)], 'test_plan': str或None}
+    """
+    result = {'thought': '', 'actions': [], 'test_plan': None}
+    tool_names = set(tool_names or [])
+    lines = content.splitlines()
+
+    section = None
+    thought_lines = []
+    action_header = ''
+    pending_lines = []
+    section_actions = 0
+    fence = None
+
+    def resolve_name(name):
+        name = name.strip().strip('`').strip()
+        if name and name.lower() != 'json':
+            return name
+        header = action_header.split('{')[0].strip().strip('`').strip()
+        if header:
+            return header
+        for line in pending_lines:
+            candidate = line.strip().strip('`').strip()
+            if IDENTIFIER_PATTERN.match(candidate):
+                return candidate
+        return ''
+
+    def flush_action_section():
+        # 处理没有代码块包裹的动作，例如 "Action: view_code_changes {...}"
+        if section != 'action' or section_actions:
+            return
+        name = resolve_name('')
+        if not name:
+            return
+        body = action_header[action_header.find('{'):] if '{' in action_header else ''
+        body += '\n'.join(pending_lines)
+        action_param = extract_json(body)
+        result['actions'].append((name, action_param if isinstance(action_param, dict) else {}))
+
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+
+        if fence is not None:
+            if stripped.startswith('```'):
+                action_param = extract_json('\n'.join(fence['lines']))
+                if fence['name']:
+                    result['actions'].append((fence['name'], action_param if isinstance(action_param, dict) else {}))
+                    section_actions += 1
+                fence = None
+            else:
+                fence['lines'].append(line)
+            continue
+
+        match = SECTION_PATTERN.match(line)
+        if match:
+            kind = match.group(1).lower()
+            rest = (match.group(2) or '').strip()
+            if kind == 'test plan details':
+                flush_action_section()
+                remaining = ([rest] if rest else []) + lines[index + 1:]
+                result['test_plan'] = '\n'.join(remaining).replace('```', '').strip()
+                break
+            if kind == 'observation':
+                break
+            flush_action_section()
+            if kind.startswith('action'):
+                section = 'action'
+                action_header = rest
+                pending_lines = []
+                section_actions = 0
+            else:
+                section = 'thought'
+                if rest:
+                    thought_lines.append(rest)
+            continue
+
+        if stripped.startswith('```'):
+            info = stripped[3:].strip()
+            if section == 'action' or info in tool_names:
+                fence = {'name': resolve_name(info), 'lines': []}
+                continue
+
+        if section == 'thought':
+            thought_lines.append(line)
+        elif section == 'action' and stripped:
+            pending_lines.append(line)
+
+    if fence is None:
+        flush_action_section()
+
+    result['thought'] = '\n'.join(thought_lines).strip()
+    return result
+
+
+def parse_thought_action_pairs(text):
+    """
+    单次扫描解析TOT策略的思想行动对格式。
+
+    Args:
+        text (str): LLM的响应文本
+
+    Returns:
+        list: 包含id、thought、action_name、action_parameters、expected_information的字典列表
+    """
+    results = []
+    current = None
+    field = None
+    fence = None
+
+    def finish(pair):
+        if pair and pair['thought'] and pair['action_name']:
+            pair['thought'] = pair['thought'].strip()
+            pair['expected_information'] = pair['expected_information'].strip()
+            results.append(pair)
+
+    for line in text.splitlines():
+        stripped = line.strip()
+
+        if fence is not None:
+            if stripped.startswith('```'):
+                action_param = extract_json('\n'.join(fence))
+                current['action_parameters'] = action_param if isinstance(action_param, dict) else {"error": "Invalid JSON"}
+                fence = None
+                field = None
+            else:
+                fence.append(line)
+            continue
+
+        pair_match = PAIR_PATTERN.match(line)
+        if pair_match:
+            finish(current)
+            current = {
+                "id": pair_match.group(1),
+                "thought": "",
+                "action_name": "",
+                "action_parameters": {},
+                "expected_information": ""
+            }
+            field = None
+            continue
+
+        if current is None:
+            continue
+
+        field_match = FIELD_PATTERN.match(line)
+        if field_match:
+            field = field_match.group(1).lower()
+            value = field_match.group(2).strip()
+            if field == 'thought':
+                current['thought'] = value
+            elif field == 'expected information':
+                current['expected_information'] = value
+            elif field == 'action' and value:
+                if value.startswith('```'):
+                    current['action_name'] = value.strip('`').strip()
+                    fence = []
+                elif IDENTIFIER_PATTERN.match(value.strip('`')):
+                    current['action_name'] = value.strip('`')
+            continue
+
+        if stripped.startswith('```'):
+            if field == 'action':
+                name = stripped[3:].strip()
+                if name and name.lower() != 'json':
+                    current['action_name'] = name
+                fence = []
+            continue
+
+        if not stripped:
+            if field in ('thought', 'expected information'):
+                field = None
+            continue
+
+        if field == 'thought':
+            current['thought'] += ' ' + stripped
+        elif field == 'expected information':
+            current['expected_information'] += ' ' + stripped
+        elif field == 'action' and not current['action_name'] and IDENTIFIER_PATTERN.match(stripped):
+            current['action_name'] = stripped
+
+    finish(current)
+    return results
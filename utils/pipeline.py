@@ -0,0 +1,145 @@
+import time
+import queue
+import threading
+
+_STOP = object()
+
+
+class Stage:
+    """
+    流水线中的一个阶段。
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=0):
+        """
+        Args:
+            name (str): 阶段名称
+            func (callable): 处理函数，接收并返回条目字典（可以原地修改）
+            workers (int, optional): 该阶段的工作线程数
+            queue_size (int, optional): 该阶段输入队列的容量，0表示不限制
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.stats = {'processed': 0, 'failed': 0, 'skipped': 0, 'busy_seconds': 0.0, 'first_start': None, 'last_end': None}
+
+    def record(self, start, end, failed):
+        with self.lock:
+            self.stats['processed'] += 1
+            if failed:
+                self.stats['failed'] += 1
+            self.stats['busy_seconds'] += end - start
+            if self.stats['first_start'] is None or start < self.stats['first_start']:
+                self.stats['first_start'] = start
+            if self.stats['last_end'] is None or end > self.stats['last_end']:
+                self.stats['last_end'] = end
+
+    def summary(self):
+        """
+        Returns:
+            dict: 处理数量、失败数量、吞吐量（条/分钟）和工作线程利用率
+        """
+        stats = dict(self.stats)
+        active = (stats['last_end'] - stats['first_start']) if stats['first_start'] is not None else 0.0
+        stats['active_seconds'] = active
+        stats['throughput_per_min'] = stats['processed'] / active * 60 if active > 0 else 0.0
+        stats['utilization'] = stats['busy_seconds'] / (active * self.workers) if active > 0 else 0.0
+        stats['workers'] = self.workers
+        return stats
+
+
+class StagedPipeline:
+    """
+    分阶段的批处理流水线。
+    每个阶段有独立大小的线程池，阶段之间用有界队列连接，慢阶段会对上游形成背压，
+    而不是让一个条目独占一个线程走完所有阶段。
+    """
+
+    def __init__(self, stages):
+        """
+        Args:
+            stages (list): Stage列表，按执行顺序排列
+        """
+        self.stages = stages
+        self.results = []
+        self.results_lock = threading.Lock()
+
+    def _worker(self, index):
+        stage = self.stages[index]
+        next_queue = self.stages[index + 1].queue if index + 1 < len(self.stages) else None
+
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                break
+
+            # 前面阶段失败的条目直接传递到末尾
+            if item.get('error'):
+                with stage.lock:
+                    stage.stats['skipped'] += 1
+            else:
+                start = time.time()
+                failed = False
+                try:
+                    item = stage.func(item)
+                except Exception as e:
+                    failed = True
+                    item['error'] = f"{stage.name}: {e}"
+                    print(f"[{stage.name}] failed for {item.get('pr_url')}: {e}")
+                stage.record(start, time.time(), failed)
+
+            if next_queue is not None:
+                next_queue.put(item)
+            else:
+                with self.results_lock:
+                    self.results.append(item)
+
+    def run(self, items):
+        """
+        运行流水线直到所有条目处理完毕。
+
+        Args:
+            items (iterable): 条目字典
+
+        Returns:
+            list: 处理后的条目（顺序为完成顺序）
+        """
+        threads = []
+        for index, stage in enumerate(self.stages):
+            stage_threads = [
+                threading.Thread(target=self._worker, args=(index,), name=f"{stage.name}-{i}", daemon=True)
+                for i in range(stage.workers)
+            ]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+
+        try:
+            # 第一个队列满时这里会阻塞，形成背压
+            for item in items:
+                self.stages[0].queue.put(item)
+        finally:
+            # 逐个阶段关闭：当前阶段的线程全部退出后，才向下一阶段发送停止信号。
+            # items抛出异常时也要关闭，已经提交的条目处理完毕，工作线程不会一直挂起
+            for index, stage in enumerate(self.stages):
+                for _ in range(stage.workers):
+                    stage.queue.put(_STOP)
+                for thread in threads[index]:
+                    thread.join()
+
+        return self.results
+
+    def report(self):
+        """
+        打印并返回每个阶段的吞吐量统计。
+
+        Returns:
+            dict: 阶段名称到统计信息的映射
+        """
+        summaries = {stage.name: stage.summary() for stage in self.stages}
+        print(f"\n{'Stage':<12}{'Workers':>8}{'Done':>7}{'Failed':>8}{'Skipped':>9}{'Per min':>10}{'Util':>8}")
+        for name, s in summaries.items():
+            print(f"{name:<12}{s['workers']:>8}{s['processed']:>7}{s['failed']:>8}{s['skipped']:>9}{s['throughput_per_min']:>10.2f}{s['utilization']:>8.0%}")
+        return summaries
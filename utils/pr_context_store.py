@@ -0,0 +1,75 @@
+import os
+import json
+import time
+import glob
+import tempfile
+from urllib.parse import urlparse
+
+DEFAULT_PR_CONTEXT_DIR = './source/pr_context'
+
+
+class PRContextStore:
+    """
+    整理好的PR信息（PR_Content、PR_Changed_Files、Test_Plan）的持久化缓存。
+    以(仓库, PR编号, head SHA)为键，PR有新的提交时自动失效；所有策略和法官任务共用。
+    目录结构：{root}/{org}_{repo}/{pull_number}/{head_sha}.json
+    """
+
+    def __init__(self, root=DEFAULT_PR_CONTEXT_DIR):
+        self.root = root
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['Agent'].get('pr_context_dir', DEFAULT_PR_CONTEXT_DIR))
+
+    @staticmethod
+    def key_from_config(config):
+        """
+        从PR URL中解析(仓库, PR编号)，URL格式为 https://api.github.com/repos/{org}/{repo}/pulls/{pr_number}
+        """
+        path_parts = urlparse(config['Agent']['PR_url']).path.strip('/').split('/')
+        return f"{path_parts[1]}_{path_parts[2]}", str(path_parts[4])
+
+    def path(self, repo, pull_number, head_sha):
+        return os.path.join(self.root, repo, str(pull_number), f"{head_sha}.json")
+
+    def get(self, repo, pull_number, head_sha=None):
+        """
+        读取缓存的PR信息。
+
+        Args:
+            repo (str): 仓库（org_repo）
+            pull_number (str): PR编号
+            head_sha (str, optional): PR的head SHA，为None时返回最近写入的一条
+
+        Returns:
+            dict: 整理好的PR信息，未命中时返回None
+        """
+        if head_sha:
+            path = self.path(repo, pull_number, head_sha)
+            if not os.path.exists(path):
+                return None
+        else:
+            candidates = glob.glob(os.path.join(self.root, repo, str(pull_number), '*.json'))
+            if not candidates:
+                return None
+            path = max(candidates, key=os.path.getmtime)
+
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)['context']
+        except (json.JSONDecodeError, KeyError, OSError):
+            return None
+
+    def put(self, repo, pull_number, head_sha, context):
+        """
+        写入PR信息。先写临时文件再替换，并发写入同一个键时不会产生半个文件。
+        """
+        path = self.path(repo, pull_number, head_sha or 'unknown')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {'head_sha': head_sha, 'fetched_at': time.time(), 'context': context}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+        return path
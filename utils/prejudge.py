@@ -0,0 +1,279 @@
+import os
+import re
+import sys
+import json
+import glob
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
+
+from utils.judge_sampling import to_number
+
+TOKEN_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|\d+')
+CRITERIA = ('accuracy', 'completeness', 'clarity')
+
+
+def extract_candidate_steps(full_content):
+    """
+    从测试计划文件内容中提取测试用例部分，找不到"## 4. Test Cases"时使用整个测试计划。
+    """
+    if "## 4. Test Cases" in full_content:
+        return full_content.split("## 4. Test Cases")[1].strip()
+    return full_content
+
+
+def tokenize(text):
+    return [token.lower() for token in TOKEN_PATTERN.findall(text or '')]
+
+
+def bm25_similarity(candidates, references, k1=1.5, b=0.75):
+    """
+    向量化计算每对(参考, 候选)的BM25分数：参考测试计划作为查询，候选测试计划作为文档，
+    IDF在整批候选上统计。分数除以参考对自身的BM25分数，归一化到[0, 1]左右。
+
+    Args:
+        candidates (list): 候选测试计划
+        references (list): 与候选一一对应的参考测试计划
+        k1 (float, optional): BM25参数
+        b (float, optional): BM25参数
+
+    Returns:
+        numpy.ndarray: 每对的归一化BM25分数
+    """
+    candidate_tokens = [tokenize(text) for text in candidates]
+    reference_tokens = [tokenize(text) for text in references]
+
+    vocab = {}
+    for tokens in candidate_tokens + reference_tokens:
+        for token in tokens:
+            vocab.setdefault(token, len(vocab))
+    if not vocab:
+        return np.zeros(len(candidates))
+
+    def term_matrix(token_lists):
+        matrix = np.zeros((len(token_lists), len(vocab)), dtype=np.float32)
+        for row, tokens in enumerate(token_lists):
+            if tokens:
+                np.add.at(matrix[row], [vocab[token] for token in tokens], 1.0)
+        return matrix
+
+    doc_tf = term_matrix(candidate_tokens)
+    query_tf = term_matrix(reference_tokens)
+
+    n_docs = len(candidates)
+    df = (doc_tf > 0).sum(axis=0)
+    idf = np.log((n_docs - df + 0.5) / (df + 0.5) + 1.0)
+
+    def bm25(query, tf):
+        lengths = tf.sum(axis=1, keepdims=True)
+        avg_length = max(float(doc_tf.sum(axis=1).mean()), 1.0)
+        saturation = tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths / avg_length) + 1e-9)
+        return ((query > 0) * idf * saturation).sum(axis=1)
+
+    scores = bm25(query_tf, doc_tf)
+    self_scores = bm25(query_tf, query_tf)
+    return np.divide(scores, self_scores, out=np.zeros_like(scores), where=self_scores > 0)
+
+
+def cosine_similarity(candidate_embeddings, reference_embeddings):
+    """
+    逐对计算余弦相似度。
+
+    Args:
+        candidate_embeddings (numpy.ndarray): (n, d)
+        reference_embeddings (numpy.ndarray): (n, d)
+
+    Returns:
+        numpy.ndarray: (n,)
+    """
+    candidate_norm = np.linalg.norm(candidate_embeddings, axis=1)
+    reference_norm = np.linalg.norm(reference_embeddings, axis=1)
+    dot = (candidate_embeddings * reference_embeddings).sum(axis=1)
+    return dot / np.maximum(candidate_norm * reference_norm, 1e-9)
+
+
+def prejudge_batch(candidates, references, encoder=None, min_tokens=20, degenerate_threshold=0.05, bm25_weight=0.5):
+    """
+    批量预评分：BM25和嵌入余弦相似度，并标记可以跳过LLM评分的退化测试计划（空、过短或与参考几乎无关）。
+
+    Args:
+        candidates (list): 候选测试计划
+        references (list): 参考测试计划
+        encoder (callable, optional): 文本列表到(n, d)嵌入矩阵的函数，为None时只使用BM25
+        min_tokens (int, optional): 少于该token数的候选视为退化
+        degenerate_threshold (float, optional): 代理分数低于该值的候选视为退化
+        bm25_weight (float, optional): 代理分数中BM25的权重
+
+    Returns:
+        list: 每个候选的{'bm25', 'cosine', 'proxy', 'degenerate', 'reason'}
+    """
+    if not candidates:
+        return []
+    bm25_scores = bm25_similarity(candidates, references)
+    cosine_scores = None
+    if encoder is not None:
+        embeddings = encoder(list(candidates) + list(references))
+        cosine_scores = cosine_similarity(embeddings[:len(candidates)], embeddings[len(candidates):])
+        proxy_scores = bm25_weight * np.clip(bm25_scores, 0, 1) + (1 - bm25_weight) * np.clip(cosine_scores, 0, 1)
+    else:
+        proxy_scores = np.clip(bm25_scores, 0, 1)
+
+    results = []
+    for i, candidate in enumerate(candidates):
+        reason = None
+        token_count = len(tokenize(candidate))
+        if token_count == 0:
+            reason = 'empty test plan'
+        elif token_count < min_tokens:
+            reason = f'test plan has only {token_count} tokens'
+        elif references[i].strip() and proxy_scores[i] < degenerate_threshold:
+            reason = f'test plan is unrelated to the reference (proxy {proxy_scores[i]:.3f})'
+        results.append({
+            'bm25': float(bm25_scores[i]),
+            'cosine': float(cosine_scores[i]) if cosine_scores is not None else None,
+            'proxy': float(proxy_scores[i]),
+            'degenerate': reason is not None,
+            'reason': reason
+        })
+    return results
+
+
+def short_circuit_scores(prejudge_result):
+    """
+    退化测试计划不调用LLM，直接给出与评分结果格式相同的0分。
+    """
+    analysis = f"Pre-judge: {prejudge_result['reason']}; the LLM judge was skipped."
+    evaluation = {criterion: {'analysis': analysis, 'score': 0} for criterion in CRITERIA}
+    evaluation['overall_feedback'] = analysis
+    evaluation['total_score'] = 0
+    return {'evaluation': evaluation, 'prejudge': prejudge_result}
+
+
+def codet5_encoder(model_name="Salesforce/codet5p-base", max_length=512):
+    """
+    使用CodeT5+编码器（与嵌入策略相同的模型）构建文本编码函数，与嵌入任务共用模型注册表中的模型。
+
+    Returns:
+        callable: 文本列表到归一化嵌入矩阵(numpy)的函数
+    """
+    from utils.model_registry import get_model
+    from utils.batched_encoder import encode_texts
+
+    loaded = get_model(model_name)
+
+    def encode(texts):
+        return encode_texts(texts, loaded.tokenizer, loaded.model, loaded.device, max_length, lock=loaded.lock).numpy()
+
+    return encode
+
+
+def rank(values):
+    """
+    平均秩（相同值取平均名次）。
+    """
+    values = np.asarray(values, dtype=float)
+    order = np.argsort(values, kind='mergesort')
+    ranks = np.empty(len(values))
+    ranks[order] = np.arange(1, len(values) + 1)
+    for value in np.unique(values):
+        tied = values == value
+        if tied.sum() > 1:
+            ranks[tied] = ranks[tied].mean()
+    return ranks
+
+
+def correlation(x, y):
+    """
+    Returns:
+        dict: Pearson和Spearman相关系数
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) < 3 or x.std() == 0 or y.std() == 0:
+        return {'pearson': None, 'spearman': None}
+    return {
+        'pearson': float(np.corrcoef(x, y)[0, 1]),
+        'spearman': float(np.corrcoef(rank(x), rank(y))[0, 1])
+    }
+
+
+def collect_scored_plans(root):
+    """
+    收集已经有LLM评分的测试计划：
+    分数 {root}/{strategy}/{repo}/scores/{gen_model}_{judge_model}_{pr}.json
+    测试计划 {root}/{strategy}/{repo}/Test-Plan/{gen_model}_{pr}.txt
+    参考 {root}/{strategy}/{repo}/PR-Content/{pr}_PR_body.json
+
+    Returns:
+        list: {'score_path', 'candidate', 'reference', 'llm_total'}
+    """
+    from utils.score_warehouse import parse_score_path
+
+    records = []
+    for score_path in glob.glob(os.path.join(root, '**', 'scores', '*.json'), recursive=True):
+        meta = parse_score_path(score_path)
+        if meta is None:
+            continue
+        repo_dir = Path(score_path).parents[1]
+        plan_path = repo_dir / 'Test-Plan' / f"{meta['gen_model']}_{meta['pr']}.txt"
+        body_path = repo_dir / 'PR-Content' / f"{meta['pr']}_PR_body.json"
+        if not plan_path.exists() or not body_path.exists():
+            continue
+        try:
+            with open(score_path, 'r') as f:
+                scores = json.load(f)
+            with open(body_path, 'r') as f:
+                reference = json.load(f).get('Test_Plan', '')
+        except (json.JSONDecodeError, OSError):
+            continue
+        # 跳过预评分直接给出的分数（退化的测试计划），只与真正的LLM评分比较
+        if not isinstance(scores, dict) or (scores.get('prejudge') or {}).get('degenerate'):
+            continue
+        llm_total = to_number((scores.get('evaluation') or {}).get('total_score'))
+        if llm_total is None:
+            continue
+        with open(plan_path, 'r') as f:
+            candidate = extract_candidate_steps(f.read())
+        records.append({'score_path': score_path, 'candidate': candidate, 'reference': reference or '', 'llm_total': llm_total})
+    return records
+
+
+def correlation_report(root, use_embedding=False):
+    """
+    在已有LLM评分的测试计划上计算预评分，并报告与LLM总分的相关性。
+
+    Returns:
+        dict: 样本数和bm25/cosine/proxy各自的相关系数
+    """
+    records = collect_scored_plans(root)
+    encoder = codet5_encoder() if use_embedding else None
+    results = prejudge_batch([r['candidate'] for r in records], [r['reference'] for r in records], encoder)
+    llm_totals = [r['llm_total'] for r in records]
+
+    report = {'plans': len(records), 'degenerate': sum(r['degenerate'] for r in results)}
+    for metric in ('bm25', 'cosine', 'proxy'):
+        values = [r[metric] for r in results]
+        if values and all(v is not None for v in values):
+            report[metric] = correlation(values, llm_totals)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Correlate the local pre-judge with LLM judge scores')
+    parser.add_argument('root', nargs='?', default='./result', help='Result directory (run.py --output-dir)')
+    parser.add_argument('--embedding', action='store_true', help='Also compute CodeT5+ embedding cosine similarity')
+    parser.add_argument('--output', help='Write the report to this JSON file')
+    args = parser.parse_args()
+
+    report = correlation_report(args.root, args.embedding)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
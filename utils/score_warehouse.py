@@ -0,0 +1,279 @@
+import os
+import sys
+import json
+import glob
+import sqlite3
+import argparse
+import concurrent.futures
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
+
+from utils.judge_sampling import to_number
+
+GROUP_COLUMNS = ('strategy', 'repo', 'gen_model', 'judge_model', 'pr', 'criterion')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS score_files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scores (
+    path TEXT NOT NULL,
+    strategy TEXT,
+    repo TEXT,
+    gen_model TEXT,
+    judge_model TEXT,
+    pr TEXT,
+    criterion TEXT,
+    score REAL
+);
+CREATE INDEX IF NOT EXISTS idx_scores_path ON scores (path);
+CREATE INDEX IF NOT EXISTS idx_scores_group ON scores (criterion, strategy, gen_model, judge_model);
+"""
+
+
+def parse_score_path(path):
+    """
+    从分数文件路径解析元数据：{output_dir}/{strategy}/{repo}/scores/{gen_model}_{judge_model}_{pr}.json
+
+    Returns:
+        dict: strategy、repo、gen_model、judge_model、pr，路径不符合格式时返回None
+    """
+    parts = Path(path).parts
+    if len(parts) < 4 or parts[-2] != 'scores':
+        return None
+    name_parts = Path(path).stem.rsplit('_', 2)
+    if len(name_parts) != 3:
+        return None
+    return {
+        'strategy': parts[-4],
+        'repo': parts[-3],
+        'gen_model': name_parts[0],
+        'judge_model': name_parts[1],
+        'pr': name_parts[2]
+    }
+
+
+def parse_score_file(path):
+    """
+    读取一个分数文件，展开为每个评分标准一行。
+
+    Returns:
+        list: (path, strategy, repo, gen_model, judge_model, pr, criterion, score)元组
+    """
+    meta = parse_score_path(path)
+    if meta is None:
+        return []
+    try:
+        with open(path, 'r') as f:
+            scores = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return []
+
+    evaluation = scores.get('evaluation') if isinstance(scores, dict) else None
+    if not isinstance(evaluation, dict):
+        return []
+
+    rows = []
+    for criterion, details in evaluation.items():
+        # 只导入带score的评分标准和total_score，overall_feedback等文本字段中的数字不是分数
+        if isinstance(details, dict) and 'score' in details:
+            value = details['score']
+        elif criterion == 'total_score':
+            value = details
+        else:
+            continue
+        score = to_number(value)
+        if score is None:
+            continue
+        rows.append((path, meta['strategy'], meta['repo'], meta['gen_model'], meta['judge_model'], meta['pr'], criterion, score))
+    return rows
+
+
+class ScoreWarehouse:
+    """
+    分数仓库：把分散的分数JSON文件导入一张SQLite表（每个评分标准一行），
+    按修改时间增量导入，并用pandas向量化计算均值、中位数和置信区间。
+    """
+
+    def __init__(self, db_path='./result/scores.db'):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def ingest(self, root, workers=8):
+        """
+        增量导入root下所有的分数文件：只重新读取新增或修改过的文件，删除已经不存在的文件的记录。
+
+        Args:
+            root (str): 结果目录（run.py的--output-dir）
+            workers (int, optional): 并发读取文件的线程数
+
+        Returns:
+            dict: 新增/更新、删除和未变化的文件数量
+        """
+        paths = glob.glob(os.path.join(root, '**', 'scores', '*.json'), recursive=True)
+        current = {path: os.path.getmtime(path) for path in paths}
+        known = dict(self.conn.execute("SELECT path, mtime FROM score_files").fetchall())
+
+        changed = [path for path, mtime in current.items() if known.get(path) != mtime]
+        removed = [path for path in known if path not in current and path.startswith(os.path.join(root, ''))]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(parse_score_file, changed))
+
+        with self.conn:
+            stale = [(path,) for path in changed + removed]
+            self.conn.executemany("DELETE FROM scores WHERE path = ?", stale)
+            self.conn.executemany("DELETE FROM score_files WHERE path = ?", [(path,) for path in removed])
+            self.conn.executemany("INSERT INTO scores VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [row for rows in parsed for row in rows])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO score_files VALUES (?, ?)",
+                [(path, current[path]) for path in changed]
+            )
+
+        return {'updated': len(changed), 'removed': len(removed), 'unchanged': len(current) - len(changed)}
+
+    def load(self, **filters):
+        """
+        读取分数记录。
+
+        Args:
+            **filters: 列名到值（或值的列表）的过滤条件，例如 criterion='total_score', strategy=['ReAct', 'TOT']
+
+        Returns:
+            pandas.DataFrame: 分数记录
+        """
+        clauses = []
+        params = []
+        for column, value in filters.items():
+            if value is None:
+                continue
+            if column not in GROUP_COLUMNS:
+                raise ValueError(f"Unknown filter column: {column}")
+            values = value if isinstance(value, (list, tuple)) else [value]
+            clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return pd.read_sql_query(f"SELECT * FROM scores{where}", self.conn, params=params)
+
+    def aggregate(self, group_by=('strategy', 'gen_model', 'judge_model', 'criterion'), confidence=0.95, **filters):
+        """
+        按给定的列分组计算分数统计。
+
+        Args:
+            group_by (tuple, optional): 分组列
+            confidence (float, optional): 置信区间的置信水平（正态近似）
+            **filters: 过滤条件，见load
+
+        Returns:
+            pandas.DataFrame: 每组的count、mean、median、std、ci_low、ci_high
+        """
+        df = self.load(**filters)
+        return aggregate_scores(df, group_by, confidence)
+
+    def leaderboard(self, criterion='total_score', judge_model=None, **filters):
+        """
+        按平均分排序的(策略, 生成模型)排行榜。
+
+        Returns:
+            pandas.DataFrame: 排行榜
+        """
+        table = self.aggregate(('strategy', 'gen_model', 'judge_model'), criterion=criterion, judge_model=judge_model, **filters)
+        return table.sort_values('mean', ascending=False).reset_index(drop=True)
+
+
+def aggregate_scores(df, group_by=('strategy', 'gen_model', 'judge_model', 'criterion'), confidence=0.95):
+    """
+    向量化计算分组的均值、中位数和置信区间。
+
+    Args:
+        df (pandas.DataFrame): 分数记录，至少包含group_by中的列和score列
+        group_by (tuple, optional): 分组列
+        confidence (float, optional): 置信水平
+
+    Returns:
+        pandas.DataFrame: 统计结果
+    """
+    group_by = list(group_by)
+    if df.empty:
+        return pd.DataFrame(columns=group_by + ['count', 'mean', 'median', 'std', 'ci_low', 'ci_high'])
+
+    z = _z_value(confidence)
+    stats = df.groupby(group_by, sort=True)['score'].agg(['count', 'mean', 'median', 'std']).reset_index()
+    stats['std'] = stats['std'].fillna(0.0)
+    half_width = z * stats['std'].to_numpy() / np.sqrt(stats['count'].to_numpy())
+    stats['ci_low'] = stats['mean'] - half_width
+    stats['ci_high'] = stats['mean'] + half_width
+    return stats
+
+
+def _z_value(confidence):
+    try:
+        from scipy.stats import norm
+        return float(norm.ppf(0.5 + confidence / 2))
+    except ImportError:
+        return {0.9: 1.645, 0.95: 1.96, 0.99: 2.576}.get(round(confidence, 2), 1.96)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest judge score files and query aggregated statistics')
+    parser.add_argument('--db', default='./result/scores.db', help='SQLite database of the scores warehouse')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='Incrementally ingest score JSON files')
+    ingest_parser.add_argument('root', nargs='?', default='./result', help='Result directory (run.py --output-dir)')
+    ingest_parser.add_argument('--workers', type=int, default=8, help='Threads reading score files')
+
+    for name, help_text in (('query', 'Aggregate scores per group'), ('leaderboard', 'Rank strategy/model pairs')):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('--criterion', default='total_score' if name == 'leaderboard' else None, nargs='*' if name == 'query' else None,
+                         help='Criterion to aggregate (accuracy, completeness, clarity, total_score)')
+        sub.add_argument('--strategy', nargs='*', help='Only these strategies')
+        sub.add_argument('--gen-model', nargs='*', help='Only these generation models')
+        sub.add_argument('--judge-model', nargs='*', help='Only these judge models')
+        sub.add_argument('--repo', nargs='*', help='Only these repositories')
+        sub.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the interval')
+        sub.add_argument('--csv', help='Also write the table to this CSV file')
+        if name == 'query':
+            sub.add_argument('--by', nargs='+', default=['strategy', 'gen_model', 'judge_model', 'criterion'],
+                             choices=GROUP_COLUMNS, help='Columns to group by')
+
+    args = parser.parse_args()
+    warehouse = ScoreWarehouse(args.db)
+    try:
+        if args.command == 'ingest':
+            print(warehouse.ingest(args.root, args.workers))
+            return
+
+        filters = {
+            'criterion': args.criterion,
+            'strategy': args.strategy,
+            'gen_model': args.gen_model,
+            'judge_model': args.judge_model,
+            'repo': args.repo
+        }
+        if args.command == 'query':
+            table = warehouse.aggregate(args.by, args.confidence, **filters)
+        else:
+            filters.pop('criterion')
+            table = warehouse.leaderboard(args.criterion, **filters)
+
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(table.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+        if args.csv:
+            table.to_csv(args.csv, index=False)
+    finally:
+        warehouse.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import statistics
+import threading
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
+
+# 设置后，子进程（进程池工作者）也会写入同一个追踪文件
+TRACE_FILE_ENV = 'TESTPLAN_TRACE_FILE'
+RUN_ID_ENV = 'TESTPLAN_RUN_ID'
+
+# 每1K token的价格（美元）：(输入, 输出)，按模型名称前缀匹配，越具体的前缀越靠前
+PRICES_PER_1K = [
+    ('gpt-4o-mini', (0.00015, 0.0006)),
+    ('gpt-4o', (0.0025, 0.01)),
+    ('gpt-4', (0.03, 0.06)),
+    ('gpt-3.5-turbo', (0.0015, 0.002)),
+    ('claude-3-5-sonnet', (0.003, 0.015)),
+    ('claude-3-5-haiku', (0.0008, 0.004)),
+    ('deepseek-v3', (0.00027, 0.0011)),
+    ('qwen-max', (0.0016, 0.0064)),
+    ('qwen2.5-coder-32b-instruct', (0.0005, 0.001)),
+    ('qwen2.5-coder-14b-instruct', (0.0003, 0.0006)),
+]
+
+_context = contextvars.ContextVar('telemetry_context', default={})
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """
+    按价格表估算一次调用的费用，未知模型返回None。
+    """
+    for prefix, (prompt_price, completion_price) in PRICES_PER_1K:
+        if model and model.startswith(prefix):
+            return prompt_tokens / 1000 * prompt_price + completion_tokens / 1000 * completion_price
+    return None
+
+
+class Tracer:
+    """
+    将span记录逐行追加写入JSONL文件。未配置输出文件时不记录任何内容。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path = None
+        self.run_id = None
+
+    def configure(self, path, run_id=None):
+        """
+        Args:
+            path (str): 追踪文件路径
+            run_id (str, optional): 运行ID，默认随机生成
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        os.environ[TRACE_FILE_ENV] = path
+        os.environ[RUN_ID_ENV] = self.run_id
+
+    @property
+    def enabled(self):
+        if self.path is None and os.environ.get(TRACE_FILE_ENV):
+            self.path = os.environ[TRACE_FILE_ENV]
+            self.run_id = os.environ.get(RUN_ID_ENV)
+        return self.path is not None
+
+    def emit(self, record):
+        if not self.enabled:
+            return
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
+
+
+tracer = Tracer()
+
+
+def configure(path, run_id=None):
+    tracer.configure(path, run_id)
+    return tracer.run_id
+
+
+@contextmanager
+def bind(**attributes):
+    """
+    为当前上下文中的所有span附加属性，例如PR和阶段：with bind(pr=pr_url, stage='generate'): ...
+    """
+    token = _context.set({**_context.get(), **attributes})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context():
+    """
+    Returns:
+        contextvars.Context: 当前上下文的副本，提交到线程池时用ctx.run传递PR和阶段属性
+    """
+    return contextvars.copy_context()
+
+
+@contextmanager
+def span(kind, name, **attributes):
+    """
+    记录一次调用的span：开始时间、耗时、状态以及调用方填写的属性
+    （tokens_in、tokens_out、cost、cache_hit、retries等）。
+
+    Args:
+        kind (str): 'llm'、'tool'或'github'
+        name (str): 模型名称、工具名称或接口名称
+        **attributes: 初始属性
+
+    Yields:
+        dict: 可以在调用过程中填写的属性
+    """
+    record = dict(attributes)
+    start = time.time()
+    status = 'ok'
+    error = None
+    try:
+        yield record
+    except Exception as e:
+        status = 'error'
+        error = str(e)
+        raise
+    finally:
+        if tracer.enabled:
+            tracer.emit({
+                'run_id': tracer.run_id,
+                'kind': kind,
+                'name': name,
+                'start': start,
+                'duration': time.time() - start,
+                'status': status,
+                'error': error,
+                **_context.get(),
+                'pid': os.getpid(),
+                'thread': threading.current_thread().name,
+                **record
+            })
+
+
+def load_spans(path, run_id=None):
+    spans = []
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if run_id is None or record.get('run_id') == run_id:
+                spans.append(record)
+    return spans
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(spans, by=('kind', 'name')):
+    """
+    按给定字段分组统计span：次数、总耗时、p50/p95耗时、token、费用、缓存命中和重试次数。
+
+    Returns:
+        list: 按总耗时降序排列的统计字典
+    """
+    groups = {}
+    for record in spans:
+        key = tuple(str(record.get(field, '')) for field in by)
+        groups.setdefault(key, []).append(record)
+
+    rows = []
+    for key, records in groups.items():
+        durations = [r.get('duration', 0.0) for r in records]
+        rows.append({
+            **dict(zip(by, key)),
+            'count': len(records),
+            'errors': sum(r.get('status') == 'error' for r in records),
+            'total_seconds': sum(durations),
+            'p50_seconds': statistics.median(durations),
+            'p95_seconds': percentile(durations, 0.95),
+            'tokens_in': sum(r.get('tokens_in') or 0 for r in records),
+            'tokens_out': sum(r.get('tokens_out') or 0 for r in records),
+            'cost': sum(r.get('cost') or 0.0 for r in records),
+            'cache_hits': sum(bool(r.get('cache_hit')) for r in records),
+            'retries': sum(r.get('retries') or 0 for r in records)
+        })
+    return sorted(rows, key=lambda row: row['total_seconds'], reverse=True)
+
+
+def print_summary(rows, by, limit=None):
+    header = ''.join(f"{field:<40}" if field in ('name', 'pr') else f"{field:<10}" for field in by)
+    print(f"\n{header}{'Count':>7}{'Errors':>7}{'Total s':>10}{'p50 s':>8}{'p95 s':>8}{'Tok in':>10}{'Tok out':>9}{'Cost $':>9}{'Cache':>7}{'Retry':>7}")
+    for row in rows[:limit]:
+        label = ''.join(f"{str(row[field])[:39]:<40}" if field in ('name', 'pr') else f"{str(row[field])[:9]:<10}" for field in by)
+        print(f"{label}{row['count']:>7}{row['errors']:>7}{row['total_seconds']:>10.1f}{row['p50_seconds']:>8.2f}{row['p95_seconds']:>8.2f}"
+              f"{row['tokens_in']:>10}{row['tokens_out']:>9}{row['cost']:>9.3f}{row['cache_hits']:>7}{row['retries']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize where wall time and money went in a traced run')
+    parser.add_argument('trace_file', help='Telemetry JSONL written by run.py --telemetry')
+    parser.add_argument('--run-id', help='Only spans of this run (default: the last run in the file)')
+    parser.add_argument('--all-runs', action='store_true', help='Summarize every run in the file')
+    parser.add_argument('--top', type=int, default=10, help='Rows shown in the per-PR table')
+    args = parser.parse_args()
+
+    spans = load_spans(args.trace_file)
+    if not spans:
+        print("No spans found")
+        return
+    run_id = args.run_id or (None if args.all_runs else spans[-1].get('run_id'))
+    if run_id:
+        spans = [s for s in spans if s.get('run_id') == run_id]
+        print(f"Run {run_id}: {len(spans)} spans")
+
+    print_summary(summarize(spans, ('kind',)), ('kind',))
+    print_summary(summarize(spans, ('kind', 'name')), ('kind', 'name'))
+    print_summary(summarize(spans, ('stage', 'kind')), ('stage', 'kind'))
+    print_summary(summarize(spans, ('pr',)), ('pr',), args.top)
+
+
+if __name__ == '__main__':
+    main()
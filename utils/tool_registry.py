@@ -0,0 +1,312 @@
+import json
+import threading
+import concurrent.futures
+from utils.function_calling import schema_from_signature
+from utils import telemetry
+
+# 工具以字符串返回的错误信息前缀（见utils.tools.Agent_utils），这类结果不缓存
+ERROR_PREFIXES = ('Error:', 'An error occurred', 'File not found', 'Permission denied', 'Unable to decode')
+
+
+def is_error_result(result):
+    """
+    判断工具返回的观察结果是否是错误信息：{"error": ...}形式的JSON，或以错误前缀开头的字符串。
+    """
+    if isinstance(result, dict):
+        return 'error' in result and len(result) == 1
+    if not isinstance(result, str):
+        return False
+    if result.startswith(ERROR_PREFIXES):
+        return True
+    if result.startswith('{"error"'):
+        try:
+            parsed = json.loads(result)
+        except json.JSONDecodeError:
+            return False
+        return isinstance(parsed, dict) and list(parsed) == ['error']
+    return False
+
+
+class ToolSpec:
+    """
+    单个工具的描述信息。
+    """
+
+    def __init__(self, name, func, cacheable=True, io_bound=True, cpu_bound=False, timeout=60, schema=None):
+        """
+        Args:
+            name (str): 工具名称（与提示中的名称一致）
+            func (callable): 接收参数字典并返回观察结果的函数
+            cacheable (bool, optional): 相同参数的结果在一次运行中是否不变，可以复用
+            io_bound (bool, optional): 是否主要耗时在磁盘或网络上
+            cpu_bound (bool, optional): 是否主要耗时在计算上（受GIL限制，不会并发执行）
+            timeout (float, optional): 单次调用的超时时间（秒），None表示不限制
+            schema (dict, optional): 用于原生函数调用的工具描述（见utils.function_calling）
+        """
+        self.name = name
+        self.func = func
+        self.cacheable = cacheable
+        self.io_bound = io_bound
+        self.cpu_bound = cpu_bound
+        self.timeout = timeout
+        self.schema = schema
+
+
+class ToolRegistry:
+    """
+    工具注册表，按名称保存工具函数及其元数据。
+    """
+
+    def __init__(self):
+        self.tools = {}
+
+    def register(self, name, func, **metadata):
+        """
+        注册一个工具。
+
+        Args:
+            name (str): 工具名称
+            func (callable): 接收参数字典的工具函数
+            **metadata: 传给ToolSpec的元数据（cacheable, io_bound, cpu_bound, timeout, schema）
+
+        Returns:
+            ToolSpec: 注册的工具描述
+        """
+        spec = ToolSpec(name, func, **metadata)
+        self.tools[name] = spec
+        return spec
+
+    def get(self, name):
+        return self.tools.get(name)
+
+    def names(self):
+        return list(self.tools.keys())
+
+    def schemas(self):
+        """
+        Returns:
+            list: 所有带有描述的工具的函数调用描述
+        """
+        return [spec.schema for spec in self.tools.values() if spec.schema is not None]
+
+
+class ToolExecutor:
+    """
+    工具执行器。
+    支持并发执行一批工具调用、单个工具的超时控制，以及按(工具, 规范化参数)缓存结果。
+    超时、抛出异常或返回错误信息的调用不缓存。线程池属于一个任务，任务结束时调用shutdown。
+    """
+
+    def __init__(self, registry, max_workers=8, timeouts=None):
+        """
+        Args:
+            registry (ToolRegistry): 工具注册表
+            max_workers (int, optional): 线程池大小
+            timeouts (dict, optional): 按工具名覆盖默认超时时间
+        """
+        self.registry = registry
+        self.max_workers = max_workers
+        self.timeouts = timeouts or {}
+        self.memo = {}
+        self.lock = threading.Lock()
+        self.cpu_semaphore = threading.Semaphore(1)
+        self.pool = None
+        self.stats = {'calls': 0, 'cache_hits': 0, 'timeouts': 0}
+
+    @staticmethod
+    def make_key(tool_name, tool_param):
+        """
+        生成缓存键，参数按键排序后序列化，使顺序不同的相同参数命中同一条缓存。
+        """
+        return tool_name + ' ' + json.dumps(tool_param or {}, sort_keys=True, default=str)
+
+    def get_pool(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+            return self.pool
+
+    def _run(self, spec, tool_param):
+        with telemetry.span('tool', spec.name, cache_hit=False):
+            if spec.cpu_bound:
+                with self.cpu_semaphore:
+                    return spec.func(tool_param)
+            return spec.func(tool_param)
+
+    def submit(self, tool_name, tool_param):
+        """
+        异步提交一次工具调用。可缓存工具的相同调用（包括仍在执行中的调用）共享同一个Future。
+
+        Args:
+            tool_name (str): 工具名称
+            tool_param (dict): 工具参数
+
+        Returns:
+            concurrent.futures.Future: 观察结果的Future
+        """
+        spec = self.registry.get(tool_name)
+        if spec is None:
+            # 未知工具与原先的行为保持一致，返回空观察结果
+            future = concurrent.futures.Future()
+            future.set_result('')
+            return future
+
+        tool_param = tool_param or {}
+        key = self.make_key(tool_name, tool_param)
+        pool = self.get_pool()
+        with self.lock:
+            self.stats['calls'] += 1
+            if spec.cacheable and key in self.memo:
+                self.stats['cache_hits'] += 1
+                with telemetry.span('tool', tool_name, cache_hit=True):
+                    return self.memo[key]
+            # 在当前上下文中执行，工具的追踪记录带有PR和阶段
+            future = pool.submit(telemetry.current_context().run, self._run, spec, tool_param)
+            if spec.cacheable:
+                self.memo[key] = future
+
+        if spec.cacheable:
+            future.add_done_callback(lambda f, key=key: self._evict_failed(key, f))
+        return future
+
+    def _evict(self, future):
+        with self.lock:
+            for key in [key for key, memoized in self.memo.items() if memoized is future]:
+                del self.memo[key]
+
+    def _evict_failed(self, key, future):
+        # 失败或返回错误信息的调用不缓存，下次重新执行
+        if future.cancelled() or future.exception() is not None or is_error_result(future.result()):
+            with self.lock:
+                if self.memo.get(key) is future:
+                    del self.memo[key]
+
+    def timeout_for(self, tool_name):
+        spec = self.registry.get(tool_name)
+        return self.timeouts.get(tool_name, spec.timeout if spec else None)
+
+    def wait(self, tool_name, future):
+        """
+        等待工具调用结束，超时则返回错误信息。
+        完成回调在工作线程中执行，可能晚于这里返回，因此失败的调用在这里同步移出缓存。
+        """
+        try:
+            result = future.result(timeout=self.timeout_for(tool_name))
+        except concurrent.futures.TimeoutError:
+            # 超时的调用不再复用：下次相同的调用重新执行，而不是等待同一个可能卡住的Future
+            future.cancel()
+            self._evict(future)
+            with self.lock:
+                self.stats['timeouts'] += 1
+            return json.dumps({"error": f"Tool '{tool_name}' timed out after {self.timeout_for(tool_name)} seconds"})
+        except Exception:
+            self._evict(future)
+            raise
+        if is_error_result(result):
+            self._evict(future)
+        return result
+
+    def execute(self, tool_name, tool_param):
+        """
+        执行单个工具调用。工具抛出的异常会向上传递。
+
+        Args:
+            tool_name (str): 工具名称
+            tool_param (dict): 工具参数
+
+        Returns:
+            dict or str: 观察结果
+        """
+        return self.wait(tool_name, self.submit(tool_name, tool_param))
+
+    def execute_batch(self, tool_calls):
+        """
+        并发执行一批工具调用，结果按输入顺序返回。单个调用的异常转换为错误信息，不影响其他调用。
+
+        Args:
+            tool_calls (list): (tool_name, tool_param)元组的列表
+
+        Returns:
+            list: 与输入顺序对应的观察结果
+        """
+        futures = [(tool_name, self.submit(tool_name, tool_param)) for tool_name, tool_param in tool_calls]
+        observations = []
+        for tool_name, future in futures:
+            try:
+                observations.append(self.wait(tool_name, future))
+            except Exception as e:
+                observations.append(str(e))
+        return observations
+
+    def shutdown(self):
+        """
+        关闭线程池并清空缓存。不等待仍在执行的（超时的）调用，尚未开始的调用直接取消。
+        """
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = None
+            self.memo.clear()
+
+
+def create_agent_tool_registry(agent_utils):
+    """
+    为Agent_utils中的工具创建注册表，工具名称与提示中的名称一致。
+
+    Args:
+        agent_utils (Agent_utils): 工具实现
+
+    Returns:
+        ToolRegistry: 工具注册表
+    """
+    registry = ToolRegistry()
+
+    registry.register(
+        'search_class_in_project',
+        lambda p: agent_utils.search_entity_in_project(p.get('class_name', '')),
+        cpu_bound=True, io_bound=False, timeout=60,
+        schema=schema_from_signature(agent_utils.search_entity_in_project, 'search_class_in_project', param_renames={'entity_name': 'class_name'})
+    )
+    registry.register(
+        'search_function_in_project',
+        lambda p: agent_utils.search_entity_in_project(p.get('function_name', '')),
+        cpu_bound=True, io_bound=False, timeout=60,
+        schema=schema_from_signature(agent_utils.search_entity_in_project, 'search_function_in_project', param_renames={'entity_name': 'function_name'})
+    )
+    registry.register(
+        'search_code_dependencies',
+        lambda p: agent_utils.search_code_dependencies(p.get('entity_name', '')),
+        cpu_bound=True, io_bound=False, timeout=60,
+        schema=schema_from_signature(agent_utils.search_code_dependencies)
+    )
+    registry.register(
+        'search_files_path_by_pattern',
+        lambda p: agent_utils.search_files_path_by_pattern(p.get('pattern', '')),
+        timeout=60,
+        schema=schema_from_signature(agent_utils.search_files_path_by_pattern)
+    )
+    registry.register(
+        'view_file_contents',
+        lambda p: agent_utils.view_file_contents(
+            p.get('file_path', ''), p.get('index', 0), p.get('start_line', None), p.get('end_line', None)
+        ),
+        timeout=30,
+        schema=schema_from_signature(agent_utils.view_file_contents)
+    )
+    registry.register(
+        'view_code_changes',
+        lambda p: agent_utils.view_code_changes(p.get('file_path', '')),
+        timeout=60,
+        schema=schema_from_signature(agent_utils.view_code_changes)
+    )
+    registry.register(
+        'explore_project_structure',
+        lambda p: agent_utils.explore_project_structure(
+            p.get("root_path", "/"), p.get("max_depth", 3),
+            p.get("include_patterns", None), p.get("exclude_patterns", None)
+        ),
+        timeout=60,
+        schema=schema_from_signature(agent_utils.explore_project_structure)
+    )
+
+    return registry
@@ -14,6 +14,8 @@ import yaml
 sys.path.append(str(Path(__file__).resolve().parents[1]))  # 将父级目录加入执行目录列表
 
 from data_process.PR.llm_process_3 import llm_restructure_pr_body
+from utils.pr_context_store import PRContextStore
+from utils import telemetry
 # DIFF_URL = "https://github.com/{owner}/{repo}/pull/{pull_number}.diff"
 
 class Agent_utils:
@@ -233,7 +235,14 @@ class Agent_utils:
         except Exception as e:
             return json.dumps({"error": f"An unexpected error occurred while searching dependencies: {str(e)}"})
 
-    def search_files_path_by_pattern(self, pattern):
+    def search_files_path_by_pattern(self, pattern: str) -> str:
+        """
+        Search for files in the project whose paths match a glob pattern. Relative patterns are matched recursively from the working directory.
+
+        :param pattern: The glob pattern to search for files, e.g. "*/tests/*.py" or "*user*.py".
+
+        :return path_list: The list of matched file paths.
+        """
         try:
             cur_work_dir = os.getcwd()
 
@@ -248,7 +257,17 @@ class Agent_utils:
         except Exception as e:
             return json.dumps({"error": f"An error occurred while searching files: {str(e)}"})
 
-    def view_file_contents(self, file_path, index=0, start_line=None, end_line=None):
+    def view_file_contents(self, file_path: str, index: int = 0, start_line: Optional[int] = None, end_line: Optional[int] = None) -> str:
+        """
+        View the contents of a file in chunks of 100 lines, or a specific line range. The line range takes precedence over the chunk index.
+
+        :param file_path: The absolute path of the file.
+        :param index: Chunk index, 0 returns the first 100 lines, 1 returns lines 101-200, etc.
+        :param start_line: First line of a specific line range to view.
+        :param end_line: Last line of a specific line range to view.
+
+        :return file_content: The requested part of the file.
+        """
         if os.path.isdir(file_path):
             return "The provided path is a directory, not a file."
         
@@ -279,9 +298,17 @@ class Agent_utils:
         except Exception as e:
             return f"An error occurred: {e}. A valid absolute file path is required."
 
-    def view_code_changes(self, file_path):
+    def view_code_changes(self, file_path: str) -> str:
+        """
+        View the changes made by the PR to a file, showing added, removed and context lines with line numbers.
+
+        :param file_path: The path of the changed file relative to the repo root.
+
+        :return code_changes: The formatted diff of the file.
+        """
         try:
-            diff_list = json.loads(requests.get(self.DIFF_URL).text)
+            with telemetry.span('github', 'pulls.files'):
+                diff_list = json.loads(requests.get(self.DIFF_URL).text)
             for diff in diff_list:
                 if diff['filename'] == file_path:
                     patch = diff['patch']
@@ -298,21 +325,37 @@ class Agent_utils:
             return json.dumps({"error": f"An unexpected error occurred while viewing code changes: {str(e)}"})
 
     def reformat_pr_info_for_user_prompt(self):
+        # 先查PR信息缓存：离线模式下直接使用最近一次的结果，否则按head SHA命中
+        store = PRContextStore.from_config(self.config)
+        repo_key, pull_number = store.key_from_config(self.config)
+        if self.config['Agent'].get('pr_context_offline', False):
+            cached = store.get(repo_key, pull_number)
+            if cached is not None:
+                return self.save_pr_body(cached)
+
         body = None
         title = None
+        head_sha = None
         PR_url = self.config['Agent']['PR_url']
-        response = requests.get(PR_url, headers=self.headers)
+        with telemetry.span('github', 'pulls.get'):
+            response = requests.get(PR_url, headers=self.headers)
         if response.status_code == 200:
             data = response.json()
             body = data['body']
             title = data['title']
+            head_sha = data['head']['sha']
+            cached = store.get(repo_key, pull_number, head_sha)
+            if cached is not None:
+                return self.save_pr_body(cached)
         body = body.replace("\r\n", "\\n").replace('\"', '\\"').replace("'", "\'")
-        result = llm_restructure_pr_body(body).replace('```', '').replace('json','')
+        with telemetry.span('llm', 'restructure_pr_body'):
+            result = llm_restructure_pr_body(body).replace('```', '').replace('json','')
         dict_result = json.loads(result)
         dict_result["Description of changes"] = title + '\n' + dict_result["Description of changes"] 
 
         PR_Files_url = PR_url + '/files'
-        response = requests.get(PR_Files_url, headers=self.headers)
+        with telemetry.span('github', 'pulls.files'):
+            response = requests.get(PR_Files_url, headers=self.headers)
 
         if response.status_code == 200:
             PR_Changed_Files = response.json()
@@ -322,13 +365,20 @@ class Agent_utils:
                 file.pop('raw_url', None)
                 file.pop('contents_url', None)
                 file.pop('patch', None)
+        tmp_info = {'PR_Content': dict_result["Description of changes"], 'PR_Changed_Files': PR_Changed_Files, 'Test_Plan': dict_result["Test plan"]}
+        store.put(repo_key, pull_number, head_sha, tmp_info)
+
+        return self.save_pr_body(tmp_info)
+
+    def save_pr_body(self, tmp_info):
+        """
+        将整理好的PR信息写入Judge.tmp_dir，供法官任务读取。
+        """
         tmp_dir = self.config['Judge']['tmp_dir']
         os.makedirs(tmp_dir, exist_ok=True)
         tmp_path = os.path.join(tmp_dir, f"{self.config['Judge']['pull_number']}_PR_body.json")
-        tmp_info = {'PR_Content': dict_result["Description of changes"], 'PR_Changed_Files': PR_Changed_Files, 'Test_Plan': dict_result["Test plan"]}
         with open(f"{tmp_path}", 'w') as f:
             json.dump(tmp_info, f)
-
         return tmp_info
 
     def explore_project_structure(
@@ -0,0 +1,242 @@
+import os
+import math
+import uuid
+import hashlib
+
+import numpy as np
+
+INDEX_BACKENDS = ('auto', 'brute', 'ivf', 'hnsw', 'disk')
+# auto模式下，代码块数量超过该值时使用近似索引
+AUTO_APPROXIMATE_THRESHOLD = 50000
+
+
+def top_k(scores, k):
+    """
+    每行取分数最高的k个：先用argpartition选出k个，再只对这k个排序。
+
+    Args:
+        scores (numpy.ndarray): (q, n)分数矩阵
+        k (int): 返回数量
+
+    Returns:
+        tuple: ((q, k)分数, (q, k)下标)，按分数降序
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.zeros((len(scores), 0), dtype=scores.dtype), np.zeros((len(scores), 0), dtype=np.int64)
+    if k < scores.shape[1]:
+        indices = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        indices = np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+    part = np.take_along_axis(scores, indices, axis=1)
+    order = np.argsort(-part, axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+
+def _as_queries(queries):
+    queries = np.asarray(queries, dtype=np.float32)
+    return queries[None, :] if queries.ndim == 1 else queries
+
+
+class BruteForceIndex:
+    """
+    精确检索：内积（嵌入已标准化，即余弦相似度）后用argpartition取top-k。
+    按块计算分数并合并每块的top-k，内存占用与代码块总数无关。
+    """
+
+    def __init__(self, embeddings, chunk_rows=65536):
+        self.embeddings = embeddings
+        self.chunk_rows = chunk_rows
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, queries, k=25):
+        """
+        Args:
+            queries (numpy.ndarray): (q, d)或(d,)查询嵌入
+            k (int, optional): 每个查询返回的数量
+
+        Returns:
+            tuple: ((q, k)分数, (q, k)代码块下标)
+        """
+        queries = _as_queries(queries)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_indices = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.embeddings), self.chunk_rows):
+            chunk = np.asarray(self.embeddings[start:start + self.chunk_rows], dtype=np.float32)
+            chunk_scores, chunk_indices = top_k(queries @ chunk.T, k)
+            scores = np.concatenate([best_scores, chunk_scores], axis=1)
+            indices = np.concatenate([best_indices, chunk_indices + start], axis=1)
+            best_scores, order = top_k(scores, k)
+            best_indices = np.take_along_axis(indices, order, axis=1)
+        return best_scores, best_indices
+
+
+class DiskIndex(BruteForceIndex):
+    """
+    磁盘模式：嵌入以float16保存在.npy文件中，通过memmap按块扫描，适合放不进内存的跨仓库索引。
+    """
+
+    def __init__(self, path, chunk_rows=65536):
+        super().__init__(np.load(path, mmap_mode='r'), chunk_rows)
+        self.path = path
+
+    @classmethod
+    def build(cls, embeddings, path, chunk_rows=65536):
+        """
+        写入索引文件。路径应包含嵌入的指纹（见embeddings_fingerprint）：文件已经存在时内容相同，直接打开。
+        """
+        if os.path.exists(path):
+            return cls(path, chunk_rows)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 多个任务可能同时构建同一个索引，各自写入唯一的临时文件再原子替换
+        tmp_path = f"{path}.{uuid.uuid4().hex[:16]}.tmp"
+        data = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float16, shape=np.shape(embeddings))
+        for start in range(0, len(embeddings), chunk_rows):
+            data[start:start + chunk_rows] = embeddings[start:start + chunk_rows]
+        data.flush()
+        del data
+        os.replace(tmp_path, path)
+        return cls(path, chunk_rows)
+
+
+class IVFIndex:
+    """
+    倒排文件索引（纯NumPy）：球面k-means把代码块分到nlist个簇，查询时只在最近的nprobe个簇内精确计算。
+    """
+
+    def __init__(self, embeddings, nlist=None, nprobe=8, iterations=10, sample_size=100000, seed=0):
+        """
+        Args:
+            embeddings (numpy.ndarray): (n, d)标准化嵌入
+            nlist (int, optional): 簇数量，默认约4*sqrt(n)
+            nprobe (int, optional): 查询时搜索的簇数量
+            iterations (int, optional): k-means迭代次数
+            sample_size (int, optional): 训练k-means的采样数量
+            seed (int, optional): 随机种子
+        """
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        n = len(self.embeddings)
+        self.nlist = max(1, min(nlist or int(4 * math.sqrt(n)), n))
+        self.nprobe = nprobe
+
+        rng = np.random.default_rng(seed)
+        sample = self.embeddings[rng.choice(n, min(n, sample_size), replace=False)] if n > sample_size else self.embeddings
+        centroids = sample[rng.choice(len(sample), self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=self.nlist)
+            # 空簇保留原来的中心
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-9)
+        self.centroids = centroids
+
+        assignment = self._assign(self.embeddings, centroids)
+        self.order = np.argsort(assignment, kind='stable')
+        self.offsets = np.searchsorted(assignment[self.order], np.arange(self.nlist + 1))
+
+    @staticmethod
+    def _assign(vectors, centroids, chunk_rows=65536):
+        return np.concatenate([
+            np.argmax(vectors[start:start + chunk_rows] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), chunk_rows)
+        ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, queries, k=25):
+        queries = _as_queries(queries)
+        _, probes = top_k(queries @ self.centroids.T, self.nprobe)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, query in enumerate(queries):
+            candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probes[row]])
+            if not len(candidates):
+                continue
+            candidate_scores, positions = top_k((self.embeddings[candidates] @ query)[None, :], k)
+            scores[row, :positions.shape[1]] = candidate_scores[0]
+            indices[row, :positions.shape[1]] = candidates[positions[0]]
+        return scores, indices
+
+
+class HNSWIndex:
+    """
+    HNSW图索引，使用hnswlib，未安装时使用faiss-cpu。
+    """
+
+    def __init__(self, embeddings, M=16, ef_construction=200, ef_search=64):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.size = len(embeddings)
+        self.ef_search = ef_search
+        try:
+            import hnswlib
+            self.library = 'hnswlib'
+            self.index = hnswlib.Index(space='ip', dim=embeddings.shape[1])
+            self.index.init_index(max_elements=max(1, self.size), ef_construction=ef_construction, M=M)
+            self.index.add_items(embeddings, np.arange(self.size))
+        except ImportError:
+            import faiss
+            self.library = 'faiss'
+            self.index = faiss.IndexHNSWFlat(embeddings.shape[1], M, faiss.METRIC_INNER_PRODUCT)
+            self.index.hnsw.efConstruction = ef_construction
+            self.index.add(embeddings)
+
+    def __len__(self):
+        return self.size
+
+    def search(self, queries, k=25):
+        queries = np.ascontiguousarray(_as_queries(queries))
+        k = min(k, self.size)
+        if self.library == 'hnswlib':
+            self.index.set_ef(max(self.ef_search, k))
+            labels, distances = self.index.knn_query(queries, k=k)
+            # hnswlib的内积距离为1 - 内积
+            return (1 - distances).astype(np.float32), labels.astype(np.int64)
+        self.index.hnsw.efSearch = max(self.ef_search, k)
+        scores, labels = self.index.search(queries, k)
+        return scores, labels.astype(np.int64)
+
+
+def embeddings_fingerprint(embeddings):
+    """
+    嵌入矩阵的指纹（行数和内容的sha1），用于区分磁盘索引文件。
+    """
+    data = np.ascontiguousarray(embeddings)
+    return f"{len(data)}-{hashlib.sha1(data.tobytes()).hexdigest()[:16]}"
+
+
+def build_index(embeddings, backend='auto', path=None, **params):
+    """
+    构建向量索引。
+
+    Args:
+        embeddings (numpy.ndarray): (n, d)标准化嵌入
+        backend (str, optional): 'brute'、'ivf'、'hnsw'、'disk'或'auto'（数量少时精确检索，数量多时HNSW，未安装hnswlib/faiss时IVF）
+        path (str, optional): disk模式下的索引文件路径
+        **params: 传给索引类的参数
+
+    Returns:
+        带search(queries, k)方法的索引
+    """
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown vector index backend: {backend}")
+    if backend == 'auto':
+        backend = 'brute' if len(embeddings) <= AUTO_APPROXIMATE_THRESHOLD else 'hnsw'
+    if backend == 'disk':
+        if path is None:
+            raise ValueError("The disk vector index needs a path")
+        return DiskIndex.build(embeddings, path, **params)
+    if backend == 'hnsw':
+        try:
+            return HNSWIndex(embeddings, **params)
+        except ImportError:
+            print("Neither hnswlib nor faiss is installed, falling back to the IVF index")
+            return IVFIndex(embeddings)
+    if backend == 'ivf':
+        return IVFIndex(embeddings, **params)
+    return BruteForceIndex(embeddings, **params)